@@ -0,0 +1,151 @@
+import threading
+import time
+from collections import OrderedDict
+
+from jobs import QueueFullError
+from shared_state import LocalGeneration
+
+
+class MemoryCacheBackend:
+    """Backend LRU en mémoire du processus. Tout objet exposant get/set/delete/clear peut le remplacer."""
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class AnalyticsCache:
+    """
+    Cache des agrégations du dashboard, indexé par endpoint + paramètres.
+
+    Une entrée est fraîche pendant le TTL de son endpoint et tant qu'aucune écriture
+    n'a eu lieu depuis son calcul dans son `scope` (mark_stale ; un scope par restaurant,
+    vu par tous les workers si `generation_factory` produit des générations de
+    shared_state). Au-delà, et jusqu'à `stale_ttl` secondes, la valeur périmée est servie
+    immédiatement pendant qu'un recalcul part en arrière-plan (stale-while-revalidate) :
+    seul un cache vide fait attendre.
+    """
+
+    def __init__(self, backend, refresh_queue, ttls=None, default_ttl=30, stale_ttl=600, wrap_compute=None, generation_factory=None):
+        self.backend = backend
+        self.refresh_queue = refresh_queue
+        self.ttls = ttls or {}
+        self.default_ttl = default_ttl
+        self.stale_ttl = stale_ttl
+        self.wrap_compute = wrap_compute
+        self.enabled = default_ttl > 0
+        self.stats = {"hits": 0, "stale_hits": 0, "misses": 0, "refreshes": 0, "refresh_errors": 0}
+        self.generation_factory = generation_factory or (lambda scope: LocalGeneration())
+        self._generations = {}
+        self._refreshing = set()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(endpoint, params, scope=None):
+        key = endpoint + "?" + "&".join(f"{k}={params[k]}" for k in sorted(params))
+        return key if scope is None else f"{scope}/{key}"
+
+    def _generation(self, scope):
+        generation = self._generations.get(scope)
+        if generation is None:
+            generation = self._generations.setdefault(scope, self.generation_factory(scope))
+        return generation
+
+    def mark_stale(self, scope=None):
+        """À appeler après chaque écriture qui modifie les données agrégées de `scope`."""
+        self._generation(scope).bump()
+
+    def clear(self, scope=None):
+        """
+        Invalide toutes les entrées de `scope`. Le changement de génération suffit : les
+        entrées des autres restaurants, dans le même backend partagé, restent valides.
+        """
+        self._generation(scope).bump()
+
+    def get_or_compute(self, endpoint, params, compute, scope=None):
+        if not self.enabled:
+            return compute()
+        key = self.make_key(endpoint, params, scope)
+        ttl = self.ttls.get(endpoint, self.default_ttl)
+        entry = self.backend.get(key)
+        now = time.time()
+        generation = self._generation(scope).current()
+        if entry is not None:
+            age = now - entry["computed_at"]
+            if age < ttl and entry["generation"] == generation:
+                self._count("hits")
+                return entry["value"]
+            if age < ttl + self.stale_ttl:
+                self._count("stale_hits")
+                self._schedule_refresh(key, ttl, compute, scope)
+                return entry["value"]
+        self._count("misses")
+        return self._compute_and_store(key, ttl, compute, generation)
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def _compute_and_store(self, key, ttl, compute, generation):
+        started = time.time()
+        value = compute()
+        self.backend.set(key, {
+            "value": value,
+            "computed_at": started,
+            "generation": generation,
+        }, ttl + self.stale_ttl)
+        return value
+
+    def _schedule_refresh(self, key, ttl, compute, scope):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+        try:
+            self.refresh_queue.submit(self._refresh, key, ttl, compute, scope)
+        except QueueFullError:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def _refresh(self, key, ttl, compute, scope):
+        generation = self._generation(scope).current()
+        try:
+            if self.wrap_compute:
+                with self.wrap_compute():
+                    self._compute_and_store(key, ttl, compute, generation)
+            else:
+                self._compute_and_store(key, ttl, compute, generation)
+            self._count("refreshes")
+        except Exception as e:
+            print(f"Erreur lors du recalcul du cache analytique ({key}): {e}")
+            self._count("refresh_errors")
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.stats, scopes=len(self._generations))
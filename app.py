@@ -1,19 +1,48 @@
 import os
+import re
+import atexit
+import json
+import hmac
+import base64
+import csv
+import io
+import time
 import traceback
-from flask import Flask, request, jsonify
+import zlib
+import click
+from flask import Flask, request, jsonify, Response, stream_with_context, has_request_context
 from flask_cors import CORS
-from openai import OpenAI
 from dotenv import load_dotenv
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import func, text, desc
+from sqlalchemy import func, text, desc, or_, and_, literal_column
 from sqlalchemy.orm import aliased
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+from collections import Counter
 # Importations pour JWT
-from flask_jwt_extended import create_access_token, get_jwt_identity, jwt_required, JWTManager
-from werkzeug.security import check_password_hash # On garde check_password_hash pour la sécurité
+from flask_jwt_extended import create_access_token, get_jwt, get_jwt_identity, jwt_required, verify_jwt_in_request, JWTManager
+from werkzeug.security import check_password_hash, generate_password_hash # On garde check_password_hash pour la sécurité
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 from flask_talisman import Talisman
+from jobs import ReviewJobQueue, QueueFullError
+from review_cache import ReviewPoolCache, review_cache_key
+from option_index import OptionIndex
+from response_cache import SerializedResponseCache
+from analytics_cache import AnalyticsCache, MemoryCacheBackend
+from ingestion import IngestionBuffer
+from bulk_generation import BulkRunner
+from llm_resilience import ResilientLLM, CircuitBreaker
+from fallback_review import render_fallback_review
+from sif import LexiconScorer, OpenAIScorer, synthesize
+from db_pool import engine_options_from_env, pool_status, without_statement_timeout
+from read_replica import REPLICA_BIND_KEY, ReplicaRouter, RoutingSession, replica_reads
+from shared_state import open_shared_state, make_generation, SharedCacheBackend
+from tenancy import TenantDirectory, render_prompt, add_tenant_columns, drop_legacy_constraints, ensure_primary_key
+from migrations import Migration, run_migrations, pending_migrations
+from lazy import LazyProxy
+from static_assets import StaticAssets, write_build
+import partitions
+import metrics
 
 # --- CONFIGURATION INITIALE ---
 load_dotenv()
@@ -24,9 +53,8 @@ CORS(app, supports_credentials=True)
 # Clé secrète pour signer les tokens JWT. Doit être gardée secrète !
 app.config["JWT_SECRET_KEY"] = os.getenv("JWT_SECRET_KEY", "une-super-cle-secrete-pour-le-developpement")
 # Mot de passe pour le dashboard. En production, utilisez une variable d'environnement forte.
+# Son absence est signalée par create_app() (démarrage du serveur), pas à l'import.
 DASHBOARD_PASSWORD = os.getenv('DASHBOARD_PASSWORD')
-if not DASHBOARD_PASSWORD:
-    raise RuntimeError("DASHBOARD_PASSWORD n'est pas définie. Veuillez la définir dans vos variables d'environnement.")
 
 # Initialisation de JWTManager
 jwt = JWTManager(app)
@@ -34,108 +62,830 @@ jwt = JWTManager(app)
 # Initialisation de Flask-Talisman pour les en-têtes de sécurité
 talisman = Talisman(app, content_security_policy=None)
 
+# --- ÉTAT PARTAGÉ ENTRE WORKERS (limiteur, caches) ---
+# Par défaut un fichier SQLite local partagé par les workers gunicorn de la machine ;
+# redis://... pour plusieurs machines, memory:// pour revenir à un état par processus.
+SHARED_STATE_URL = os.getenv("SHARED_STATE_URL", f"sqlite:///{os.path.join(app.instance_path, 'shared_state.sqlite')}")
+shared_state = open_shared_state(SHARED_STATE_URL)
+
 # Initialisation de Flask-Limiter pour la protection contre le brute-force
+# (RATELIMIT_ENABLED=false le désactive, par exemple pour les tests de charge).
+app.config["RATELIMIT_ENABLED"] = os.getenv("RATELIMIT_ENABLED", "true").lower() == "true"
 limiter = Limiter(
     get_remote_address,
     app=app,
     default_limits=["200 per day", "50 per hour"],
-    storage_uri="memory://"
+    storage_uri=SHARED_STATE_URL
 )
 
+# --- INSTRUMENTATION (latences, requêtes SQL, appels OpenAI) ---
+# SLOW_REQUEST_MS > 0 active le journal des requêtes lentes avec leurs requêtes SQL.
+metrics.init_app(app, slow_request_ms=int(os.getenv("SLOW_REQUEST_MS", "0")))
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
 # --- CLIENT OPENAI ---
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# Construit au premier appel : l'import du SDK coûte à lui seul ~0,8 s au démarrage.
+def make_openai_client():
+    from openai import OpenAI
+    return OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+client = LazyProxy(make_openai_client)
+
+# --- FILE DE GÉNÉRATION ASYNCHRONE ---
+# En mode "async", /generate-review enregistre les données puis délègue l'appel OpenAI
+# à ce pool de workers et renvoie immédiatement un identifiant de job.
+REVIEW_GENERATION_MODE = os.getenv("REVIEW_GENERATION_MODE", "sync")
+review_jobs = ReviewJobQueue(
+    workers=int(os.getenv("REVIEW_JOB_WORKERS", "4")),
+    max_depth=int(os.getenv("REVIEW_JOB_QUEUE_DEPTH", "50")),
+    result_ttl=int(os.getenv("REVIEW_JOB_RESULT_TTL", "300")),
+)
 
 # --- CONFIGURATION DE LA BASE DE DONNÉES ---
-database_url = os.getenv('DATABASE_URL')
-if not database_url:
-    raise RuntimeError("DATABASE_URL is not set.")
+# Son absence est signalée par create_app() et migrate_schema(), pas à l'import : le
+# module reste importable (préchargement, outils, tests) avec une base SQLite en mémoire.
+database_url = os.getenv('DATABASE_URL') or "sqlite://"
 if database_url.startswith("postgres://"):
     database_url = database_url.replace("postgres://", "postgresql://", 1)
 app.config['SQLALCHEMY_DATABASE_URI'] = database_url
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-db = SQLAlchemy(app)
+# Pool de connexions, pre-ping, recycle et statement_timeout configurables (voir db_pool.py) ;
+# les commandes de maintenance s'exécutent sans statement_timeout (without_statement_timeout).
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options_from_env(database_url)
+# Réplique en lecture optionnelle pour le dashboard et les exports (voir read_replica.py).
+# Au-delà de DB_REPLICA_MAX_LAG_SECONDS de retard, les lectures reviennent sur la base principale.
+replica_url = os.getenv('DATABASE_REPLICA_URL')
+if replica_url and replica_url.startswith("postgres://"):
+    replica_url = replica_url.replace("postgres://", "postgresql://", 1)
+if replica_url:
+    app.config['SQLALCHEMY_BINDS'] = {REPLICA_BIND_KEY: dict(engine_options_from_env(replica_url), url=replica_url)}
+# Après une écriture (ex. changement de statut d'un feedback), les lectures du même
+# restaurant restent sur la base principale DB_REPLICA_PIN_SECONDS secondes (par défaut
+# le retard maximal toléré), pour que le dashboard relise aussitôt la modification.
+replica_router = ReplicaRouter(
+    max_lag=float(os.getenv("DB_REPLICA_MAX_LAG_SECONDS", "5")),
+    check_interval=float(os.getenv("DB_REPLICA_CHECK_INTERVAL_SECONDS", "2")),
+    pin_seconds=float(os.environ["DB_REPLICA_PIN_SECONDS"]) if os.getenv("DB_REPLICA_PIN_SECONDS") else None,
+    pin_store=shared_state,
+) if replica_url else None
+
+def replica_pin_key():
+    """Restaurant de l'admin authentifié par la requête en cours (None hors requête JWT)."""
+    if not has_request_context():
+        return None
+    try:
+        claims = get_jwt()
+    except RuntimeError:
+        return None
+    return claims.get('tenant_id', DEFAULT_TENANT_ID) if claims else None
+
+db = SQLAlchemy(app, session_options={"class_": RoutingSession, "router": replica_router, "pin_key": replica_pin_key})
+
+# --- MODÈLES DE LA BASE DE DONNÉES ---
+# Chaque ligne appartient à un restaurant (tenant) ; les index composites commencent par
+# tenant_id pour qu'une requête ne lise que les données de son restaurant.
+DEFAULT_TENANT_ID = 1
+
+class Tenant(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    slug = db.Column(db.String(80), unique=True, nullable=False)
+    name = db.Column(db.String(120), nullable=False)
+    prompt_template = db.Column(db.Text, nullable=True)
+    dashboard_password_hash = db.Column(db.String(256), nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+def tenant_column(**kwargs):
+    return db.Column(
+        db.Integer, db.ForeignKey('tenant.id', ondelete='CASCADE'), nullable=False,
+        default=DEFAULT_TENANT_ID, server_default=str(DEFAULT_TENANT_ID), **kwargs
+    )
 
-# --- MODÈLES DE LA BASE DE DONNÉES (inchangés) ---
 class GeneratedReview(db.Model):
+    __table_args__ = (
+        db.Index('ix_generated_review_tenant_created', 'tenant_id', 'created_at'),
+        db.Index('ix_generated_review_tenant_server', 'tenant_id', 'server_name'),
+    )
     id = db.Column(db.Integer, primary_key=True)
-    server_name = db.Column(db.String(80), nullable=False, index=True)
-    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+    tenant_id = tenant_column()
+    server_name = db.Column(db.String(80), nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
 
 class Server(db.Model):
+    __table_args__ = (db.UniqueConstraint('tenant_id', 'name', name='uq_server_tenant_name'),)
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(80), unique=True, nullable=False)
+    tenant_id = tenant_column()
+    name = db.Column(db.String(80), nullable=False)
 
 class FlavorOption(db.Model):
     id = db.Column(db.Integer, primary_key=True)
+    tenant_id = tenant_column(index=True)
     text = db.Column(db.String(100), nullable=False)
     category = db.Column(db.String(50), nullable=False)
 
 class MenuSelection(db.Model):
     __tablename__ = 'menu_selections'
+    __table_args__ = (db.Index('ix_menu_selections_tenant_timestamp', 'tenant_id', 'selection_timestamp'),)
     id = db.Column(db.Integer, primary_key=True)
+    tenant_id = tenant_column()
     dish_name = db.Column(db.Text, nullable=False)
     dish_category = db.Column(db.Text, nullable=False)
-    selection_timestamp = db.Column(db.DateTime(timezone=True), server_default=func.now(), index=True)
+    selection_timestamp = db.Column(db.DateTime(timezone=True), server_default=func.now())
 
 class InternalFeedback(db.Model):
     __tablename__ = 'internal_feedback'
+    __table_args__ = (
+        db.Index('ix_internal_feedback_tenant_status_created_id', 'tenant_id', 'status', 'created_at', 'id'),
+        db.Index('ix_internal_feedback_tenant_created', 'tenant_id', 'created_at'),
+    )
     id = db.Column(db.Integer, primary_key=True)
+    tenant_id = tenant_column()
     feedback_text = db.Column(db.Text, nullable=False)
     associated_server_id = db.Column(db.Integer, db.ForeignKey('server.id', ondelete='SET NULL'), nullable=True, index=True)
-    status = db.Column(db.Text, nullable=False, default='new', index=True)
-    created_at = db.Column(db.DateTime(timezone=True), server_default=func.now(), index=True)
+    status = db.Column(db.Text, nullable=False, default='new')
+    created_at = db.Column(db.DateTime(timezone=True), server_default=func.now())
     server = db.relationship('Server')
 
 class QualitativeFeedback(db.Model):
     __tablename__ = 'qualitative_feedback'
+    __table_args__ = (db.Index('ix_qualitative_feedback_tenant_created', 'tenant_id', 'created_at'),)
     id = db.Column(db.Integer, primary_key=True)
+    tenant_id = tenant_column()
     category = db.Column(db.String(100), nullable=False, index=True)
     value = db.Column(db.String(100), nullable=False)
     created_at = db.Column(db.DateTime(timezone=True), server_default=func.now())
 
-# --- INITIALISATION DE LA BASE DE DONNÉES ---
-with app.app_context():
+# --- ANALYSE SIF (scores des feedbacks et synthèses précalculées) ---
+class FeedbackAnalysis(db.Model):
+    __tablename__ = 'feedback_analysis'
+    __table_args__ = (db.Index('ix_feedback_analysis_tenant_day', 'tenant_id', 'day'),)
+    id = db.Column(db.Integer, primary_key=True)
+    tenant_id = tenant_column()
+    feedback_id = db.Column(db.Integer, db.ForeignKey('internal_feedback.id', ondelete='CASCADE'), nullable=False, unique=True)
+    day = db.Column(db.Date, nullable=False)
+    score = db.Column(db.Integer, nullable=False)
+    category = db.Column(db.String(50), nullable=False)
+    theme = db.Column(db.String(100), nullable=True)
+
+class SifSynthesisResult(db.Model):
+    __tablename__ = 'sif_synthesis_result'
+    tenant_id = tenant_column(primary_key=True)
+    period = db.Column(db.String(20), primary_key=True)
+    payload = db.Column(db.Text, nullable=False)
+    watermark = db.Column(db.Integer, nullable=False, default=0)
+    computed_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+# --- AGRÉGATS QUOTIDIENS (rollups) ---
+# Compteurs par restaurant et par jour maintenus à chaque soumission : les routes du
+# dashboard lisent ces tables au lieu de scanner les événements bruts.
+class DailyServerRollup(db.Model):
+    __tablename__ = 'daily_server_rollup'
+    __table_args__ = (db.UniqueConstraint('tenant_id', 'day', 'server_name', name='uq_daily_server_rollup_tenant_day_server'),)
+    id = db.Column(db.Integer, primary_key=True)
+    tenant_id = tenant_column()
+    day = db.Column(db.Date, nullable=False)
+    server_name = db.Column(db.String(80), nullable=False)
+    review_count = db.Column(db.Integer, nullable=False, default=0)
+
+class DailyDishRollup(db.Model):
+    __tablename__ = 'daily_dish_rollup'
+    __table_args__ = (db.UniqueConstraint('tenant_id', 'day', 'dish_name', 'dish_category', name='uq_daily_dish_rollup_tenant_day_dish'),)
+    id = db.Column(db.Integer, primary_key=True)
+    tenant_id = tenant_column()
+    day = db.Column(db.Date, nullable=False)
+    dish_name = db.Column(db.Text, nullable=False)
+    dish_category = db.Column(db.Text, nullable=False)
+    selection_count = db.Column(db.Integer, nullable=False, default=0)
+
+class DailyQualitativeRollup(db.Model):
+    __tablename__ = 'daily_qualitative_rollup'
+    __table_args__ = (db.UniqueConstraint('tenant_id', 'day', 'category', 'value', name='uq_daily_qualitative_rollup_tenant_day_value'),)
+    id = db.Column(db.Integer, primary_key=True)
+    tenant_id = tenant_column()
+    day = db.Column(db.Date, nullable=False)
+    category = db.Column(db.String(100), nullable=False)
+    value = db.Column(db.String(100), nullable=False)
+    value_count = db.Column(db.Integer, nullable=False, default=0)
+
+# --- BROUILLONS D'AVIS GÉNÉRÉS EN MASSE ---
+class ReviewDraftBatch(db.Model):
+    __tablename__ = 'review_draft_batch'
+    __table_args__ = (db.Index('ix_review_draft_batch_tenant_created', 'tenant_id', 'created_at'),)
+    id = db.Column(db.Integer, primary_key=True)
+    tenant_id = tenant_column()
+    status = db.Column(db.String(20), nullable=False, default='pending')
+    concurrency = db.Column(db.Integer, nullable=False, default=4)
+    total = db.Column(db.Integer, nullable=False, default=0)
+    succeeded = db.Column(db.Integer, nullable=False, default=0)
+    failed = db.Column(db.Integer, nullable=False, default=0)
+    retries = db.Column(db.Integer, nullable=False, default=0)
+    prompt_tokens = db.Column(db.Integer, nullable=False, default=0)
+    completion_tokens = db.Column(db.Integer, nullable=False, default=0)
+    duration_seconds = db.Column(db.Float, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+class ReviewDraft(db.Model):
+    __tablename__ = 'review_draft'
+    __table_args__ = (db.Index('ix_review_draft_tenant_batch', 'tenant_id', 'batch_id'),)
+    id = db.Column(db.Integer, primary_key=True)
+    tenant_id = tenant_column()
+    batch_id = db.Column(db.Integer, db.ForeignKey('review_draft_batch.id', ondelete='CASCADE'), nullable=False)
+    lang = db.Column(db.String(10), nullable=False, default='fr')
+    tags = db.Column(db.Text, nullable=False)
+    review = db.Column(db.Text, nullable=True)
+    error = db.Column(db.Text, nullable=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    prompt_tokens = db.Column(db.Integer, nullable=False, default=0)
+    completion_tokens = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+# --- RESTAURANTS (tenants) ---
+# Les routes publiques désignent leur restaurant par ?restaurant=<slug> (ou l'en-tête
+# X-Restaurant), le restaurant par défaut sinon ; les routes d'administration lisent
+# le restaurant dans le token JWT obtenu au login.
+DEFAULT_TENANT_SLUG = os.getenv("DEFAULT_TENANT_SLUG", "siena")
+DEFAULT_TENANT_NAME = os.getenv("DEFAULT_TENANT_NAME", "Siena")
+
+def load_tenants():
+    # Appelé aussi depuis les threads de génération, hors requête.
+    with app.app_context():
+        return [{
+            "id": tenant.id,
+            "slug": tenant.slug,
+            "name": tenant.name,
+            "prompt_template": tenant.prompt_template,
+            "dashboard_password_hash": tenant.dashboard_password_hash,
+        } for tenant in Tenant.query.all()]
+
+tenant_directory = TenantDirectory(load_tenants, ttl=int(os.getenv("TENANT_DIRECTORY_TTL", "60")))
+
+def public_tenant():
+    """Restaurant désigné par la requête publique, ou None si le slug est inconnu."""
+    slug = request.args.get('restaurant') or request.headers.get('X-Restaurant')
+    if not slug:
+        return tenant_directory.by_id(DEFAULT_TENANT_ID)
+    return tenant_directory.by_slug(slug)
+
+def admin_tenant_id():
+    return get_jwt().get('tenant_id', DEFAULT_TENANT_ID)
+
+def check_dashboard_password(tenant, password):
+    if tenant['dashboard_password_hash']:
+        return bool(password) and check_password_hash(tenant['dashboard_password_hash'], password)
+    # Le restaurant par défaut garde DASHBOARD_PASSWORD tant qu'aucun mot de passe propre n'est défini.
+    return tenant['id'] == DEFAULT_TENANT_ID and bool(DASHBOARD_PASSWORD) and password == DASHBOARD_PASSWORD
+
+@app.cli.command('create-tenant')
+@click.argument('slug')
+@click.argument('name')
+@click.option('--password', help="Mot de passe du dashboard de ce restaurant.")
+@click.option('--prompt-template', type=click.File('r', encoding='utf-8'), help="Fichier du modèle de prompt.")
+def create_tenant_command(slug, name, password, prompt_template):
+    """Ajoute (ou met à jour) un restaurant (flask --app app create-tenant <slug> <nom>)."""
+    tenant = Tenant.query.filter_by(slug=slug).first() or Tenant(slug=slug)
+    tenant.name = name
+    if password:
+        tenant.dashboard_password_hash = generate_password_hash(password)
+    if prompt_template:
+        tenant.prompt_template = prompt_template.read()
+    db.session.add(tenant)
+    db.session.commit()
+    print(f"Restaurant {slug} (id {tenant.id}) enregistré.")
+
+# --- MISE À JOUR DES AGRÉGATS QUOTIDIENS ---
+ROLLUP_COUNT_COLUMNS = {
+    DailyServerRollup: 'review_count',
+    DailyDishRollup: 'selection_count',
+    DailyQualitativeRollup: 'value_count',
+}
+
+def increment_rollup(model, keys, amount=1):
+    """Incrémente (ou crée) la ligne d'agrégat correspondant à `keys`, dans la transaction courante."""
+    count_column = ROLLUP_COUNT_COLUMNS[model]
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ('postgresql', 'sqlite'):
+        if dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        stmt = insert(model).values(**keys, **{count_column: amount})
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(keys),
+            set_={count_column: getattr(model, count_column) + stmt.excluded[count_column]}
+        )
+        db.session.execute(stmt)
+        return
+    row = model.query.filter_by(**keys).first()
+    if row:
+        setattr(row, count_column, getattr(row, count_column) + amount)
+    else:
+        db.session.add(model(**keys, **{count_column: amount}))
+
+def record_submission_rollups(tenant_id, server_name, dish_selections, qualitative_values):
+    day = datetime.utcnow().date()
+    if server_name:
+        increment_rollup(DailyServerRollup, {"tenant_id": tenant_id, "day": day, "server_name": server_name})
+    for (name, category), amount in Counter((d['name'], d['category']) for d in dish_selections).items():
+        increment_rollup(DailyDishRollup, {"tenant_id": tenant_id, "day": day, "dish_name": name, "dish_category": category}, amount)
+    for (category, value), amount in Counter(qualitative_values).items():
+        increment_rollup(DailyQualitativeRollup, {"tenant_id": tenant_id, "day": day, "category": category, "value": value}, amount)
+
+def rollup_sources():
+    """(agrégat, colonne de temps de l'événement brut, colonnes de regroupement, colonne de comptage)."""
+    return [
+        (DailyServerRollup, GeneratedReview.created_at,
+         [GeneratedReview.tenant_id, GeneratedReview.server_name], 'review_count'),
+        (DailyDishRollup, MenuSelection.selection_timestamp,
+         [MenuSelection.tenant_id, MenuSelection.dish_name, MenuSelection.dish_category], 'selection_count'),
+        (DailyQualitativeRollup, QualitativeFeedback.created_at,
+         [QualitativeFeedback.tenant_id, QualitativeFeedback.category, QualitativeFeedback.value], 'value_count'),
+    ]
+
+def rebuild_rollups(before_day=None, since_day=None):
+    """
+    Recalcule les agrégats quotidiens de tous les restaurants depuis les événements bruts
+    encore présents, du premier jour conservé (ou `since_day`) jusqu'à `before_day` (exclu).
+    Les jours déjà compactés, dont les événements bruts ont été supprimés, gardent leurs agrégats.
+
+    Les jours qui reçoivent encore des soumissions ne doivent être recalculés qu'après
+    lock_rollups_for_rebuild(), dans la même transaction (voir backfill_rollups).
+    """
+    for rollup_model, timestamp_column, key_columns, count_column in rollup_sources():
+        first_day = db.session.query(func.min(func.date(timestamp_column))).scalar()
+        if first_day is None:
+            continue
+        if isinstance(first_day, str):
+            first_day = datetime.strptime(first_day, '%Y-%m-%d').date()
+        if since_day is not None:
+            first_day = max(first_day, since_day)
+        if before_day is not None and first_day >= before_day:
+            continue
+
+        stale_rows = db.session.query(rollup_model).filter(rollup_model.day >= first_day)
+        events = db.select(func.date(timestamp_column), *key_columns, func.count()).where(
+            timestamp_column >= day_start_bound(timestamp_column, first_day)
+        )
+        if before_day is not None:
+            stale_rows = stale_rows.filter(rollup_model.day < before_day)
+            events = events.where(timestamp_column < day_start_bound(timestamp_column, before_day))
+        stale_rows.delete(synchronize_session=False)
+        db.session.execute(db.insert(rollup_model).from_select(
+            ['day'] + [column.key for column in key_columns] + [count_column],
+            events.group_by(func.date(timestamp_column), *key_columns)
+        ))
+
+def lock_rollups_for_rebuild():
+    """
+    Sous Postgres, bloque les incréments concurrents des agrégats jusqu'à la fin de la
+    transaction : une soumission validée avant le verrou est comptée par le recalcul, une
+    soumission en attente incrémente ensuite le résultat recalculé. Sous SQLite, la
+    transaction d'écriture est déjà exclusive.
+    """
+    if db.session.get_bind().dialect.name == 'postgresql':
+        for model in ROLLUP_COUNT_COLUMNS:
+            db.session.execute(text(f'LOCK TABLE {model.__tablename__} IN SHARE ROW EXCLUSIVE MODE'))
+
+def backfill_rollups():
+    """
+    Reconstruit les agrégats quotidiens à partir des événements bruts, sans arrêter les
+    soumissions : l'historique est recalculé sans verrou, puis la veille et aujourd'hui
+    (qui reçoivent encore des écritures, y compris celles du tampon d'ingestion après
+    minuit) dans une courte transaction verrouillée.
+    """
+    recent_day = datetime.utcnow().date() - timedelta(days=1)
+    rebuild_rollups(before_day=recent_day)
+    db.session.commit()
+    lock_rollups_for_rebuild()
+    rebuild_rollups(since_day=recent_day)
+    db.session.commit()
+
+@app.cli.command('backfill-rollups')
+@without_statement_timeout()
+def backfill_rollups_command():
+    """Recalcule les agrégats quotidiens du dashboard (flask --app app backfill-rollups)."""
+    backfill_rollups()
+    print("Agrégats quotidiens recalculés.")
+
+# --- PARTITIONNEMENT ET RÉTENTION DES ÉVÉNEMENTS BRUTS ---
+# Sous Postgres, les tables d'événements peuvent être partitionnées par mois
+# (flask --app app partition-events). Les partitions des mois à venir doivent être créées
+# avant que des lignes n'arrivent dans la partition DEFAULT : `flask --app app
+# ensure-partitions` (ou compact-events, qui le fait aussi) est à planifier au moins une
+# fois par mois (cron), indépendamment des déploiements. La compaction (flask --app app
+# compact-events) replie dans les agrégats quotidiens les événements plus vieux que
+# RAW_EVENT_RETENTION_DAYS jours, puis les supprime. 0 = conservation illimitée.
+RAW_EVENT_RETENTION_DAYS = int(os.getenv("RAW_EVENT_RETENTION_DAYS", "0"))
+PARTITION_MONTHS_AHEAD = int(os.getenv("PARTITION_MONTHS_AHEAD", "2"))
+COMPACTION_BATCH_SIZE = 10000
+
+def event_tables():
+    """(modèle, colonne de temps) des tables d'événements en ajout seul."""
+    return [
+        (GeneratedReview, GeneratedReview.created_at),
+        (MenuSelection, MenuSelection.selection_timestamp),
+        (QualitativeFeedback, QualitativeFeedback.created_at),
+    ]
+
+def partitioned_event_tables():
+    if db.engine.dialect.name != 'postgresql':
+        return []
+    conn = db.session.connection()
+    return [(model, column) for model, column in event_tables() if partitions.is_partitioned(conn, model.__tablename__)]
+
+def ensure_event_partitions():
+    """Crée à l'avance les partitions des prochains mois (la partition DEFAULT doit rester vide)."""
+    try:
+        for model, _ in partitioned_event_tables():
+            partitions.ensure_partitions(db.session.connection(), model.__tablename__, datetime.utcnow().date(), PARTITION_MONTHS_AHEAD)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        print(f"Erreur lors de la création des partitions: {e}")
+
+@app.cli.command('ensure-partitions')
+@without_statement_timeout()
+def ensure_partitions_command():
+    """Crée les partitions des PARTITION_MONTHS_AHEAD prochains mois (flask --app app ensure-partitions, cron mensuel)."""
+    ensure_event_partitions()
+    print("Partitions à venir vérifiées.")
+
+@app.cli.command('partition-events')
+@without_statement_timeout()
+def partition_events_command():
+    """Convertit les tables d'événements en tables partitionnées par mois (Postgres uniquement)."""
+    if db.engine.dialect.name != 'postgresql':
+        print("Le partitionnement n'est disponible que sous Postgres.")
+        return
+    conn = db.session.connection()
+    for model, column in event_tables():
+        table = model.__tablename__
+        if partitions.is_partitioned(conn, table):
+            print(f"{table} : déjà partitionnée.")
+            continue
+        try:
+            partitions.convert_to_partitioned(conn, table, column.key, model.__table__.indexes, PARTITION_MONTHS_AHEAD)
+        except ValueError as e:
+            print(f"{table} : {e}")
+            continue
+        print(f"{table} : partitionnée par mois sur {column.key}.")
+    db.session.commit()
+
+def compact_events(retention_days):
+    """
+    Replie dans les agrégats quotidiens les événements antérieurs à aujourd'hui moins
+    `retention_days` jours, puis les supprime : partitions entières quand la table est
+    partitionnée, DELETE par lots pour le reste.
+    """
+    cutoff_day = datetime.utcnow().date() - timedelta(days=retention_days)
+    rebuild_rollups(before_day=cutoff_day)
+    db.session.commit()
+
+    partitioned = {model for model, _ in partitioned_event_tables()}
+    report = {}
+    for model, column in event_tables():
+        dropped = []
+        if model in partitioned:
+            dropped = partitions.drop_partitions_before(db.session.connection(), model.__tablename__, cutoff_day)
+            db.session.commit()
+        bound = day_start_bound(column, cutoff_day)
+        deleted = 0
+        while True:
+            batch = db.select(model.id).where(column < bound).limit(COMPACTION_BATCH_SIZE).scalar_subquery()
+            result = db.session.execute(db.delete(model).where(column < bound, model.id.in_(batch)))
+            db.session.commit()
+            deleted += result.rowcount
+            if result.rowcount < COMPACTION_BATCH_SIZE:
+                break
+        report[model.__tablename__] = {"dropped_partitions": dropped, "deleted_rows": deleted}
+    ensure_event_partitions()
+    for tenant in tenant_directory.all():
+        analytics_cache.mark_stale(tenant['id'])
+    return report
+
+@app.cli.command('compact-events')
+@without_statement_timeout()
+def compact_events_command():
+    """Compacte les événements bruts au-delà de RAW_EVENT_RETENTION_DAYS (flask --app app compact-events)."""
+    if RAW_EVENT_RETENTION_DAYS <= 0:
+        # Même sans rétention, la tâche planifiée crée les partitions à venir.
+        ensure_event_partitions()
+        print("Rétention désactivée : définissez RAW_EVENT_RETENTION_DAYS. Partitions à venir vérifiées.")
+        return
+    for table, result in compact_events(RAW_EVENT_RETENTION_DAYS).items():
+        print(f"{table} : {result['deleted_rows']} lignes supprimées, partitions supprimées : {', '.join(result['dropped_partitions']) or 'aucune'}")
+
+def day_start_bound(column, day):
+    """Minuit UTC du jour `day`, avec ou sans fuseau selon le type de `column`."""
+    moment = datetime.combine(day, datetime.min.time())
+    return moment.replace(tzinfo=timezone.utc) if column.type.timezone else moment
+
+def period_start_day(period):
+    """Premier jour (inclus) couvert par une période du dashboard, ou None pour 'all'."""
+    today = datetime.utcnow().date()
+    if period == '7days':
+        return today - timedelta(days=6)
+    if period == '30days':
+        return today - timedelta(days=29)
+    return None
+
+# --- INDEX EN MÉMOIRE DES OPTIONS (plats et serveurs) ---
+# Un index par restaurant, chargé à la première soumission de ce restaurant.
+def load_option_index(tenant_id):
+    flavor_categories = {}
+    for option_text, option_category in db.session.query(FlavorOption.text, FlavorOption.category).filter(
+        FlavorOption.tenant_id == tenant_id
+    ).order_by(FlavorOption.id):
+        # Même sémantique que filter_by(text=...).first() : la première option l'emporte.
+        flavor_categories.setdefault(option_text, option_category)
+    server_ids = {
+        name: server_id
+        for server_id, name in db.session.query(Server.id, Server.name).filter(Server.tenant_id == tenant_id)
+    }
+    return flavor_categories, server_ids
+
+OPTION_INDEX_TTL = int(os.getenv("OPTION_INDEX_TTL", "60"))
+option_indexes = {}
+options_generations = {}
+
+def options_generation_for(tenant_id):
+    """Génération partagée par l'index des options et le cache public d'un restaurant."""
+    generation = options_generations.get(tenant_id)
+    if generation is None:
+        generation = options_generations.setdefault(tenant_id, make_generation(shared_state, f"options:{tenant_id}"))
+    return generation
+
+def option_index_for(tenant_id):
+    index = option_indexes.get(tenant_id)
+    if index is None:
+        index = option_indexes.setdefault(tenant_id, OptionIndex(
+            lambda: load_option_index(tenant_id), ttl=OPTION_INDEX_TTL, generation=options_generation_for(tenant_id)
+        ))
+    return index
+
+def lookup_flavor_category(tenant_id, value):
+    if OPTION_INDEX_TTL > 0:
+        return option_index_for(tenant_id).flavor_category(value)
+    flavor_option = FlavorOption.query.filter_by(tenant_id=tenant_id, text=value).first()
+    return flavor_option.category if flavor_option else None
+
+def lookup_server_id(tenant_id, name):
+    if OPTION_INDEX_TTL > 0:
+        return option_index_for(tenant_id).server_id(name)
+    server_obj = Server.query.filter_by(tenant_id=tenant_id, name=name).first()
+    return server_obj.id if server_obj else None
+
+# --- CACHE DE LA RÉPONSE /api/public/data ---
+# Réponse JSON pré-sérialisée par restaurant, servie avec ETag/Last-Modified (304
+# possible). Le contenu ne dépend pas de la langue : le paramètre `lang` envoyé par la
+# page n'entre pas dans la clé, qui reste bornée au nombre de restaurants.
+PUBLIC_DATA_CACHE_TTL = int(os.getenv("PUBLIC_DATA_CACHE_TTL", "300"))
+PUBLIC_DATA_CACHE_CONTROL = os.getenv("PUBLIC_DATA_CACHE_CONTROL", "public, max-age=60, stale-while-revalidate=600")
+public_data_caches = {}
+
+def public_data_cache_for(tenant_id):
+    cache = public_data_caches.get(tenant_id)
+    if cache is None:
+        cache = public_data_caches.setdefault(tenant_id, SerializedResponseCache(
+            ttl=PUBLIC_DATA_CACHE_TTL, generation=options_generation_for(tenant_id)
+        ))
+    return cache
+
+def invalidate_option_caches(tenant_id):
+    # L'index des options du restaurant partage la même génération.
+    public_data_cache_for(tenant_id).invalidate()
+
+# --- INGESTION PAR LOTS (optionnelle) ---
+# En mode INGESTION_MODE=buffered, les soumissions sont écrites dans un tampon local
+# (avec fichier de débordement) puis insérées en base par lots, hors du chemin de la requête.
+def build_submission_events(tenant_id, server_name, dish_selections, qualitative_values, feedback):
+    created_at = datetime.now(timezone.utc).isoformat()
+    events = [
+        {"type": "qualitative", "category": category, "value": value}
+        for category, value in qualitative_values
+    ]
+    events += [
+        {"type": "menu_selection", "dish_name": dish['name'], "dish_category": dish['category']}
+        for dish in dish_selections
+    ]
+    if server_name:
+        events.append({"type": "review", "server_name": server_name})
+    if feedback:
+        events.append(dict(feedback, type="internal_feedback"))
+    return [dict(event, tenant_id=tenant_id, created_at=created_at) for event in events]
+
+def flush_ingested_events(events):
+    rows = {QualitativeFeedback: [], MenuSelection: [], GeneratedReview: [], InternalFeedback: []}
+    rollup_counts = Counter()
+    tenant_ids = set()
+    for event in events:
+        created_at = datetime.fromisoformat(event['created_at'])
+        day = created_at.date()
+        # Les fichiers de débordement antérieurs au multi-restaurant n'ont pas de tenant_id.
+        tenant_id = event.get('tenant_id', DEFAULT_TENANT_ID)
+        tenant_ids.add(tenant_id)
+        if event['type'] == 'qualitative':
+            rows[QualitativeFeedback].append({"tenant_id": tenant_id, "category": event['category'], "value": event['value'], "created_at": created_at})
+            rollup_counts[(DailyQualitativeRollup, (("tenant_id", tenant_id), ("day", day), ("category", event['category']), ("value", event['value'])))] += 1
+        elif event['type'] == 'menu_selection':
+            rows[MenuSelection].append({"tenant_id": tenant_id, "dish_name": event['dish_name'], "dish_category": event['dish_category'], "selection_timestamp": created_at})
+            rollup_counts[(DailyDishRollup, (("tenant_id", tenant_id), ("day", day), ("dish_name", event['dish_name']), ("dish_category", event['dish_category'])))] += 1
+        elif event['type'] == 'review':
+            # GeneratedReview.created_at est un datetime UTC naïf.
+            rows[GeneratedReview].append({"tenant_id": tenant_id, "server_name": event['server_name'], "created_at": created_at.replace(tzinfo=None)})
+            rollup_counts[(DailyServerRollup, (("tenant_id", tenant_id), ("day", day), ("server_name", event['server_name'])))] += 1
+        elif event['type'] == 'internal_feedback':
+            rows[InternalFeedback].append({
+                "tenant_id": tenant_id,
+                "feedback_text": event['feedback_text'],
+                "associated_server_id": event['associated_server_id'],
+                "status": 'new',
+                "created_at": created_at,
+            })
+    try:
+        for model, model_rows in rows.items():
+            if model_rows:
+                db.session.execute(db.insert(model), model_rows)
+        for (model, keys), amount in rollup_counts.items():
+            increment_rollup(model, dict(keys), amount)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    for tenant_id in tenant_ids:
+        analytics_cache.mark_stale(tenant_id)
+
+ingestion_buffer = None
+if os.getenv("INGESTION_MODE", "direct") == "buffered":
+    ingestion_buffer = IngestionBuffer(
+        flush_ingested_events,
+        spill_dir=os.getenv("INGESTION_SPILL_DIR", os.path.join(app.instance_path, "ingestion")),
+        max_events=int(os.getenv("INGESTION_MAX_EVENTS", "200")),
+        max_delay_ms=int(os.getenv("INGESTION_MAX_DELAY_MS", "500")),
+        fsync=os.getenv("INGESTION_FSYNC", "false").lower() == "true",
+        wrap_flush=app.app_context,
+        max_attempts=int(os.getenv("INGESTION_MAX_ATTEMPTS", "8")),
+        retry_base_ms=int(os.getenv("INGESTION_RETRY_BASE_MS", "500")),
+        retry_max_ms=int(os.getenv("INGESTION_RETRY_MAX_MS", "60000")),
+    )
+    atexit.register(ingestion_buffer.flush)
+
+@app.cli.command('ingestion-replay-failed')
+@without_statement_timeout()
+def ingestion_replay_failed_command():
+    """Réécrit en base les lots d'ingestion mis de côté après trop d'échecs (flask --app app ingestion-replay-failed)."""
+    if ingestion_buffer is None:
+        print("INGESTION_MODE n'est pas 'buffered' : rien à rejouer.")
+        return
+    print(f"{ingestion_buffer.replay_failed()} événements réécrits.")
+
+# --- CACHE DES AGRÉGATIONS DU DASHBOARD ---
+# Résultats des routes analytiques mis en cache quelques secondes par restaurant, marqués
+# périmés à chaque nouvelle soumission de ce restaurant et recalculés en arrière-plan
+# (stale-while-revalidate).
+analytics_cache = AnalyticsCache(
+    SharedCacheBackend(shared_state, "analytics") if shared_state is not None
+    else MemoryCacheBackend(max_entries=int(os.getenv("ANALYTICS_CACHE_MAX_ENTRIES", "256"))),
+    ReviewJobQueue(workers=1, max_depth=20),
+    ttls={
+        "dashboard": 30,
+        "dashboard_bundle": 30,
+        "server_stats": 60,
+        "menu_performance": 60,
+        "qualitative_synthesis": 120,
+    },
+    default_ttl=int(os.getenv("ANALYTICS_CACHE_TTL", "30")),
+    stale_ttl=int(os.getenv("ANALYTICS_CACHE_STALE_TTL", "600")),
+    wrap_compute=app.app_context,
+    generation_factory=lambda tenant_id: make_generation(shared_state, f"analytics:{tenant_id}"),
+)
+
+# --- SCHÉMA DE LA BASE (migrations versionnées) ---
+# L'import de l'application ne touche pas à la base : le schéma est créé et mis à jour
+# une fois par déploiement (flask --app app migrate), avant le démarrage des workers.
+# Une évolution du schéma = une nouvelle entrée à la fin de SCHEMA_MIGRATIONS.
+def create_tables():
+    """Tables absentes de la base (create_all ne modifie pas les tables existantes)."""
     db.create_all()
 
+def ensure_feedback_indexes():
+    """
+    Index plein texte de la boîte de réception des feedbacks, créé aussi sur les bases
+    existantes (create_all ne touche pas aux tables déjà présentes). L'index GIN n'existe
+    que sous Postgres ; SQLite se rabat sur une recherche LIKE.
+    """
+    if db.engine.dialect.name != 'postgresql':
+        return
+    with db.engine.begin() as conn:
+        conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_internal_feedback_text_fts "
+            "ON internal_feedback USING GIN (to_tsvector('simple', feedback_text))"
+        ))
+
+def ensure_tenant_schema():
+    """
+    Crée le restaurant par défaut et rattache à lui les données des bases créées avant
+    le multi-restaurant : colonne tenant_id, index composites, puis (sous Postgres)
+    remplacement des anciennes contraintes d'unicité globales.
+    """
+    try:
+        if db.session.get(Tenant, DEFAULT_TENANT_ID) is None:
+            db.session.add(Tenant(id=DEFAULT_TENANT_ID, slug=DEFAULT_TENANT_SLUG, name=DEFAULT_TENANT_NAME))
+            db.session.flush()
+            if db.engine.dialect.name == 'postgresql':
+                # L'id explicite n'avance pas la séquence : le prochain restaurant aurait l'id 1.
+                db.session.execute(text("SELECT setval(pg_get_serial_sequence('tenant', 'id'), (SELECT max(id) FROM tenant))"))
+        conn = db.session.connection()
+        tenant_tables = [table for table in db.metadata.sorted_tables if 'tenant_id' in table.columns]
+        add_tenant_columns(conn, tenant_tables, DEFAULT_TENANT_ID)
+        if db.engine.dialect.name == 'postgresql':
+            drop_legacy_constraints(conn, {
+                'server': ['server_name_key'],
+                'daily_server_rollup': ['daily_server_rollup_day_server_name_key'],
+                'daily_dish_rollup': ['daily_dish_rollup_day_dish_name_dish_category_key'],
+                'daily_qualitative_rollup': ['daily_qualitative_rollup_day_category_value_key'],
+            })
+            ensure_primary_key(conn, SifSynthesisResult.__table__)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        print(f"Erreur lors de la migration multi-restaurant: {e}")
+        traceback.print_exc()
+        raise
+
+# Les migrations 1 à 3 reprennent l'ancienne initialisation au démarrage ; idempotentes,
+# elles s'appliquent aussi aux bases créées avant l'introduction des migrations.
+SCHEMA_MIGRATIONS = [
+    Migration(1, "create_tables", create_tables),
+    Migration(2, "tenant_schema", ensure_tenant_schema),
+    Migration(3, "feedback_search_index", ensure_feedback_indexes),
+]
+
+@without_statement_timeout()
+def migrate_schema():
+    """Applique les migrations en attente puis crée les partitions à venir. Renvoie les migrations appliquées."""
+    check_database_url()
+    with app.app_context():
+        applied = run_migrations(db.engine, SCHEMA_MIGRATIONS)
+        ensure_event_partitions()
+    return applied
+
+@app.cli.command('migrate')
+@click.option('--check', is_flag=True, help="N'applique rien : code de sortie 1 si des migrations sont en attente.")
+@without_statement_timeout()
+def migrate_command(check):
+    """Met à jour le schéma de la base (flask --app app migrate), une fois par déploiement."""
+    if check:
+        pending = pending_migrations(db.engine, SCHEMA_MIGRATIONS)
+        for migration in pending:
+            print(f"En attente : {migration.version} ({migration.name})")
+        raise SystemExit(1 if pending else 0)
+    applied = migrate_schema()
+    print(f"{len(applied)} migration(s) appliquée(s)." if applied else "Schéma à jour.")
+
 # --- NOUVELLE ROUTE DE LOGIN ---
 @app.route("/api/login", methods=["POST"])
 @limiter.limit("10 per minute") # Limite les tentatives de connexion
 def login():
     """
-    Reçoit le nom d'utilisateur et le mot de passe.
-    Si les identifiants sont corrects, renvoie un token d'accès JWT.
+    Reçoit le nom d'utilisateur, le mot de passe et éventuellement le slug du restaurant.
+    Si les identifiants sont corrects, renvoie un token d'accès JWT limité à ce restaurant.
     """
     username = request.json.get("username", None)
     password = request.json.get("password", None)
+    slug = request.json.get("restaurant", None)
 
+    tenant = tenant_directory.by_slug(slug) if slug else tenant_directory.by_id(DEFAULT_TENANT_ID)
     # Vérification des identifiants (simple pour cet exemple)
-    if username != "admin" or password != DASHBOARD_PASSWORD:
+    if username != "admin" or tenant is None or not check_dashboard_password(tenant, password):
         return jsonify({"msg": "Bad username or password"}), 401
 
     # Création du token d'accès
-    access_token = create_access_token(identity=username)
-    return jsonify(access_token=access_token)
+    access_token = create_access_token(identity=username, additional_claims={"tenant_id": tenant['id']})
+    return jsonify(access_token=access_token, restaurant={"slug": tenant['slug'], "name": tenant['name']})
 
 
 # --- ROUTES DE GESTION (protégées par @jwt_required) ---
 @app.route('/api/servers', methods=['GET', 'POST'])
 @jwt_required()
 def manage_servers():
+    tenant_id = admin_tenant_id()
     if request.method == 'POST':
         data = request.get_json()
         if not data or not data.get('name'): return jsonify({"error": "Nom manquant."}), 400
-        new_server = Server(name=data['name'].strip().title())
+        new_server = Server(tenant_id=tenant_id, name=data['name'].strip().title())
         db.session.add(new_server)
         db.session.commit()
+        invalidate_option_caches(tenant_id)
         return jsonify({"id": new_server.id, "name": new_server.name}), 201
-    servers = Server.query.order_by(Server.name).all()
+    servers = Server.query.filter_by(tenant_id=tenant_id).order_by(Server.name).all()
     return jsonify([{"id": s.id, "name": s.name} for s in servers])
 
 @app.route('/api/servers/<int:server_id>', methods=['PUT', 'DELETE'])
 @jwt_required()
 def handle_server(server_id):
+    tenant_id = admin_tenant_id()
     server = db.session.get(Server, server_id)
-    if not server:
+    if not server or server.tenant_id != tenant_id:
         return jsonify({"error": "Serveur non trouvé."}), 404
 
     if request.method == 'PUT':
@@ -144,35 +894,42 @@ def handle_server(server_id):
             return jsonify({"error": "Nom du serveur manquant."}), 400
         server.name = data['name'].strip().title()
         db.session.commit()
+        invalidate_option_caches(tenant_id)
         return jsonify({"id": server.id, "name": server.name})
 
     if request.method == 'DELETE':
-        GeneratedReview.query.filter_by(server_name=server.name).delete()
+        GeneratedReview.query.filter_by(tenant_id=tenant_id, server_name=server.name).delete()
+        DailyServerRollup.query.filter_by(tenant_id=tenant_id, server_name=server.name).delete()
         db.session.delete(server)
         db.session.commit()
+        analytics_cache.mark_stale(tenant_id)
+        invalidate_option_caches(tenant_id)
         return jsonify({"success": True})
 
 
 @app.route('/api/options/flavors', methods=['GET', 'POST'])
 @jwt_required()
 def manage_flavors():
+    tenant_id = admin_tenant_id()
     if request.method == 'POST':
         data = request.get_json()
         if not data or not data.get('text') or not data.get('category'):
             return jsonify({"error": "Données manquantes."}), 400
-        new_option = FlavorOption(text=data['text'].strip(), category=data['category'].strip())
+        new_option = FlavorOption(tenant_id=tenant_id, text=data['text'].strip(), category=data['category'].strip())
         db.session.add(new_option)
         db.session.commit()
+        invalidate_option_caches(tenant_id)
         return jsonify({"id": new_option.id, "text": new_option.text, "category": new_option.category}), 201
-    options = FlavorOption.query.all()
+    options = FlavorOption.query.filter_by(tenant_id=tenant_id).all()
     return jsonify([{"id": opt.id, "text": opt.text, "category": opt.category} for opt in options])
 
 
 @app.route('/api/options/flavors/<int:option_id>', methods=['PUT', 'DELETE'])
 @jwt_required()
 def handle_flavor(option_id):
+    tenant_id = admin_tenant_id()
     option = db.session.get(FlavorOption, option_id)
-    if not option:
+    if not option or option.tenant_id != tenant_id:
         return jsonify({"error": "Option non trouvée."}), 404
 
     if request.method == 'PUT':
@@ -182,40 +939,166 @@ def handle_flavor(option_id):
         option.text = data['text'].strip()
         option.category = data['category'].strip()
         db.session.commit()
+        invalidate_option_caches(tenant_id)
         return jsonify({"id": option.id, "text": option.text, "category": option.category})
 
     if request.method == 'DELETE':
         db.session.delete(option)
         db.session.commit()
+        invalidate_option_caches(tenant_id)
         return jsonify({"success": True})
 
 
-# --- ROUTES API PUBLIQUES (inchangées) ---
+# --- ROUTES API PUBLIQUES ---
+def build_public_data(tenant_id):
+    servers = Server.query.filter_by(tenant_id=tenant_id).order_by(Server.name).all()
+    flavors = FlavorOption.query.filter_by(tenant_id=tenant_id).all()
+    flavors_by_category = {}
+    for f in flavors:
+        if f.category not in flavors_by_category:
+            flavors_by_category[f.category] = []
+        flavors_by_category[f.category].append({"id": f.id, "text": f.text})
+    return {
+        "servers": [{"id": s.id, "name": s.name} for s in servers],
+        "flavors": flavors_by_category,
+    }
+
 @app.route('/api/public/data', methods=['GET'])
 def get_public_data():
     try:
-        servers = Server.query.order_by(Server.name).all()
-        flavors = FlavorOption.query.all()
-        flavors_by_category = {}
-        for f in flavors:
-            if f.category not in flavors_by_category:
-                flavors_by_category[f.category] = []
-            flavors_by_category[f.category].append({"id": f.id, "text": f.text})
-        data = {
-            "servers": [{"id": s.id, "name": s.name} for s in servers],
-            "flavors": flavors_by_category,
-        }
-        return jsonify(data)
+        tenant = public_tenant()
+        if tenant is None:
+            return jsonify({"error": "Restaurant inconnu."}), 404
+        entry = public_data_cache_for(tenant['id']).get('data', lambda: build_public_data(tenant['id']))
+        response = Response(entry['body'], mimetype='application/json')
+        response.set_etag(entry['etag'])
+        response.last_modified = entry['last_modified']
+        response.headers['Cache-Control'] = PUBLIC_DATA_CACHE_CONTROL
+        # Le restaurant peut venir de l'en-tête X-Restaurant : un cache partagé doit en tenir
+        # compte, sinon il servirait les données d'un restaurant à un autre.
+        response.vary.add('X-Restaurant')
+        return response.make_conditional(request)
     except Exception as e:
         print(f"Erreur lors de la récupération des données publiques : {e}")
         return jsonify({"error": "Impossible de charger les données de configuration."}), 500
 
-# --- ROUTE DE GÉNÉRATION D'AVIS (inchangée) ---
-@app.route('/generate-review', methods=['POST'])
-def generate_review():
-    data = request.get_json()
-    if not data: return jsonify({"error": "Données invalides."}), 400
-        
+# --- ROUTE DE GÉNÉRATION D'AVIS ---
+def build_review_prompt(tenant_id, details, server_name, lang):
+    """Prompt construit à partir du modèle du restaurant (tenancy.DEFAULT_PROMPT_TEMPLATE par défaut)."""
+    tenant = tenant_directory.by_id(tenant_id)
+    return render_prompt(tenant['prompt_template'], tenant['name'], lang, details, server_name)
+
+# --- APPELS OPENAI RÉSILIENTS ---
+# Délai maximal par appel, requête de couverture après le p95 des latences, disjoncteur
+# sur les erreurs/lenteurs, puis repli sur LLM_FALLBACK_MODEL ("" pour le désactiver)
+# et enfin sur un avis rédigé localement à partir des mêmes tags (voir llm_resilience.py).
+LLM_MODEL = "gpt-4o"
+LLM_FALLBACK_MODEL = os.getenv("LLM_FALLBACK_MODEL", "gpt-4o-mini")
+review_llm = ResilientLLM(
+    deadline=float(os.getenv("LLM_DEADLINE_SECONDS", "12")),
+    fallback_deadline=float(os.getenv("LLM_FALLBACK_DEADLINE_SECONDS", "6")),
+    hedge_min_delay=float(os.getenv("LLM_HEDGE_MIN_DELAY_SECONDS", "1")),
+    hedge_max_delay=float(os.getenv("LLM_HEDGE_MAX_DELAY_SECONDS", "8")),
+    hedge_ratio=float(os.getenv("LLM_HEDGE_RATIO", "0.1")),
+    breaker=CircuitBreaker(
+        failure_ratio=float(os.getenv("LLM_BREAKER_FAILURE_RATIO", "0.5")),
+        slow_call_seconds=float(os.getenv("LLM_SLOW_CALL_SECONDS", "10")),
+        open_seconds=float(os.getenv("LLM_BREAKER_OPEN_SECONDS", "30")),
+    ),
+    on_outcome=metrics.record_llm_outcome,
+)
+
+def create_review_completion(prompt_text, model=LLM_MODEL, timeout=None):
+    started = time.perf_counter()
+    try:
+        completion = client.chat.completions.create(
+            model=model,
+            messages=[
+                {"role": "system", "content": "Tu es un assistant de rédaction spécialisé dans les avis de restaurants."},
+                {"role": "user", "content": prompt_text}
+            ],
+            temperature=0.7,
+            max_tokens=200,
+            timeout=timeout if timeout is not None else review_llm.deadline
+        )
+    except Exception:
+        metrics.record_openai_call(model, time.perf_counter() - started, outcome="error")
+        raise
+    usage = getattr(completion, 'usage', None)
+    metrics.record_openai_call(model, time.perf_counter() - started, usage=usage)
+    review_cache.record_generation(getattr(usage, 'total_tokens', 0))
+    return completion
+
+def completion_call(prompt_text, model):
+    return lambda timeout: create_review_completion(prompt_text, model, timeout).choices[0].message.content.strip()
+
+def local_review_call(tenant_id, details, server_name, lang):
+    return lambda: render_fallback_review(tenant_directory.by_id(tenant_id)['name'], details, server_name, lang)
+
+def generate_review_stream_chunks(prompt_text):
+    return client.chat.completions.create(
+        model=LLM_MODEL,
+        messages=[
+            {"role": "system", "content": "Tu es un assistant de rédaction spécialisé dans les avis de restaurants."},
+            {"role": "user", "content": prompt_text}
+        ],
+        temperature=0.7,
+        max_tokens=200,
+        stream=True,
+        stream_options={"include_usage": True},
+        timeout=review_llm.deadline
+    )
+
+def generate_review_for_details(tenant_id, details, lang, allow_local=False):
+    """
+    Avis généré par OpenAI via review_llm. Le repli local n'est autorisé que pour une
+    réponse directe au client (`allow_local`) : il ne doit pas remplir le cache d'avis.
+    """
+    server_name = details.get('server_name', [None])[0]
+    prompt_text = build_review_prompt(tenant_id, details, server_name, lang)
+    review, _ = review_llm.complete(
+        completion_call(prompt_text, LLM_MODEL),
+        completion_call(prompt_text, LLM_FALLBACK_MODEL) if LLM_FALLBACK_MODEL else None,
+        local_review_call(tenant_id, details, server_name, lang) if allow_local else None,
+    )
+    return review
+
+# --- CACHE D'AVIS PAR COMBINAISON DE TAGS ---
+# Les combinaisons récurrentes (même plat, même ambiance, même serveur, même langue)
+# sont servies depuis un pool d'avis pré-générés, rechargé en arrière-plan ; chaque
+# avis n'est servi qu'une fois (REVIEW_CACHE_MAX_SERVES=1), les textes restant distincts.
+review_cache = ReviewPoolCache(
+    generate_review_for_details,
+    ReviewJobQueue(workers=int(os.getenv("REVIEW_CACHE_REFILL_WORKERS", "2")), max_depth=100),
+    pool_size=int(os.getenv("REVIEW_CACHE_POOL_SIZE", "3")),
+    max_serves=int(os.getenv("REVIEW_CACHE_MAX_SERVES", "1")),
+    max_keys=int(os.getenv("REVIEW_CACHE_MAX_KEYS", "500")),
+    ttl=int(os.getenv("REVIEW_CACHE_TTL", "86400")),
+)
+
+def cached_review_for_details(tenant_id, details, lang):
+    if review_cache.enabled:
+        review = review_cache.take(review_cache_key(tenant_id, details, lang))
+        if review is not None:
+            return review
+    return generate_review_for_details(tenant_id, details, lang, allow_local=True)
+
+def review_details_from_tags(tags):
+    """{catégorie: [valeurs]} utilisé par le prompt, à partir des tags d'une soumission."""
+    details = {}
+    for tag in tags:
+        category = tag.get('category')
+        value = tag.get('value')
+        if category and value:
+            details.setdefault(category, []).append(value)
+    return details
+
+def record_review_submission(tenant_id, data):
+    """
+    Ajoute à la session les lignes associées à une soumission du restaurant `tenant_id`
+    (sans commit), ou les confie au tampon d'ingestion en mode "buffered".
+    Renvoie None s'il n'y a aucune donnée à traiter.
+    """
     lang = data.get('lang', 'fr')
     tags = data.get('tags', [])
     private_feedback = data.get('private_feedback', '').strip()
@@ -224,102 +1107,636 @@ def generate_review():
     has_private_feedback = bool(private_feedback)
 
     if not has_public_review_data and not has_private_feedback:
-        return jsonify({"error": "Aucune donnée à traiter."}), 400
+        return None
 
-    details = {}
+    details = review_details_from_tags(tags)
     dish_selections = []
+    qualitative_values = []
     
     qualitative_categories = ['service_qualities', 'atmosphere', 'reason_for_visit', 'quick_highlight']
     for tag in tags:
         category = tag.get('category')
         value = tag.get('value')
         if category in qualitative_categories and value:
-            new_qualitative_feedback = QualitativeFeedback(category=category, value=value)
-            db.session.add(new_qualitative_feedback)
+            qualitative_values.append((category, value))
         
-        if category and value:
-            if category not in details:
-                details[category] = []
-            details[category].append(value)
-            
-            if category == 'dish':
-                flavor_option = FlavorOption.query.filter_by(text=value).first()
-                if flavor_option:
-                    dish_selections.append({ "name": value, "category": flavor_option.category })
+        if category == 'dish' and value:
+            flavor_category = lookup_flavor_category(tenant_id, value)
+            if flavor_category:
+                dish_selections.append({ "name": value, "category": flavor_category })
 
     server_name = details.get('server_name', [None])[0]
 
+    feedback = None
     if has_private_feedback:
         server_id = None
         if server_name:
-            server_obj = Server.query.filter_by(name=server_name).first()
-            if server_obj: server_id = server_obj.id
-        
-        new_feedback = InternalFeedback(feedback_text=private_feedback, associated_server_id=server_id)
-        db.session.add(new_feedback)
+            server_id = lookup_server_id(tenant_id, server_name)
+        feedback = {"feedback_text": private_feedback, "associated_server_id": server_id}
+
+    if ingestion_buffer is not None:
+        ingestion_buffer.append(build_submission_events(tenant_id, server_name, dish_selections, qualitative_values, feedback))
+    else:
+        for category, value in qualitative_values:
+            new_qualitative_feedback = QualitativeFeedback(tenant_id=tenant_id, category=category, value=value)
+            db.session.add(new_qualitative_feedback)
 
-    if server_name:
-        new_review_log = GeneratedReview(server_name=server_name)
-        db.session.add(new_review_log)
+        if feedback:
+            new_feedback = InternalFeedback(tenant_id=tenant_id, **feedback)
+            db.session.add(new_feedback)
 
-    for dish in dish_selections:
-        new_selection = MenuSelection(dish_name=dish['name'], dish_category=dish['category'])
-        db.session.add(new_selection)
+        if server_name:
+            new_review_log = GeneratedReview(tenant_id=tenant_id, server_name=server_name)
+            db.session.add(new_review_log)
+
+        for dish in dish_selections:
+            new_selection = MenuSelection(tenant_id=tenant_id, dish_name=dish['name'], dish_category=dish['category'])
+            db.session.add(new_selection)
+
+        record_submission_rollups(tenant_id, server_name, dish_selections, qualitative_values)
+
+    return {
+        "tenant_id": tenant_id,
+        "lang": lang,
+        "details": details,
+        "server_name": server_name,
+        "has_public_review_data": has_public_review_data,
+    }
+
+def parse_flag(value, default):
+    """Booléen JSON ou chaîne explicite ("true"/"false", "1"/"0") ; None si la valeur est invalide."""
+    if value is None:
+        return default
+    if isinstance(value, bool):
+        return value
+    normalized = str(value).strip().lower()
+    if normalized in ('true', '1', 'yes', 'on'):
+        return True
+    if normalized in ('false', '0', 'no', 'off', ''):
+        return False
+    return None
+
+@app.route('/generate-review', methods=['POST'])
+def generate_review():
+    data = request.get_json()
+    if not data: return jsonify({"error": "Données invalides."}), 400
 
+    tenant = public_tenant()
+    if tenant is None:
+        return jsonify({"error": "Restaurant inconnu."}), 404
+
+    use_async_mode = parse_flag(data.get('async'), REVIEW_GENERATION_MODE == 'async')
+    if use_async_mode is None:
+        return jsonify({"error": "Paramètre 'async' invalide."}), 400
+    if use_async_mode:
+        # Place réservée avant tout enregistrement : une demande refusée (429) ne laisse
+        # aucune trace en base ni dans le tampon d'ingestion.
+        try:
+            review_jobs.reserve()
+        except QueueFullError as e:
+            response = jsonify({"error": "Trop de demandes en cours, veuillez réessayer dans un instant."})
+            response.headers['Retry-After'] = str(e.retry_after)
+            return response, 429
+
+    reserved = use_async_mode
     try:
+        submission = record_review_submission(tenant['id'], data)
+        if submission is None:
+            return jsonify({"error": "Aucune donnée à traiter."}), 400
+
         db.session.commit()
+        analytics_cache.mark_stale(tenant['id'])
         
-        if not has_public_review_data:
+        if not submission['has_public_review_data']:
             return jsonify({"message": "Feedback enregistré avec succès."})
 
-        prompt_text = f"Rédige un avis client positif et chaleureux pour un restaurant italien nommé Siena, en langue '{lang}'. L'avis doit sembler authentique et personnel. Incorpore les éléments suivants de manière naturelle:\n"
-        
-        for category, values in details.items():
-            if category != 'server_name':
-                prompt_text += f"- {category}: {', '.join(values)}\n"
-        
-        if server_name:
-            prompt_text += f"\nL'avis doit mentionner le service impeccable de {server_name}.\n"
-
-        prompt_text += "\nL'avis doit faire environ 4-6 phrases. Varie le style pour ne pas être répétitif."
+        if use_async_mode:
+            job_id = review_jobs.submit_reserved(cached_review_for_details, tenant['id'], submission['details'], submission['lang'])
+            reserved = False
+            return jsonify({"job_id": job_id, "status_url": f"/generate-review/jobs/{job_id}"}), 202
 
-        completion = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "system", "content": "Tu es un assistant de rédaction spécialisé dans les avis de restaurants."},
-                {"role": "user", "content": prompt_text}
-            ],
-            temperature=0.7,
-            max_tokens=200
-        )
-        review = completion.choices[0].message.content
-        return jsonify({"review": review.strip()})
+        review = cached_review_for_details(tenant['id'], submission['details'], submission['lang'])
+        return jsonify({"review": review})
     except Exception as e:
         db.session.rollback()
         print(f"Erreur OpenAI ou DB: {e}")
         traceback.print_exc()
         return jsonify({"error": "Désolé, une erreur est survenue lors de la génération de l'avis."}), 500
+    finally:
+        if reserved:
+            review_jobs.release()
+
+def sse_event(payload, event=None):
+    message = f"event: {event}\n" if event else ""
+    return message + f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+@app.route('/generate-review/stream', methods=['POST'])
+def generate_review_stream():
+    """
+    Variante de /generate-review qui renvoie l'avis mot à mot en Server-Sent Events.
+    Les données sont enregistrées (une seule fois) avant l'ouverture du flux OpenAI.
+    """
+    data = request.get_json()
+    if not data: return jsonify({"error": "Données invalides."}), 400
+
+    tenant = public_tenant()
+    if tenant is None:
+        return jsonify({"error": "Restaurant inconnu."}), 404
+
+    submission = record_review_submission(tenant['id'], data)
+    if submission is None:
+        return jsonify({"error": "Aucune donnée à traiter."}), 400
+
+    try:
+        db.session.commit()
+        analytics_cache.mark_stale(tenant['id'])
+    except Exception as e:
+        db.session.rollback()
+        print(f"Erreur DB: {e}")
+        traceback.print_exc()
+        return jsonify({"error": "Désolé, une erreur est survenue lors de la génération de l'avis."}), 500
+
+    if not submission['has_public_review_data']:
+        return jsonify({"message": "Feedback enregistré avec succès."})
+
+    prompt_text = build_review_prompt(tenant['id'], submission['details'], submission['server_name'], submission['lang'])
+    cached_review = None
+    if review_cache.enabled:
+        cached_review = review_cache.take(review_cache_key(tenant['id'], submission['details'], submission['lang']))
+
+    local_review = local_review_call(tenant['id'], submission['details'], submission['server_name'], submission['lang'])
+
+    def degraded_review():
+        review, _ = review_llm.degrade(
+            completion_call(prompt_text, LLM_FALLBACK_MODEL) if LLM_FALLBACK_MODEL else None, local_review
+        )
+        return review
+
+    def stream_review():
+        if cached_review is not None:
+            yield sse_event({"delta": cached_review})
+            yield sse_event({}, event="done")
+            return
+        if not review_llm.allow_stream():
+            # Circuit ouvert : pas d'appel au modèle principal, l'avis de repli arrive d'un bloc.
+            yield sse_event({"delta": degraded_review()})
+            yield sse_event({}, event="done")
+            return
+        upstream = None
+        started = time.perf_counter()
+        usage = None
+        sent_delta = False
+        try:
+            upstream = generate_review_stream_chunks(prompt_text)
+            for chunk in upstream:
+                if getattr(chunk, 'usage', None):
+                    usage = chunk.usage
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    sent_delta = True
+                    yield sse_event({"delta": delta})
+            metrics.record_openai_call(LLM_MODEL, time.perf_counter() - started, usage=usage, kind="stream")
+            review_llm.record_stream("success", time.perf_counter() - started)
+            yield sse_event({}, event="done")
+        except GeneratorExit:
+            # Le client s'est déconnecté : on ferme la connexion OpenAI dans le finally.
+            metrics.record_openai_call(LLM_MODEL, time.perf_counter() - started, outcome="client_disconnect", kind="stream")
+            review_llm.record_stream("client_disconnect", time.perf_counter() - started)
+            raise
+        except Exception as e:
+            metrics.record_openai_call(LLM_MODEL, time.perf_counter() - started, outcome="error", kind="stream")
+            review_llm.record_stream("error", time.perf_counter() - started)
+            print(f"Erreur OpenAI (stream): {e}")
+            traceback.print_exc()
+            if not sent_delta:
+                # Rien n'a encore été affiché : l'avis de repli remplace le flux.
+                yield sse_event({"delta": degraded_review()})
+                yield sse_event({}, event="done")
+            else:
+                yield sse_event({"error": "Désolé, une erreur est survenue lors de la génération de l'avis."}, event="error")
+        finally:
+            if upstream is not None and hasattr(upstream, 'close'):
+                upstream.close()
+
+    response = Response(stream_with_context(stream_review()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@app.route('/generate-review/jobs/<job_id>', methods=['GET'])
+@limiter.exempt
+def generate_review_job(job_id):
+    job = review_jobs.get(job_id)
+    if not job:
+        return jsonify({"error": "Job introuvable ou expiré."}), 404
+    if job['status'] == 'done':
+        return jsonify({"status": "done", "review": job['result']})
+    if job['status'] == 'error':
+        return jsonify({"status": "error", "error": "Désolé, une erreur est survenue lors de la génération de l'avis."}), 500
+    response = jsonify({"status": job['status']})
+    response.headers['Retry-After'] = '1'
+    return response, 202
+
+# --- GÉNÉRATION D'AVIS EN MASSE (brouillons) ---
+# Un lot de combinaisons de tags est enregistré puis généré en arrière-plan avec une
+# concurrence bornée (BulkRunner) : les avis, erreurs et jetons consommés sont écrits
+# dans review_draft, le débit obtenu dans review_draft_batch.
+BULK_MAX_ITEMS = int(os.getenv("BULK_MAX_ITEMS", "2000"))
+BULK_DEFAULT_CONCURRENCY = int(os.getenv("BULK_CONCURRENCY", "4"))
+BULK_MAX_CONCURRENCY = int(os.getenv("BULK_MAX_CONCURRENCY", "16"))
+BULK_MAX_RETRIES = int(os.getenv("BULK_MAX_RETRIES", "5"))
+BULK_COMMIT_EVERY = 25
+bulk_jobs = ReviewJobQueue(workers=1, max_depth=5)
+
+def generate_draft(tenant_id, item):
+    details = review_details_from_tags(item['tags'])
+    server_name = details.get('server_name', [None])[0]
+    completion = create_review_completion(build_review_prompt(tenant_id, details, server_name, item['lang']))
+    usage = getattr(completion, 'usage', None)
+    return {
+        "review": completion.choices[0].message.content.strip(),
+        "prompt_tokens": getattr(usage, 'prompt_tokens', 0) or 0,
+        "completion_tokens": getattr(usage, 'completion_tokens', 0) or 0,
+    }
+
+def create_draft_batch(tenant_id, items, concurrency):
+    batch = ReviewDraftBatch(tenant_id=tenant_id, total=len(items), concurrency=concurrency)
+    db.session.add(batch)
+    db.session.flush()
+    db.session.execute(db.insert(ReviewDraft), [{
+        "tenant_id": tenant_id,
+        "batch_id": batch.id,
+        "lang": item['lang'],
+        "tags": json.dumps(item['tags'], ensure_ascii=False),
+    } for item in items])
+    db.session.commit()
+    return batch
+
+def run_draft_batch(batch_id):
+    """Génère les brouillons encore vides du lot et renvoie le rapport de débit."""
+    batch = db.session.get(ReviewDraftBatch, batch_id)
+    drafts = db.session.query(ReviewDraft.id, ReviewDraft.lang, ReviewDraft.tags).filter(
+        ReviewDraft.batch_id == batch_id, ReviewDraft.review.is_(None)
+    ).order_by(ReviewDraft.id).all()
+    items = [{"id": draft_id, "lang": lang, "tags": json.loads(tags)} for draft_id, lang, tags in drafts]
+    tenant_id, concurrency = batch.tenant_id, batch.concurrency
+    batch.status = 'running'
+    db.session.commit()
+
+    pending = []
+
+    def on_result(index, result, error, attempts):
+        row = {"id": items[index]['id'], "attempts": attempts, "review": None, "error": None, "prompt_tokens": 0, "completion_tokens": 0}
+        if error is None:
+            row.update(result)
+        else:
+            row["error"] = str(error)[:500]
+        pending.append(row)
+        if len(pending) >= BULK_COMMIT_EVERY:
+            flush_results()
+
+    def flush_results():
+        if pending:
+            db.session.execute(db.update(ReviewDraft), pending)
+            db.session.commit()
+            pending.clear()
+
+    # Les threads de génération n'ont pas de contexte d'application : aucun accès à la session.
+    runner = BulkRunner(lambda item: generate_draft(tenant_id, item), concurrency=concurrency, max_retries=BULK_MAX_RETRIES)
+    try:
+        report = runner.run(items, on_result)
+        flush_results()
+    except Exception:
+        db.session.rollback()
+        batch = db.session.get(ReviewDraftBatch, batch_id)
+        batch.status = 'error'
+        batch.finished_at = datetime.utcnow()
+        db.session.commit()
+        raise
+    batch = db.session.get(ReviewDraftBatch, batch_id)
+    batch.status = 'done'
+    for field in ('succeeded', 'failed', 'retries', 'prompt_tokens', 'completion_tokens', 'duration_seconds'):
+        setattr(batch, field, report[field])
+    batch.finished_at = datetime.utcnow()
+    db.session.commit()
+    return report
+
+def run_draft_batch_in_background(batch_id):
+    with app.app_context():
+        return run_draft_batch(batch_id)
+
+def parse_bulk_items(raw_items):
+    """Valide les items {tags: [...], lang} d'un lot ; lève ValueError si un item est inexploitable."""
+    items = []
+    for position, raw in enumerate(raw_items):
+        tags = raw.get('tags') if isinstance(raw, dict) else None
+        if not isinstance(tags, list) or not review_details_from_tags(tags):
+            raise ValueError(f"Item {position} : tags manquants ou invalides.")
+        items.append({"tags": tags, "lang": raw.get('lang', 'fr')})
+    return items
+
+def draft_batch_report(batch):
+    tokens = batch.prompt_tokens + batch.completion_tokens
+    return {
+        "batch_id": batch.id,
+        "status": batch.status,
+        "concurrency": batch.concurrency,
+        "total": batch.total,
+        "succeeded": batch.succeeded,
+        "failed": batch.failed,
+        "retries": batch.retries,
+        "prompt_tokens": batch.prompt_tokens,
+        "completion_tokens": batch.completion_tokens,
+        "duration_seconds": batch.duration_seconds,
+        "reviews_per_second": round(batch.succeeded / batch.duration_seconds, 2) if batch.duration_seconds else None,
+        "tokens_per_second": round(tokens / batch.duration_seconds, 1) if batch.duration_seconds else None,
+        "created_at": batch.created_at.isoformat(),
+        "finished_at": batch.finished_at.isoformat() if batch.finished_at else None,
+    }
+
+@app.route('/api/review-drafts', methods=['POST'])
+@jwt_required()
+def create_review_drafts():
+    """
+    Lance la génération d'un lot de brouillons : {"items": [{"tags": [...], "lang": "fr"}, ...],
+    "concurrency": 4}. Renvoie l'identifiant du lot, à suivre sur /api/review-drafts/<id>.
+    """
+    data = request.get_json()
+    if not data or not isinstance(data.get('items'), list) or not data['items']:
+        return jsonify({"error": "Liste 'items' manquante."}), 400
+    if len(data['items']) > BULK_MAX_ITEMS:
+        return jsonify({"error": f"Un lot est limité à {BULK_MAX_ITEMS} items."}), 400
+    try:
+        items = parse_bulk_items(data['items'])
+        concurrency = min(max(int(data.get('concurrency', BULK_DEFAULT_CONCURRENCY)), 1), BULK_MAX_CONCURRENCY)
+    except (ValueError, TypeError) as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        batch = create_draft_batch(admin_tenant_id(), items, concurrency)
+        bulk_jobs.submit(run_draft_batch_in_background, batch.id)
+    except QueueFullError as e:
+        ReviewDraft.query.filter_by(batch_id=batch.id).delete()
+        db.session.delete(batch)
+        db.session.commit()
+        response = jsonify({"error": "Trop de lots en cours, veuillez réessayer plus tard."})
+        response.headers['Retry-After'] = str(e.retry_after)
+        return response, 429
+    except Exception as e:
+        db.session.rollback()
+        print(f"Erreur lors de la création du lot de brouillons: {e}")
+        traceback.print_exc()
+        return jsonify({"error": "Impossible de créer le lot de brouillons."}), 500
+    return jsonify({"batch_id": batch.id, "status_url": f"/api/review-drafts/{batch.id}"}), 202
+
+@app.route('/api/review-drafts/<int:batch_id>', methods=['GET'])
+@jwt_required()
+def get_review_drafts(batch_id):
+    batch = db.session.get(ReviewDraftBatch, batch_id)
+    if not batch or batch.tenant_id != admin_tenant_id():
+        return jsonify({"error": "Lot introuvable."}), 404
+    report = draft_batch_report(batch)
+    if batch.status == 'done':
+        drafts = ReviewDraft.query.filter_by(tenant_id=batch.tenant_id, batch_id=batch_id).order_by(ReviewDraft.id).all()
+        report["drafts"] = [{
+            "id": draft.id,
+            "lang": draft.lang,
+            "tags": json.loads(draft.tags),
+            "review": draft.review,
+            "error": draft.error,
+            "attempts": draft.attempts,
+        } for draft in drafts]
+    return jsonify(report)
+
+@app.cli.command('bulk-generate')
+@click.argument('items_file', type=click.File('r', encoding='utf-8'))
+@click.option('--restaurant', default=None, help="Slug du restaurant (restaurant par défaut sinon).")
+@click.option('--concurrency', default=BULK_DEFAULT_CONCURRENCY, show_default=True)
+def bulk_generate_command(items_file, restaurant, concurrency):
+    """Génère des brouillons depuis un fichier JSONL d'items {"tags": [...], "lang": "fr"} (flask --app app bulk-generate)."""
+    tenant = tenant_directory.by_slug(restaurant) if restaurant else tenant_directory.by_id(DEFAULT_TENANT_ID)
+    if tenant is None:
+        raise click.ClickException(f"Restaurant inconnu : {restaurant}")
+    try:
+        items = parse_bulk_items([json.loads(line) for line in items_file if line.strip()])
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    batch = create_draft_batch(tenant['id'], items, min(max(concurrency, 1), BULK_MAX_CONCURRENCY))
+    report = run_draft_batch(batch.id)
+    print(f"Lot {batch.id} : {report['succeeded']}/{report['total']} avis en {report['duration_seconds']} s "
+          f"({report['reviews_per_second']} avis/s, {report['tokens_per_second']} jetons/s, "
+          f"{report['retries']} nouvelles tentatives, {report['failed']} échecs)")
+
+@app.route('/api/review-cache/stats')
+@jwt_required()
+def review_cache_stats():
+    return jsonify(review_cache.snapshot())
+
+@app.route('/api/ingestion/stats')
+@jwt_required()
+def ingestion_stats():
+    if ingestion_buffer is None:
+        return jsonify({"mode": "direct"})
+    return jsonify(dict(ingestion_buffer.snapshot(), mode="buffered"))
+
+@app.route('/api/metrics')
+@limiter.exempt
+def prometheus_metrics():
+    """Métriques Prometheus du worker courant (jeton METRICS_TOKEN ou JWT admin)."""
+    # Comparaison en temps constant : le jeton ne se devine pas caractère par caractère.
+    authorization = request.headers.get('Authorization', '').encode('utf-8')
+    if not METRICS_TOKEN or not hmac.compare_digest(authorization, f"Bearer {METRICS_TOKEN}".encode('utf-8')):
+        verify_jwt_in_request()
+    return Response(metrics.registry.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/admin/db-pool')
+@jwt_required()
+def db_pool_stats():
+    status = dict(pool_status(db.engine), pid=os.getpid())
+    if replica_router is not None:
+        status["replica"] = dict(pool_status(db.engines[REPLICA_BIND_KEY]), **replica_router.snapshot())
+    return jsonify(status)
+
+@app.route('/api/llm/stats')
+@jwt_required()
+def llm_stats():
+    return jsonify(dict(review_llm.snapshot(), fallback_model=LLM_FALLBACK_MODEL or None))
+
+@app.route('/api/analytics-cache/stats')
+@jwt_required()
+def analytics_cache_stats():
+    return jsonify(analytics_cache.snapshot())
 
 # --- ROUTES DU DASHBOARD (protégées par @jwt_required) ---
 
+@replica_reads()
+def query_server_day_counts(tenant_id, start_day):
+    """
+    Avis par (jour, serveur) depuis `start_day` ou depuis le début de l'historique.
+    Les 14 derniers jours sont toujours inclus pour la courbe de tendance.
+    """
+    trend_start = datetime.utcnow().date() - timedelta(days=13)
+    query = db.session.query(
+        DailyServerRollup.day,
+        DailyServerRollup.server_name,
+        func.sum(DailyServerRollup.review_count)
+    ).filter(
+        DailyServerRollup.tenant_id == tenant_id
+    )
+    if start_day:
+        query = query.filter(DailyServerRollup.day >= min(start_day, trend_start))
+    rows = query.group_by(DailyServerRollup.day, DailyServerRollup.server_name).all()
+    return [(day, server_name, int(count)) for day, server_name, count in rows]
+
+def build_server_ranking(server_day_counts, start_day):
+    totals = Counter()
+    for day, server_name, count in server_day_counts:
+        if not start_day or day >= start_day:
+            totals[server_name] += count
+    return [{"server": server, "count": count} for server, count in totals.most_common()]
+
+def build_overview(server_day_counts, period):
+    today = datetime.utcnow().date()
+    start_day = period_start_day(period)
+
+    if start_day:
+        days_in_period = (today - start_day).days + 1
+        reviews_in_period = sum(count for day, _, count in server_day_counts if day >= start_day)
+    else:
+        first_review_day = min((day for day, _, _ in server_day_counts), default=None)
+        days_in_period = (today - first_review_day).days if first_review_day else 0
+        reviews_in_period = sum(count for _, _, count in server_day_counts)
+
+    average_reviews_per_day = 0.0
+    if days_in_period > 0:
+        average_reviews_per_day = round(reviews_in_period / days_in_period, 1)
+    elif reviews_in_period > 0:
+        average_reviews_per_day = float(reviews_in_period)
+
+    trend_data_dict = {}
+    for i in range(14):
+        date = today - timedelta(days=i)
+        trend_data_dict[date] = 0
+
+    for day, _, count in server_day_counts:
+        if day in trend_data_dict:
+            trend_data_dict[day] += count
+
+    trend_data_list = [{"date": dt.isoformat(), "count": count} for dt, count in sorted(trend_data_dict.items())]
+
+    return {
+        "stats": {
+            "reviews_in_period": reviews_in_period,
+            "average_reviews_per_day": average_reviews_per_day,
+        },
+        "trend": trend_data_list
+    }
+
+@replica_reads()
+def query_menu_performance(tenant_id, start_day):
+    query = db.session.query(
+        DailyDishRollup.dish_name,
+        DailyDishRollup.dish_category,
+        func.sum(DailyDishRollup.selection_count).label('selection_count')
+    ).filter(
+        DailyDishRollup.tenant_id == tenant_id
+    )
+    if start_day:
+        query = query.filter(DailyDishRollup.day >= start_day)
+
+    results = query.group_by(
+        DailyDishRollup.dish_name,
+        DailyDishRollup.dish_category
+    ).order_by(
+        desc('selection_count')
+    ).all()
+
+    return [{
+        "dish_name": name,
+        "dish_category": category,
+        "selection_count": int(count)
+    } for name, category, count in results]
+
+@replica_reads()
+def query_qualitative_synthesis(tenant_id, start_day):
+    # Une seule requête groupée pour les deux catégories affichées.
+    query = db.session.query(
+        DailyQualitativeRollup.category,
+        DailyQualitativeRollup.value,
+        func.sum(DailyQualitativeRollup.value_count).label('count')
+    ).filter(
+        DailyQualitativeRollup.tenant_id == tenant_id,
+        DailyQualitativeRollup.category.in_(['service_qualities', 'atmosphere'])
+    )
+    if start_day:
+        query = query.filter(DailyQualitativeRollup.day >= start_day)
+
+    results = query.group_by(
+        DailyQualitativeRollup.category,
+        DailyQualitativeRollup.value
+    ).order_by(
+        desc('count')
+    ).all()
+
+    synthesis = {"service_qualities": [], "atmosphere": []}
+    for category, value, count in results:
+        synthesis[category].append({"value": value, "count": int(count)})
+    return synthesis
+
+@replica_reads()
+def query_unread_feedback_summary(tenant_id):
+    row = db.session.query(
+        InternalFeedback,
+        Server.name,
+        func.count(InternalFeedback.id).over()
+    ).outerjoin(
+        Server, InternalFeedback.associated_server_id == Server.id
+    ).filter(
+        InternalFeedback.tenant_id == tenant_id,
+        InternalFeedback.status == 'new'
+    ).order_by(
+        desc(InternalFeedback.created_at)
+    ).first()
+
+    if not row:
+        return {"count": 0, "latest": None}
+    feedback, server_name, total = row
+    return {
+        "count": total,
+        "latest": {
+            "id": feedback.id,
+            "feedback_text": feedback.feedback_text,
+            "status": feedback.status,
+            "created_at": feedback.created_at.isoformat(),
+            "server_name": server_name if server_name else "Non spécifié"
+        }
+    }
+
+@replica_reads()
+def query_server_ranking(tenant_id, start_day):
+    query = db.session.query(
+        DailyServerRollup.server_name, 
+        func.sum(DailyServerRollup.review_count).label('review_count')
+    ).filter(
+        DailyServerRollup.tenant_id == tenant_id
+    )
+    if start_day:
+        query = query.filter(DailyServerRollup.day >= start_day)
+
+    ranking_results = query.group_by(DailyServerRollup.server_name).order_by(desc('review_count')).all()
+    return [{"server": server, "count": int(count)} for server, count in ranking_results]
+
 @app.route('/api/server-stats')
 @jwt_required()
 def server_stats():
     period = request.args.get('period', 'all')
+    tenant_id = admin_tenant_id()
     try:
-        query = db.session.query(
-            GeneratedReview.server_name, 
-            func.count(GeneratedReview.id).label('review_count')
-        )
-
-        if period == '7days':
-            query = query.filter(GeneratedReview.created_at >= (datetime.utcnow() - timedelta(days=7)))
-        elif period == '30days':
-            query = query.filter(GeneratedReview.created_at >= (datetime.utcnow() - timedelta(days=30)))
-
-        ranking_results = query.group_by(GeneratedReview.server_name).order_by(desc('review_count')).all()
-        ranking_data = [{"server": server, "count": count} for server, count in ranking_results]
-        return jsonify(ranking_data)
+        return jsonify(analytics_cache.get_or_compute(
+            'server_stats', {"period": period}, lambda: query_server_ranking(tenant_id, period_start_day(period)),
+            scope=tenant_id
+        ))
     except Exception as e:
         print(f"Erreur du dashboard (stats serveurs): {e}")
         traceback.print_exc()
@@ -329,64 +1746,13 @@ def server_stats():
 @jwt_required()
 def dashboard_data():
     period = request.args.get('period', 'all')
+    tenant_id = admin_tenant_id()
     try:
-        base_query = GeneratedReview.query
-        end_date = datetime.utcnow()
-        
-        days_in_period = 0
-        if period == '7days':
-            start_date = end_date - timedelta(days=7)
-            days_in_period = 7
-            base_query = base_query.filter(GeneratedReview.created_at >= start_date)
-        elif period == '30days':
-            start_date = end_date - timedelta(days=30)
-            days_in_period = 30
-            base_query = base_query.filter(GeneratedReview.created_at >= start_date)
-        else:
-            first_review_date = db.session.query(func.min(GeneratedReview.created_at)).scalar()
-            if first_review_date:
-                days_in_period = (end_date.date() - first_review_date.date()).days
-            else:
-                days_in_period = 0
-        
-        reviews_in_period = base_query.count()
-        
-        average_reviews_per_day = 0.0
-        if days_in_period > 0:
-            average_reviews_per_day = round(reviews_in_period / days_in_period, 1)
-        elif reviews_in_period > 0:
-            average_reviews_per_day = float(reviews_in_period)
-
-        trend_data_dict = {}
-        today = datetime.utcnow().date()
-        for i in range(14):
-            date = today - timedelta(days=i)
-            trend_data_dict[date] = 0
-
-        fourteen_days_ago = today - timedelta(days=13)
-        
-        trend_results = db.session.query(
-            func.date(GeneratedReview.created_at).label('review_date'),
-            func.count(GeneratedReview.id)
-        ).filter(
-            func.date(GeneratedReview.created_at) >= fourteen_days_ago
-        ).group_by('review_date').all()
-
-        for date, count in trend_results:
-            if date in trend_data_dict:
-                trend_data_dict[date] = count
-        
-        trend_data_list = [{"date": dt.isoformat(), "count": count} for dt, count in sorted(trend_data_dict.items())]
-
-        final_data = {
-            "stats": {
-                "reviews_in_period": reviews_in_period,
-                "average_reviews_per_day": average_reviews_per_day,
-            },
-            "trend": trend_data_list
-        }
-        
-        return jsonify(final_data)
+        return jsonify(analytics_cache.get_or_compute(
+            'dashboard', {"period": period},
+            lambda: build_overview(query_server_day_counts(tenant_id, period_start_day(period)), period),
+            scope=tenant_id
+        ))
     except Exception as e:
         print(f"Erreur du dashboard (vue d'ensemble): {e}")
         traceback.print_exc()
@@ -395,129 +1761,284 @@ def dashboard_data():
 @app.route('/api/qualitative-synthesis')
 @jwt_required()
 def qualitative_synthesis_data():
+    period = request.args.get('period', 'all')
+    tenant_id = admin_tenant_id()
     try:
-        service_qualities_query = db.session.query(
-            QualitativeFeedback.value,
-            func.count(QualitativeFeedback.id).label('count')
-        ).filter(
-            QualitativeFeedback.category == 'service_qualities'
-        ).group_by(
-            QualitativeFeedback.value
-        ).order_by(
-            desc('count')
-        ).all()
-
-        atmosphere_query = db.session.query(
-            QualitativeFeedback.value,
-            func.count(QualitativeFeedback.id).label('count')
-        ).filter(
-            QualitativeFeedback.category == 'atmosphere'
-        ).group_by(
-            QualitativeFeedback.value
-        ).order_by(
-            desc('count')
-        ).all()
-
-        service_qualities_data = [{"value": value, "count": count} for value, count in service_qualities_query]
-        atmosphere_data = [{"value": value, "count": count} for value, count in atmosphere_query]
-
-        return jsonify({
-            "service_qualities": service_qualities_data,
-            "atmosphere": atmosphere_data
-        })
+        return jsonify(analytics_cache.get_or_compute(
+            'qualitative_synthesis', {"period": period}, lambda: query_qualitative_synthesis(tenant_id, period_start_day(period)),
+            scope=tenant_id
+        ))
     except Exception as e:
         print(f"Erreur synthèse qualitative: {e}")
         traceback.print_exc()
         return jsonify({"error": "Impossible de charger les données de synthèse qualitative."}), 500
 
-# NOUVELLE ROUTE POUR LA SYNTHÈSE SIF
+def build_dashboard_bundle(tenant_id, period):
+    start_day = period_start_day(period)
+    server_day_counts = query_server_day_counts(tenant_id, start_day)
+    return {
+        "period": period,
+        "overview": build_overview(server_day_counts, period),
+        "server_stats": build_server_ranking(server_day_counts, start_day),
+        "menu_performance": query_menu_performance(tenant_id, start_day),
+        "qualitative_synthesis": query_qualitative_synthesis(tenant_id, start_day),
+        "unread_feedback": query_unread_feedback_summary(tenant_id),
+    }
+
+@app.route('/api/dashboard/bundle')
+@jwt_required()
+def dashboard_bundle():
+    """
+    Tous les panneaux de la vue d'ensemble en un seul aller-retour (4 requêtes SQL) :
+    les agrégats par jour/serveur servent à la fois aux statistiques, à la tendance
+    et au classement des serveurs.
+    """
+    period = request.args.get('period', 'all')
+    tenant_id = admin_tenant_id()
+    try:
+        return jsonify(analytics_cache.get_or_compute(
+            'dashboard_bundle', {"period": period}, lambda: build_dashboard_bundle(tenant_id, period), scope=tenant_id
+        ))
+    except Exception as e:
+        print(f"Erreur du dashboard (bundle): {e}")
+        traceback.print_exc()
+        return jsonify({"error": "Impossible de charger les données du tableau de bord."}), 500
+
+# --- SYNTHÈSE SIF ---
+# Les feedbacks internes sont notés de façon incrémentale (seuls ceux qui n'ont pas encore
+# d'analyse) et par lots, puis la synthèse de chaque période est persistée : la route sert
+# le résultat enregistré et ne relance l'analyse que dans la file sif_refresh_jobs.
+SIF_PERIODS = ['7days', '30days', 'all']
+SIF_MAX_AGE = int(os.getenv("SIF_MAX_AGE", "900"))
+sif_scorer = OpenAIScorer(client) if os.getenv("SIF_SCORER", "lexicon") == "openai" else LexiconScorer()
+sif_refresh_jobs = ReviewJobQueue(workers=1, max_depth=5)
+SIF_COLD_WAIT_SECONDS = float(os.getenv("SIF_COLD_WAIT_SECONDS", "30"))
+
+def insert_feedback_analyses(rows):
+    """Insère les analyses en ignorant celles déjà enregistrées par un recalcul concurrent."""
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ('postgresql', 'sqlite'):
+        if dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        db.session.execute(insert(FeedbackAnalysis).on_conflict_do_nothing(index_elements=['feedback_id']), rows)
+        return
+    db.session.execute(db.insert(FeedbackAnalysis), rows)
+
+def analyze_new_feedback(scorer=None):
+    """Note les feedbacks pas encore analysés, tous restaurants confondus. Renvoie le nombre de feedbacks traités."""
+    scorer = scorer or sif_scorer
+    processed = 0
+    # Anti-jointure plutôt qu'un « id > dernier id analysé » : un feedback validé après un
+    # id plus grand (transactions concurrentes, tampon d'ingestion) n'est jamais sauté.
+    already_analyzed = db.session.query(FeedbackAnalysis.id).filter(
+        FeedbackAnalysis.feedback_id == InternalFeedback.id
+    ).exists()
+    while True:
+        batch = db.session.query(
+            InternalFeedback.id, InternalFeedback.tenant_id, InternalFeedback.feedback_text, InternalFeedback.created_at
+        ).filter(
+            ~already_analyzed
+        ).order_by(InternalFeedback.id).limit(scorer.batch_size).all()
+        if not batch:
+            return processed
+        results = scorer.score_batch([feedback_text for _, _, feedback_text, _ in batch])
+        insert_feedback_analyses([{
+            "tenant_id": tenant_id,
+            "feedback_id": feedback_id,
+            "day": (created_at or datetime.utcnow()).date(),
+            "score": result['score'],
+            "category": result['category'],
+            "theme": result['theme'],
+        } for (feedback_id, tenant_id, _, created_at), result in zip(batch, results)])
+        db.session.commit()
+        processed += len(batch)
+
+def compute_sif_synthesis(tenant_id, period):
+    start_day = period_start_day(period)
+    today = datetime.utcnow().date()
+    analyses_query = db.session.query(
+        FeedbackAnalysis.day, FeedbackAnalysis.score, FeedbackAnalysis.category, FeedbackAnalysis.theme
+    ).filter(
+        FeedbackAnalysis.tenant_id == tenant_id
+    )
+    if start_day:
+        analyses_query = analyses_query.filter(FeedbackAnalysis.day >= min(start_day, today - timedelta(days=6)))
+    analyses = analyses_query.all()
+
+    qualitative_query = db.session.query(
+        DailyQualitativeRollup.category,
+        DailyQualitativeRollup.value,
+        func.sum(DailyQualitativeRollup.value_count)
+    ).filter(
+        DailyQualitativeRollup.tenant_id == tenant_id
+    )
+    if start_day:
+        qualitative_query = qualitative_query.filter(DailyQualitativeRollup.day >= start_day)
+    qualitative_counts = [
+        (category, value, int(count))
+        for category, value, count in qualitative_query.group_by(DailyQualitativeRollup.category, DailyQualitativeRollup.value)
+    ]
+
+    trend_days = [today - timedelta(days=i) for i in range(6, -1, -1)]
+    period_analyses = [row for row in analyses if not start_day or row[0] >= start_day]
+    synthesis = synthesize(period_analyses, qualitative_counts, trend_days)
+    # La courbe couvre toujours les 7 derniers jours, quelle que soit la période.
+    synthesis['sentiment_trend'] = synthesize(analyses, [], trend_days)['sentiment_trend']
+    return synthesis
+
+def latest_feedback_id(tenant_id):
+    return db.session.query(func.max(InternalFeedback.id)).filter(InternalFeedback.tenant_id == tenant_id).scalar() or 0
+
+def refresh_sif_synthesis(tenant_id, periods=SIF_PERIODS):
+    analyze_new_feedback()
+    watermark = latest_feedback_id(tenant_id)
+    for period in periods:
+        payload = compute_sif_synthesis(tenant_id, period)
+        result = db.session.get(SifSynthesisResult, (tenant_id, period)) or SifSynthesisResult(tenant_id=tenant_id, period=period)
+        result.payload = json.dumps(payload, ensure_ascii=False)
+        result.watermark = watermark
+        result.computed_at = datetime.utcnow()
+        db.session.add(result)
+    db.session.commit()
+
+def refresh_sif_synthesis_in_background(tenant_id):
+    with app.app_context():
+        refresh_sif_synthesis(tenant_id)
+
+@app.cli.command('sif-refresh')
+@without_statement_timeout()
+def sif_refresh_command():
+    """Analyse les nouveaux feedbacks et recalcule les synthèses SIF de chaque restaurant (flask --app app sif-refresh)."""
+    for tenant in tenant_directory.all():
+        refresh_sif_synthesis(tenant['id'])
+    print("Synthèses SIF recalculées.")
+
 @app.route('/api/sif-synthesis')
 @jwt_required()
 def sif_synthesis():
     """
-    Cette route simule une analyse par IA des feedbacks pour la page SIF.
-    En production, cette route contiendrait une logique complexe d'analyse de texte.
-    Pour l'instant, elle renvoie des données factices structurées.
+    Synthèse SIF précalculée pour la période demandée. Si de nouveaux feedbacks sont
+    arrivés ou si le résultat a plus de SIF_MAX_AGE secondes, le résultat enregistré est
+    servi tel quel et un recalcul incrémental est lancé en arrière-plan.
     """
-    period = request.args.get('period', 'all') # Le paramètre 'period' est disponible si besoin
+    period = request.args.get('period', 'all')
+    if period not in SIF_PERIODS:
+        period = 'all'
+    tenant_id = admin_tenant_id()
     
     try:
-        # Ici, vous mettriez votre logique d'analyse des feedbacks
-        # Pour la démonstration, nous renvoyons des données fixes.
-        dummy_data = {
-            "strengths": [
-                "Service rapide et efficace",
-                "Ambiance festive et musicale appréciée",
-                "Qualité des cocktails",
-                "Serveurs jugés très professionnels"
-            ],
-            "weaknesses": [
-                "Temps d'attente parfois long le week-end",
-                "Niveau sonore élevé pour certains clients",
-                "Manque de certaines options végétariennes"
-            ],
-            "suggestions": [
-                {
-                    "category": "Service",
-                    "suggestion": "Envisager un système de file d'attente virtuelle pour réduire la perception d'attente."
-                },
-                {
-                    "category": "Ambiance",
-                    "suggestion": "Créer des zones 'plus calmes' pour les clients désirant moins de bruit."
-                },
-                {
-                    "category": "Menu",
-                    "suggestion": "Développer 2-3 plats végétariens créatifs supplémentaires pour élargir l'offre."
-                }
-            ],
-            "sentiment_trend": [
-                {"date": (datetime.utcnow() - timedelta(days=6)).isoformat(), "score": 65},
-                {"date": (datetime.utcnow() - timedelta(days=5)).isoformat(), "score": 70},
-                {"date": (datetime.utcnow() - timedelta(days=4)).isoformat(), "score": 68},
-                {"date": (datetime.utcnow() - timedelta(days=3)).isoformat(), "score": 75},
-                {"date": (datetime.utcnow() - timedelta(days=2)).isoformat(), "score": 80},
-                {"date": (datetime.utcnow() - timedelta(days=1)).isoformat(), "score": 78},
-                {"date": datetime.utcnow().isoformat(), "score": 82}
-            ],
-            "categories": [
-                {"name": "Service", "score": 85},
-                {"name": "Ambiance", "score": 90},
-                {"name": "Cuisine", "score": 78},
-                {"name": "Propreté", "score": 95}
-            ]
-        }
-        return jsonify(dummy_data)
+        result = db.session.get(SifSynthesisResult, (tenant_id, period))
+        if result is None:
+            # Premier calcul : il passe lui aussi par la file (un seul recalcul à la fois
+            # par worker), la requête attend son résultat.
+            try:
+                job_id = sif_refresh_jobs.submit(refresh_sif_synthesis_in_background, tenant_id)
+                sif_refresh_jobs.wait(job_id, SIF_COLD_WAIT_SECONDS)
+                retry_after = sif_refresh_jobs.retry_after()
+            except QueueFullError as e:
+                retry_after = e.retry_after
+            # Nouvelle transaction pour voir le résultat validé par le job.
+            db.session.rollback()
+            result = db.session.get(SifSynthesisResult, (tenant_id, period))
+            if result is None:
+                response = jsonify({"error": "Synthèse en cours de calcul, veuillez réessayer dans un instant."})
+                response.headers['Retry-After'] = str(retry_after)
+                return response, 503
+        else:
+            age = (datetime.utcnow() - result.computed_at).total_seconds()
+            if result.watermark != latest_feedback_id(tenant_id) or age > SIF_MAX_AGE:
+                try:
+                    sif_refresh_jobs.submit(refresh_sif_synthesis_in_background, tenant_id)
+                except QueueFullError:
+                    pass
+        payload = json.loads(result.payload)
+        payload['computed_at'] = result.computed_at.isoformat()
+        return jsonify(payload)
 
     except Exception as e:
+        db.session.rollback()
         print(f"Erreur dans /api/sif-synthesis: {e}")
         traceback.print_exc()
         return jsonify({"error": "Impossible de générer la synthèse SIF."}), 500
 
 
+FEEDBACK_PAGE_SIZE = 50
+FEEDBACK_MAX_PAGE_SIZE = 200
+
+def encode_feedback_cursor(feedback):
+    raw = f"{feedback.created_at.isoformat()}|{feedback.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_feedback_cursor(cursor):
+    created_at, feedback_id = base64.urlsafe_b64decode(cursor.encode()).decode().rsplit('|', 1)
+    return datetime.fromisoformat(created_at), int(feedback_id)
+
+def feedback_search_filter(search_term):
+    if db.engine.dialect.name == 'postgresql':
+        # Recherche par préfixe de mots, servie par l'index GIN to_tsvector('simple', ...).
+        words = re.findall(r'\w+', search_term)
+        if not words:
+            return None
+        tsquery = ' & '.join(f"{word}:*" for word in words)
+        return func.to_tsvector(literal_column("'simple'"), InternalFeedback.feedback_text).op('@@')(
+            func.to_tsquery(literal_column("'simple'"), tsquery)
+        )
+    return InternalFeedback.feedback_text.ilike(f'%{search_term}%')
+
 @app.route('/api/internal-feedback', methods=['GET'])
 @jwt_required()
+@replica_reads()
 def get_internal_feedback():
+    """
+    Liste paginée par curseur (created_at, id) : `limit` borne la taille de page et
+    `cursor` reprend la valeur `next_cursor` de la page précédente.
+    """
+    tenant_id = admin_tenant_id()
     status_filter = request.args.get('status', 'new')
     search_term = request.args.get('search', None)
+    cursor = request.args.get('cursor', None)
+    try:
+        limit = min(max(int(request.args.get('limit', FEEDBACK_PAGE_SIZE)), 1), FEEDBACK_MAX_PAGE_SIZE)
+    except ValueError:
+        return jsonify({"error": "Paramètre 'limit' invalide."}), 400
     try:
         query = db.session.query(
             InternalFeedback,
             Server.name
         ).outerjoin(
             Server, InternalFeedback.associated_server_id == Server.id
+        ).filter(
+            InternalFeedback.tenant_id == tenant_id
         )
 
         if status_filter != 'all':
             query = query.filter(InternalFeedback.status == status_filter)
 
         if search_term:
-            query = query.filter(InternalFeedback.feedback_text.ilike(f'%{search_term}%'))
+            search_filter = feedback_search_filter(search_term)
+            if search_filter is not None:
+                query = query.filter(search_filter)
+
+        if cursor:
+            try:
+                cursor_created_at, cursor_id = decode_feedback_cursor(cursor)
+            except ValueError:
+                return jsonify({"error": "Curseur invalide."}), 400
+            query = query.filter(or_(
+                InternalFeedback.created_at < cursor_created_at,
+                and_(InternalFeedback.created_at == cursor_created_at, InternalFeedback.id < cursor_id)
+            ))
 
         query = query.order_by(
-            desc(InternalFeedback.created_at)
+            desc(InternalFeedback.created_at),
+            desc(InternalFeedback.id)
         )
         
-        results = query.all()
+        results = query.limit(limit + 1).all()
+        has_more = len(results) > limit
+        results = results[:limit]
         feedbacks = []
         for feedback, server_name in results:
             feedbacks.append({
@@ -527,7 +2048,8 @@ def get_internal_feedback():
                 "created_at": feedback.created_at.isoformat(),
                 "server_name": server_name if server_name else "Non spécifié"
             })
-        return jsonify(feedbacks)
+        next_cursor = encode_feedback_cursor(results[-1][0]) if has_more else None
+        return jsonify({"items": feedbacks, "next_cursor": next_cursor})
     except Exception as e:
         print(f"Erreur dans /api/internal-feedback: {e}")
         return jsonify({"error": "Impossible de charger les feedbacks."}), 500
@@ -540,11 +2062,12 @@ def update_feedback_status(feedback_id):
     if not new_status or new_status not in ['read', 'archived', 'new']:
         return jsonify({"error": "Statut invalide."}), 400
     feedback = db.session.get(InternalFeedback, feedback_id)
-    if not feedback:
+    if not feedback or feedback.tenant_id != admin_tenant_id():
         return jsonify({"error": "Feedback non trouvé."}), 404
     try:
         feedback.status = new_status
         db.session.commit()
+        analytics_cache.mark_stale(feedback.tenant_id)
         return jsonify({"success": True, "message": f"Feedback {feedback_id} mis à jour à '{new_status}'."})
     except Exception as e:
         db.session.rollback()
@@ -555,41 +2078,160 @@ def update_feedback_status(feedback_id):
 @jwt_required()
 def menu_performance_data():
     period = request.args.get('period', 'all')
+    tenant_id = admin_tenant_id()
     try:
-        query = db.session.query(
-            MenuSelection.dish_name,
-            MenuSelection.dish_category,
-            func.count(MenuSelection.id).label('selection_count')
-        )
-        if period == '7days':
-            query = query.filter(MenuSelection.selection_timestamp >= (datetime.utcnow() - timedelta(days=7)))
-        elif period == '30days':
-            query = query.filter(MenuSelection.selection_timestamp >= (datetime.utcnow() - timedelta(days=30)))
-        
-        results = query.group_by(
-            MenuSelection.dish_name,
-            MenuSelection.dish_category
-        ).order_by(
-            desc('selection_count')
-        ).all()
-
-        data = [{
-            "dish_name": name,
-            "dish_category": category,
-            "selection_count": count
-        } for name, category, count in results]
-        return jsonify(data)
+        return jsonify(analytics_cache.get_or_compute(
+            'menu_performance', {"period": period}, lambda: query_menu_performance(tenant_id, period_start_day(period)),
+            scope=tenant_id
+        ))
     except Exception as e:
         print(f"Erreur performance menu: {e}")
         traceback.print_exc()
         return jsonify({"error": "Impossible de charger les données de performance."}), 500
 
+# --- EXPORTS CSV / JSONL (en streaming) ---
+# Les lignes sont lues par lots avec un curseur côté serveur (yield_per) et envoyées au
+# fil de l'eau : la mémoire reste constante et le téléchargement démarre tout de suite.
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "2000"))
+
+def export_datasets():
+    """{nom: (colonne de temps, colonne tenant_id, colonnes exportées)}."""
+    return {
+        'reviews': (GeneratedReview.created_at, GeneratedReview.tenant_id, [
+            GeneratedReview.id, GeneratedReview.server_name, GeneratedReview.created_at,
+        ]),
+        'menu_selections': (MenuSelection.selection_timestamp, MenuSelection.tenant_id, [
+            MenuSelection.id, MenuSelection.dish_name, MenuSelection.dish_category, MenuSelection.selection_timestamp,
+        ]),
+        'qualitative_feedback': (QualitativeFeedback.created_at, QualitativeFeedback.tenant_id, [
+            QualitativeFeedback.id, QualitativeFeedback.category, QualitativeFeedback.value, QualitativeFeedback.created_at,
+        ]),
+        'internal_feedback': (InternalFeedback.created_at, InternalFeedback.tenant_id, [
+            InternalFeedback.id, InternalFeedback.feedback_text, InternalFeedback.status,
+            Server.name.label('server_name'), InternalFeedback.created_at,
+        ]),
+    }
+
+def parse_export_range(args):
+    """(premier jour inclus, dernier jour inclus) depuis start/end (AAAA-MM-JJ) ou period."""
+    start, end = args.get('start'), args.get('end')
+    if start or end:
+        start_day = datetime.strptime(start, '%Y-%m-%d').date() if start else None
+        end_day = datetime.strptime(end, '%Y-%m-%d').date() if end else None
+        return start_day, end_day
+    return period_start_day(args.get('period', 'all')), None
+
+def export_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+# Une cellule commençant par l'un de ces caractères est interprétée comme une formule
+# par Excel/LibreOffice : préfixée d'une apostrophe, elle reste du texte.
+CSV_FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+def csv_cell(value):
+    value = export_value(value)
+    if isinstance(value, str) and value.startswith(CSV_FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+def export_csv_chunks(column_names, batches):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # BOM UTF-8 : Excel ouvre alors correctement les accents.
+    buffer.write('\ufeff')
+    writer.writerow(column_names)
+    yield buffer.getvalue()
+    for rows in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows([csv_cell(value) for value in row] for row in rows)
+        yield buffer.getvalue()
+
+def export_jsonl_chunks(column_names, batches):
+    for rows in batches:
+        yield ''.join(
+            json.dumps({name: export_value(value) for name, value in zip(column_names, row)}, ensure_ascii=False) + '\n'
+            for row in rows
+        )
+
+def gzip_chunks(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+@app.route('/api/export/<dataset>')
+@jwt_required()
+def export_dataset(dataset):
+    datasets = export_datasets()
+    if dataset not in datasets:
+        return jsonify({"error": f"Export inconnu. Valeurs possibles : {', '.join(datasets)}."}), 404
+    export_format = request.args.get('format', 'csv')
+    if export_format not in ('csv', 'jsonl'):
+        return jsonify({"error": "Format invalide (csv ou jsonl)."}), 400
+    try:
+        start_day, end_day = parse_export_range(request.args)
+    except ValueError:
+        return jsonify({"error": "Dates invalides (format attendu : AAAA-MM-JJ)."}), 400
+    use_gzip = request.args.get('gzip', 'false').lower() in ('1', 'true')
+
+    timestamp_column, tenant_id_column, columns = datasets[dataset]
+    tenant = tenant_directory.by_id(admin_tenant_id())
+    stmt = db.select(*columns).where(tenant_id_column == tenant['id']).order_by(columns[0])
+    if dataset == 'internal_feedback':
+        stmt = stmt.outerjoin(Server, InternalFeedback.associated_server_id == Server.id)
+    if start_day:
+        stmt = stmt.where(timestamp_column >= day_start_bound(timestamp_column, start_day))
+    if end_day:
+        stmt = stmt.where(timestamp_column < day_start_bound(timestamp_column, end_day + timedelta(days=1)))
+    column_names = [column.key for column in columns]
+
+    def batches():
+        try:
+            with replica_reads():
+                result = db.session.execute(stmt.execution_options(yield_per=EXPORT_BATCH_SIZE))
+            for rows in result.partitions():
+                yield rows
+        except Exception as e:
+            print(f"Erreur lors de l'export {dataset}: {e}")
+            traceback.print_exc()
+            raise
+
+    chunks = (export_csv_chunks if export_format == 'csv' else export_jsonl_chunks)(column_names, batches())
+    filename = f"{tenant['slug']}-{dataset}-{start_day or 'debut'}-{end_day or 'aujourdhui'}.{export_format}"
+    if use_gzip:
+        body = gzip_chunks(chunks)
+        mimetype = 'application/gzip'
+        filename += '.gz'
+    else:
+        body = (chunk.encode('utf-8') for chunk in chunks)
+        mimetype = 'text/csv' if export_format == 'csv' else 'application/x-ndjson'
+
+    response = Response(stream_with_context(body), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
 @app.route('/api/reset-data', methods=['POST'])
 @jwt_required()
 def reset_data():
+    tenant_id = admin_tenant_id()
     try:
-        db.session.execute(text('TRUNCATE TABLE generated_review, menu_selections, internal_feedback, qualitative_feedback RESTART IDENTITY CASCADE;'))
+        if len(tenant_directory.all()) == 1:
+            # Un seul restaurant : TRUNCATE, et suppression des partitions (immédiate, quel que soit leur volume).
+            for model, _ in partitioned_event_tables():
+                conn = db.session.connection()
+                partitions.drop_all_partitions(conn, model.__tablename__)
+                partitions.ensure_partitions(conn, model.__tablename__, datetime.utcnow().date(), PARTITION_MONTHS_AHEAD)
+            db.session.execute(text('TRUNCATE TABLE generated_review, menu_selections, internal_feedback, qualitative_feedback, daily_server_rollup, daily_dish_rollup, daily_qualitative_rollup, feedback_analysis, sif_synthesis_result RESTART IDENTITY CASCADE;'))
+        else:
+            for model in (FeedbackAnalysis, SifSynthesisResult, InternalFeedback, GeneratedReview, MenuSelection,
+                          QualitativeFeedback, DailyServerRollup, DailyDishRollup, DailyQualitativeRollup):
+                db.session.execute(db.delete(model).where(model.tenant_id == tenant_id))
         db.session.commit()
+        analytics_cache.clear(tenant_id)
         return jsonify({"success": True, "message": "Toutes les données de performance et d'avis ont été réinitialisées."})
     except Exception as e:
         db.session.rollback()
@@ -597,5 +2239,73 @@ def reset_data():
         traceback.print_exc()
         return jsonify({"error": "Une erreur est survenue lors de la réinitialisation."}), 500
 
+# --- PAGES ET FICHIERS STATIQUES (précompressés, à empreinte) ---
+# index.html, admin.html et assets/ servis depuis un build (flask --app app build-assets) :
+# variantes brotli/gzip choisies selon Accept-Encoding, images à empreinte mises en cache
+# un an, pages revalidées par ETag. Voir static_assets.py.
+static_assets = StaticAssets(
+    os.path.dirname(os.path.abspath(__file__)),
+    os.getenv("STATIC_BUILD_DIR", os.path.join(app.instance_path, "static")),
+)
+
+def serve_static(path):
+    response = static_assets.response(path, dict(request.accept_encodings), request.headers.get('If-None-Match'))
+    if response is None:
+        return jsonify({"error": "Fichier introuvable."}), 404
+    return response
+
+@app.route('/')
+@limiter.exempt
+def index_page():
+    return serve_static('index.html')
+
+@app.route('/admin')
+@limiter.exempt
+def admin_page():
+    return serve_static('admin.html')
+
+@app.route('/<page>.html')
+@limiter.exempt
+def html_page(page):
+    return serve_static(f'{page}.html')
+
+@app.route('/assets/<path:filename>')
+@limiter.exempt
+def asset_file(filename):
+    return serve_static(f'assets/{filename}')
+
+@app.cli.command('build-assets')
+def build_assets_command():
+    """Précompresse et empreinte les pages et images (flask --app app build-assets), à chaque déploiement."""
+    manifest = write_build(static_assets.root, static_assets.build_dir)
+    for route, entry in sorted(manifest['routes'].items()):
+        encodings = ', '.join(entry['encodings']) or '-'
+        print(f"{route} -> {entry['file']} ({encodings})")
+    static_assets.reload()
+
+# --- DÉMARRAGE DU SERVEUR ---
+# gunicorn "app:create_app()" : l'import du module ne fait ni connexion à la base ni appel
+# réseau, si bien que gunicorn peut le précharger une fois dans le maître (preload_app)
+# puis forker des workers prêts immédiatement.
+def check_database_url():
+    if not os.getenv('DATABASE_URL'):
+        raise RuntimeError("DATABASE_URL is not set.")
+
+def create_app():
+    """Vérifie la configuration et renvoie l'application ; AUTO_MIGRATE=true applique aussi les migrations."""
+    check_database_url()
+    if not DASHBOARD_PASSWORD:
+        raise RuntimeError("DASHBOARD_PASSWORD n'est pas définie. Veuillez la définir dans vos variables d'environnement.")
+    if os.getenv("AUTO_MIGRATE", "false").lower() == "true":
+        migrate_schema()
+    return app
+
+def after_fork():
+    """Dans chaque worker d'une application préchargée : pas de connexion SQL héritée du maître."""
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+
 if __name__ == '__main__':
-    app.run(debug=True)
+    migrate_schema()
+    create_app().run(debug=True)
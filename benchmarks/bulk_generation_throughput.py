@@ -0,0 +1,98 @@
+"""
+Débit de la génération d'avis en masse (brouillons) selon la concurrence, avec un
+client OpenAI factice à latence fixe qui renvoie une part de réponses 429.
+
+    python benchmarks/bulk_generation_throughput.py [--items 200] [--concurrency 1 4 16] \\
+        [--openai-latency-ms 500] [--rate-limit-ratio 0.05] [--output bulk.json]
+
+Utilise une base SQLite temporaire : aucun service externe.
+"""
+import argparse
+import json
+import random
+import threading
+import types
+
+from common import FakeCompletions, configure_environment, load_app
+from seed import DISHES, QUALITATIVE, SERVERS
+
+
+class FakeRateLimitError(Exception):
+    """Imite openai.RateLimitError : status_code 429 et en-tête Retry-After."""
+
+    status_code = 429
+
+    def __init__(self, retry_after):
+        super().__init__("Rate limit reached")
+        self.response = types.SimpleNamespace(headers={"retry-after": str(retry_after)})
+
+
+class RateLimitedCompletions(FakeCompletions):
+    def __init__(self, latency_ms, rate_limit_ratio, retry_after, seed=0):
+        super().__init__(latency_ms)
+        self.rate_limit_ratio = rate_limit_ratio
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.rate_limited = 0
+
+    def create(self, **kwargs):
+        with self.lock:
+            limited = self.random.random() < self.rate_limit_ratio
+            self.rate_limited += limited
+        if limited:
+            raise FakeRateLimitError(self.retry_after)
+        return super().create(**kwargs)
+
+
+def random_items(count, seed=0):
+    rng = random.Random(seed)
+    dishes = [dish for category_dishes in DISHES.values() for dish in category_dishes]
+    items = []
+    for _ in range(count):
+        tags = [{"category": "dish", "value": dish} for dish in rng.sample(dishes, rng.randint(1, 3))]
+        for category, values in QUALITATIVE.items():
+            tags.append({"category": category, "value": rng.choice(values)})
+        tags.append({"category": "server_name", "value": rng.choice(SERVERS)})
+        items.append({"tags": tags, "lang": rng.choice(["fr", "en", "it"])})
+    return items
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--openai-latency-ms", type=float, default=500)
+    parser.add_argument("--rate-limit-ratio", type=float, default=0.05)
+    parser.add_argument("--retry-after", type=float, default=0.2)
+    parser.add_argument("--output", help="Fichier JSON de résultats (sinon stdout).")
+    args = parser.parse_args()
+
+    configure_environment(extra_env={"BULK_MAX_CONCURRENCY": max(args.concurrency)})
+    siena = load_app()
+    items = siena.parse_bulk_items(random_items(args.items))
+
+    report = {"items": args.items, "openai_latency_ms": args.openai_latency_ms,
+              "rate_limit_ratio": args.rate_limit_ratio, "results": []}
+    for concurrency in args.concurrency:
+        completions = RateLimitedCompletions(args.openai_latency_ms, args.rate_limit_ratio, args.retry_after)
+        siena.client.chat = types.SimpleNamespace(completions=completions)
+        with siena.app.app_context():
+            batch = siena.create_draft_batch(siena.DEFAULT_TENANT_ID, items, concurrency)
+            result = siena.run_draft_batch(batch.id)
+        result.update(concurrency=concurrency, rate_limited_responses=completions.rate_limited)
+        report["results"].append(result)
+        print(f"concurrence {concurrency:>3} : {result['reviews_per_second']:>7} avis/s "
+              f"{result['tokens_per_second']:>9} jetons/s  {result['retries']} nouvelles tentatives, "
+              f"{result['failed']} échecs en {result['duration_seconds']} s")
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Outils partagés par les benchmarks : base SQLite temporaire par défaut, import de
+l'application et client OpenAI factice à latence configurable.
+"""
+import os
+import sys
+import tempfile
+import time
+import types
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def configure_environment(database_url=None, extra_env=None):
+    """À appeler avant load_app() : l'application lit sa configuration à l'import."""
+    if database_url:
+        os.environ["DATABASE_URL"] = database_url
+    elif "DATABASE_URL" not in os.environ:
+        db_dir = tempfile.mkdtemp(prefix="siena-bench-")
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(db_dir, 'bench.sqlite')}"
+    os.environ.setdefault("DASHBOARD_PASSWORD", "bench")
+    os.environ.setdefault("OPENAI_API_KEY", "sk-bench")
+    for name, value in (extra_env or {}).items():
+        os.environ[name] = str(value)
+
+
+def load_app():
+    import app as siena
+    siena.migrate_schema()
+    siena.limiter.enabled = False
+    return siena
+
+
+class FakeCompletions:
+    """Imite client.chat.completions.create, en mode simple ou stream=True."""
+
+    def __init__(self, latency_ms=0.0, review="Un dîner délicieux chez Siena, service attentionné et ambiance chaleureuse."):
+        self.latency = latency_ms / 1000.0
+        self.review = review
+
+    def create(self, **kwargs):
+        usage = types.SimpleNamespace(prompt_tokens=120, completion_tokens=80, total_tokens=200)
+        if kwargs.get("stream"):
+            return self._stream(usage)
+        time.sleep(self.latency)
+        message = types.SimpleNamespace(content=self.review)
+        return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)], usage=usage)
+
+    def _stream(self, usage):
+        words = self.review.split(" ")
+        for word in words:
+            time.sleep(self.latency / len(words))
+            delta = types.SimpleNamespace(content=word + " ")
+            yield types.SimpleNamespace(choices=[types.SimpleNamespace(delta=delta)], usage=None)
+        yield types.SimpleNamespace(choices=[], usage=usage)
+
+
+def install_fake_openai(siena, latency_ms=0.0):
+    siena.client.chat = types.SimpleNamespace(completions=FakeCompletions(latency_ms))
+
+
+def admin_token(siena):
+    from flask_jwt_extended import create_access_token
+    with siena.app.app_context():
+        return create_access_token(identity="admin")
@@ -0,0 +1,158 @@
+"""
+Latences de génération d'un avis avec et sans la couche résiliente (délai maximal,
+hedging, disjoncteur, replis), face à un client OpenAI factice qui injecte une queue
+de latence lente, des erreurs et une panne temporaire.
+
+    python benchmarks/llm_tail_latency.py [--requests 400] [--concurrency 8] \\
+        [--latency-ms 300] [--slow-ratio 0.05] [--slow-ms 20000] [--error-ratio 0.02] \\
+        [--outage-start 0.5 --outage-length 0.2] [--output tail.json]
+
+Utilise une base SQLite temporaire : aucun service externe.
+"""
+import argparse
+import json
+import random
+import statistics
+import threading
+import time
+import types
+from concurrent.futures import ThreadPoolExecutor
+
+from common import configure_environment, load_app
+
+
+class FakeAPIError(Exception):
+    status_code = 500
+
+
+class FakeTimeoutError(Exception):
+    """Imite openai.APITimeoutError : le SDK abandonne l'appel après `timeout` secondes."""
+
+
+class FaultyCompletions:
+    """
+    Faux client.chat.completions : latence de base +/- 30 %, une part d'appels très
+    lents, une part d'erreurs, et une panne (toutes les requêtes en erreur) pendant une
+    fenêtre de la série. Le modèle de repli répond plus vite et ne tombe pas en panne.
+    """
+
+    def __init__(self, latency_ms, slow_ratio, slow_ms, error_ratio, fallback_latency_ms, seed=0):
+        self.latency = latency_ms / 1000
+        self.slow_ratio = slow_ratio
+        self.slow = slow_ms / 1000
+        self.error_ratio = error_ratio
+        self.fallback_latency = fallback_latency_ms / 1000
+        self.outage = False
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def create(self, model, timeout=None, **kwargs):
+        with self.lock:
+            draw = self.random.random()
+            jitter = self.random.uniform(0.7, 1.3)
+        if model != "gpt-4o":
+            latency, fails = self.fallback_latency * jitter, False
+        else:
+            latency = self.slow if draw < self.slow_ratio else self.latency * jitter
+            fails = self.outage or self.slow_ratio <= draw < self.slow_ratio + self.error_ratio
+        if timeout is not None and latency > timeout:
+            time.sleep(timeout)
+            raise FakeTimeoutError(f"Request timed out after {timeout} s")
+        time.sleep(latency)
+        if fails:
+            raise FakeAPIError("Internal server error")
+        message = types.SimpleNamespace(content=f"Avis généré par {model}.")
+        usage = types.SimpleNamespace(prompt_tokens=120, completion_tokens=80, total_tokens=200)
+        return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)], usage=usage)
+
+
+def summary(durations):
+    durations = sorted(durations)
+    return {
+        "p50_ms": round(durations[len(durations) // 2] * 1000),
+        "p95_ms": round(durations[int(len(durations) * 0.95)] * 1000),
+        "p99_ms": round(durations[int(len(durations) * 0.99)] * 1000),
+        "max_ms": round(durations[-1] * 1000),
+        "mean_ms": round(statistics.fmean(durations) * 1000),
+    }
+
+
+def run_series(label, generate, completions, args):
+    outage_start = int(args.requests * args.outage_start)
+    outage_end = outage_start + int(args.requests * args.outage_length)
+    durations = []
+    errors = 0
+    lock = threading.Lock()
+
+    def one(index):
+        nonlocal errors
+        completions.outage = outage_start <= index < outage_end
+        started = time.perf_counter()
+        try:
+            generate()
+        except Exception:
+            with lock:
+                errors += 1
+        with lock:
+            durations.append(time.perf_counter() - started)
+
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        list(executor.map(one, range(args.requests)))
+    result = dict(summary(durations), errors=errors)
+    print(f"{label:<12} p50={result['p50_ms']} ms p95={result['p95_ms']} ms p99={result['p99_ms']} ms "
+          f"max={result['max_ms']} ms erreurs={errors}")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency-ms", type=float, default=300)
+    parser.add_argument("--slow-ratio", type=float, default=0.05)
+    parser.add_argument("--slow-ms", type=float, default=20000)
+    parser.add_argument("--error-ratio", type=float, default=0.02)
+    parser.add_argument("--fallback-latency-ms", type=float, default=150)
+    parser.add_argument("--outage-start", type=float, default=0.5, help="Début de la panne (fraction de la série).")
+    parser.add_argument("--outage-length", type=float, default=0.2, help="Durée de la panne (fraction de la série).")
+    parser.add_argument("--output", help="Fichier JSON de résultats (sinon stdout).")
+    args = parser.parse_args()
+
+    configure_environment(extra_env={
+        "LLM_DEADLINE_SECONDS": 4,
+        "LLM_HEDGE_MIN_DELAY_SECONDS": 0.2,
+        "LLM_BREAKER_OPEN_SECONDS": 2,
+        "LLM_SLOW_CALL_SECONDS": 3,
+    })
+    siena = load_app()
+    with siena.app.app_context():
+        tenant_id = siena.DEFAULT_TENANT_ID
+    details = {"dish": ["Carbonara"], "atmosphere": ["Chaleureuse"], "server_name": ["Marco"]}
+    prompt_text = "Rédige un avis."
+    report = {"config": vars(args), "results": {}}
+
+    completions = FaultyCompletions(args.latency_ms, args.slow_ratio, args.slow_ms, args.error_ratio, args.fallback_latency_ms)
+    siena.client.chat = types.SimpleNamespace(completions=completions)
+    # Sans la couche résiliente : un seul appel, sans délai maximal (timeout du SDK à 600 s).
+    report["results"]["direct"] = run_series(
+        "direct", lambda: completions.create(model="gpt-4o", messages=[{"role": "user", "content": prompt_text}]), completions, args
+    )
+
+    completions = FaultyCompletions(args.latency_ms, args.slow_ratio, args.slow_ms, args.error_ratio, args.fallback_latency_ms)
+    siena.client.chat = types.SimpleNamespace(completions=completions)
+    report["results"]["resilient"] = run_series(
+        "résilient", lambda: siena.generate_review_for_details(tenant_id, details, "fr", allow_local=True), completions, args
+    )
+    report["results"]["resilient"]["llm"] = siena.review_llm.snapshot()
+    print("issues :", dict(sorted(siena.review_llm.stats.items())))
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+Test de charge reproductible des chemins chauds publics et du dashboard.
+
+Lance app.py dans un serveur HTTP local (threads), avec un client OpenAI factice à
+latence configurable, puis mesure débit, p50 et p99 de chaque endpoint à plusieurs
+niveaux de concurrence. Les résultats sont écrits en JSON pour comparer les exécutions.
+
+    python benchmarks/seed.py --reviews 1000000 --database-url sqlite:////tmp/siena.sqlite
+    python benchmarks/load_test.py --database-url sqlite:////tmp/siena.sqlite \\
+        --concurrency 1 8 32 --requests 500 --openai-latency-ms 800 --output results.json
+"""
+import argparse
+import http.client
+import json
+import logging
+import platform
+import random
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from common import admin_token, configure_environment, install_fake_openai, load_app
+from seed import DISHES, QUALITATIVE, SERVERS, seed
+
+ENDPOINTS = {
+    "public_data": ("GET", "/api/public/data?lang=fr", False),
+    "generate_review": ("POST", "/generate-review", False),
+    "dashboard": ("GET", "/dashboard?period=30days", True),
+    "menu_performance": ("GET", "/api/menu-performance?period=all", True),
+    "internal_feedback": ("GET", "/api/internal-feedback?status=all", True),
+}
+
+
+def review_body(rng):
+    tags = [{"category": "dish", "value": rng.choice(items)} for items in rng.sample(list(DISHES.values()), 2)]
+    tags += [{"category": category, "value": rng.choice(values)} for category, values in QUALITATIVE.items()]
+    tags.append({"category": "server_name", "value": rng.choice(SERVERS)})
+    return json.dumps({"lang": "fr", "tags": tags})
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def run_level(port, method, path, needs_auth, token, concurrency, total_requests):
+    local = threading.local()
+    rng = random.Random(concurrency)
+    headers = {"X-Forwarded-Proto": "https", "Content-Type": "application/json"}
+    if needs_auth:
+        headers["Authorization"] = f"Bearer {token}"
+
+    def one_request(_):
+        if not hasattr(local, "conn"):
+            local.conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+        body = review_body(rng) if method == "POST" else None
+        started = time.perf_counter()
+        try:
+            local.conn.request(method, path, body=body, headers=headers)
+            response = local.conn.getresponse()
+            response.read()
+            ok = response.status < 400
+        except (OSError, http.client.HTTPException):
+            local.conn.close()
+            del local.conn
+            ok = False
+        return time.perf_counter() - started, ok
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one_request, range(total_requests)))
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(latency * 1000 for latency, _ in results)
+    errors = sum(1 for _, ok in results if not ok)
+    return {
+        "concurrency": concurrency,
+        "requests": total_requests,
+        "errors": errors,
+        "duration_s": round(elapsed, 3),
+        "throughput_rps": round(total_requests / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50), 2),
+        "p99_ms": round(percentile(latencies, 0.99), 2),
+        "mean_ms": round(statistics.fmean(latencies), 2) if latencies else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url")
+    parser.add_argument("--seed-reviews", type=int, default=0, help="Génère d'abord N avis synthétiques.")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=300, help="Requêtes par endpoint et par niveau.")
+    parser.add_argument("--openai-latency-ms", type=float, default=500.0)
+    parser.add_argument("--endpoints", nargs="+", choices=sorted(ENDPOINTS), default=list(ENDPOINTS))
+    parser.add_argument("--cold", action="store_true", help="Désactive les caches de réponses.")
+    parser.add_argument("--output", help="Fichier JSON de résultats (sinon stdout).")
+    args = parser.parse_args()
+
+    extra_env = {"REVIEW_CACHE_POOL_SIZE": 0}
+    if args.cold:
+        extra_env.update(ANALYTICS_CACHE_TTL=0, PUBLIC_DATA_CACHE_TTL=0)
+    configure_environment(args.database_url, extra_env)
+    siena = load_app()
+    install_fake_openai(siena, args.openai_latency_ms)
+    if args.seed_reviews:
+        seed(siena, args.seed_reviews, days=365, batch_size=10000, feedback_ratio=0.05)
+
+    from werkzeug.serving import make_server
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    server = make_server("127.0.0.1", 0, siena.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    token = admin_token(siena)
+
+    report = {
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "database": siena.app.config["SQLALCHEMY_DATABASE_URI"].split(":", 1)[0],
+        "openai_latency_ms": args.openai_latency_ms,
+        "cold_caches": args.cold,
+        "results": {},
+    }
+    try:
+        for name in args.endpoints:
+            method, path, needs_auth = ENDPOINTS[name]
+            report["results"][name] = []
+            for concurrency in args.concurrency:
+                level = run_level(server.server_port, method, path, needs_auth, token, concurrency, args.requests)
+                report["results"][name].append(level)
+                print(f"{name:<18} c={concurrency:<4} {level['throughput_rps']:>8} req/s  "
+                      f"p50={level['p50_ms']} ms  p99={level['p99_ms']} ms  erreurs={level['errors']}")
+    finally:
+        server.shutdown()
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
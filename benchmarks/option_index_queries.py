@@ -0,0 +1,70 @@
+"""
+Compte les requêtes SQL émises par /generate-review, avec et sans l'index des options.
+
+    python benchmarks/option_index_queries.py [--dishes 12] [--requests 50]
+
+Utilise une base SQLite temporaire et un client OpenAI factice : aucun service externe.
+"""
+import argparse
+
+from sqlalchemy import event
+
+from common import configure_environment, install_fake_openai, load_app
+
+configure_environment(extra_env={"REVIEW_CACHE_POOL_SIZE": 0})
+siena = load_app()
+
+
+def seed(dish_count):
+    with siena.app.app_context():
+        siena.db.session.add(siena.Server(name="Marco"))
+        for i in range(dish_count):
+            siena.db.session.add(siena.FlavorOption(text=f"Plat {i}", category="Plats"))
+        siena.db.session.commit()
+
+
+def measure(label, ttl, dish_count, request_count):
+    siena.OPTION_INDEX_TTL = ttl
+    index = siena.option_index_for(siena.DEFAULT_TENANT_ID)
+    index.ttl = ttl
+    index.invalidate()
+    statements = []
+
+    def count_statement(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with siena.app.app_context():
+        engine = siena.db.engine
+    event.listen(engine, "before_cursor_execute", count_statement)
+    try:
+        client = siena.app.test_client()
+        body = {
+            "lang": "fr",
+            "tags": [{"category": "dish", "value": f"Plat {i}"} for i in range(dish_count)]
+                    + [{"category": "server_name", "value": "Marco"}],
+            "private_feedback": "Un peu d'attente.",
+        }
+        for _ in range(request_count):
+            client.post("/generate-review", json=body, base_url="https://localhost")
+    finally:
+        event.remove(engine, "before_cursor_execute", count_statement)
+
+    selects = [s for s in statements if s.lstrip().upper().startswith("SELECT")]
+    print(f"{label:<22} {len(statements) / request_count:>8.2f} requêtes/soumission"
+          f" dont {len(selects) / request_count:.2f} SELECT")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dishes", type=int, default=12)
+    parser.add_argument("--requests", type=int, default=50)
+    args = parser.parse_args()
+
+    install_fake_openai(siena)
+    seed(args.dishes)
+    measure("sans index (avant)", 0, args.dishes, args.requests)
+    measure("avec index (après)", 60, args.dishes, args.requests)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Générateur de données synthétiques : serveurs, plats, et autant d'événements
+GeneratedReview / MenuSelection / QualitativeFeedback / InternalFeedback que demandé,
+insérés par lots puis agrégés dans les rollups.
+
+    python benchmarks/seed.py --reviews 1000000 --days 730 [--database-url postgresql://...]
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+from common import configure_environment, load_app
+
+SERVERS = ["Marco", "Giulia", "Luca", "Sofia", "Matteo", "Chiara", "Paolo", "Elena"]
+DISHES = {
+    "Antipasti": ["Burrata", "Vitello tonnato", "Bruschetta", "Carpaccio"],
+    "Pizze": ["Margherita", "Diavola", "Quattro formaggi", "Tartufo", "Calzone"],
+    "Pasta": ["Carbonara", "Cacio e pepe", "Lasagne", "Gnocchi al pesto", "Linguine alle vongole"],
+    "Dolci": ["Tiramisù", "Panna cotta", "Cannoli"],
+}
+QUALITATIVE = {
+    "service_qualities": ["Attentionné", "Rapide", "Souriant", "Professionnel", "De bon conseil"],
+    "atmosphere": ["Chaleureuse", "Festive", "Calme", "Romantique"],
+    "reason_for_visit": ["Anniversaire", "Entre amis", "En famille", "Affaires"],
+}
+FEEDBACKS = [
+    "Attente un peu longue entre les plats.",
+    "Service impeccable, merci à toute l'équipe !",
+    "Musique trop forte pendant le dîner.",
+    "Pizza froide à l'arrivée, dommage.",
+    "Très bon accueil, nous reviendrons.",
+    "Manque d'options végétariennes sur la carte.",
+]
+
+
+def seed(siena, reviews, days, batch_size, feedback_ratio):
+    db = siena.db
+    rng = random.Random(42)
+    now = datetime.now(timezone.utc)
+    with siena.app.app_context():
+        if not siena.Server.query.first():
+            db.session.add_all([siena.Server(name=name) for name in SERVERS])
+            db.session.add_all([
+                siena.FlavorOption(text=dish, category=category)
+                for category, dishes in DISHES.items() for dish in dishes
+            ])
+            db.session.commit()
+        server_ids = {name: server_id for server_id, name in db.session.query(siena.Server.id, siena.Server.name)}
+        dishes = [(dish, category) for category, items in DISHES.items() for dish in items]
+
+        started = time.time()
+        inserted = {"reviews": 0, "menu_selections": 0, "qualitative": 0, "feedback": 0}
+        for offset in range(0, reviews, batch_size):
+            review_rows, selection_rows, qualitative_rows, feedback_rows = [], [], [], []
+            for _ in range(min(batch_size, reviews - offset)):
+                created_at = now - timedelta(seconds=rng.randint(0, days * 86400))
+                server = rng.choice(SERVERS)
+                review_rows.append({"server_name": server, "created_at": created_at.replace(tzinfo=None)})
+                for dish, category in rng.sample(dishes, rng.randint(1, 3)):
+                    selection_rows.append({"dish_name": dish, "dish_category": category, "selection_timestamp": created_at})
+                for category, values in QUALITATIVE.items():
+                    if rng.random() < 0.7:
+                        qualitative_rows.append({"category": category, "value": rng.choice(values), "created_at": created_at})
+                if rng.random() < feedback_ratio:
+                    feedback_rows.append({
+                        "feedback_text": rng.choice(FEEDBACKS),
+                        "associated_server_id": server_ids[server],
+                        "status": rng.choice(["new", "read", "archived"]),
+                        "created_at": created_at,
+                    })
+            db.session.execute(db.insert(siena.GeneratedReview), review_rows)
+            db.session.execute(db.insert(siena.MenuSelection), selection_rows)
+            db.session.execute(db.insert(siena.QualitativeFeedback), qualitative_rows)
+            if feedback_rows:
+                db.session.execute(db.insert(siena.InternalFeedback), feedback_rows)
+            db.session.commit()
+            inserted["reviews"] += len(review_rows)
+            inserted["menu_selections"] += len(selection_rows)
+            inserted["qualitative"] += len(qualitative_rows)
+            inserted["feedback"] += len(feedback_rows)
+            print(f"  {inserted['reviews']}/{reviews} avis insérés ({time.time() - started:.1f} s)", end="\r")
+        print()
+
+        rollup_started = time.time()
+        siena.backfill_rollups()
+        print(f"Rollups recalculés en {time.time() - rollup_started:.1f} s")
+    return inserted
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url")
+    parser.add_argument("--reviews", type=int, default=100000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--batch-size", type=int, default=10000)
+    parser.add_argument("--feedback-ratio", type=float, default=0.05)
+    args = parser.parse_args()
+
+    configure_environment(args.database_url)
+    siena = load_app()
+    inserted = seed(siena, args.reviews, args.days, args.batch_size, args.feedback_ratio)
+    print(f"Base : {siena.app.config['SQLALCHEMY_DATABASE_URI']}")
+    print(inserted)
+
+
+if __name__ == "__main__":
+    main()
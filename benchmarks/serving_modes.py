@@ -0,0 +1,159 @@
+"""
+Compare les profils gunicorn (sync, gthread, gevent) sur /generate-review.
+
+Lance un faux serveur OpenAI local (latence configurable) puis, pour chaque mode, un
+gunicorn réel configuré par gunicorn.conf.py, et mesure débit et latences à plusieurs
+niveaux de concurrence.
+
+    python benchmarks/serving_modes.py --modes sync gthread gevent --workers 2 \\
+        --concurrency 8 64 256 --requests 512 --openai-latency-ms 2000 --output modes.json
+"""
+import argparse
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from common import ROOT
+from load_test import run_level
+
+
+def fake_openai_server(latency_ms):
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            time.sleep(latency_ms / 1000.0)
+            body = json.dumps({
+                "id": "chatcmpl-bench",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": "gpt-4o",
+                "choices": [{
+                    "index": 0,
+                    "finish_reason": "stop",
+                    "message": {"role": "assistant", "content": "Un dîner délicieux chez Siena, service attentionné."},
+                }],
+                "usage": {"prompt_tokens": 120, "completion_tokens": 80, "total_tokens": 200},
+            }).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_ready(port, process, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("gunicorn s'est arrêté au démarrage.")
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=2)
+            conn.request("GET", "/api/public/data", headers={"X-Forwarded-Proto": "https"})
+            conn.getresponse().read()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError("gunicorn n'a pas répondu à temps.")
+
+
+def run_mode(mode, args, openai_port):
+    port = free_port()
+    db_dir = tempfile.mkdtemp(prefix=f"siena-{mode}-")
+    env = dict(
+        os.environ,
+        SERVER_MODE=mode,
+        PORT=str(port),
+        WEB_CONCURRENCY=str(args.workers),
+        GUNICORN_THREADS=str(args.threads),
+        GEVENT_WORKER_CONNECTIONS=str(args.gevent_connections),
+        DATABASE_URL=args.database_url or f"sqlite:///{os.path.join(db_dir, 'bench.sqlite')}",
+        DASHBOARD_PASSWORD="bench",
+        OPENAI_API_KEY="sk-bench",
+        OPENAI_BASE_URL=f"http://127.0.0.1:{openai_port}/v1",
+        RATELIMIT_ENABLED="false",
+        REVIEW_CACHE_POOL_SIZE="0",
+    )
+    subprocess.run([sys.executable, "-m", "flask", "--app", "app", "migrate"], cwd=ROOT, env=env, check=True,
+                   stdout=subprocess.DEVNULL)
+    process = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "app:create_app()"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_until_ready(port, process)
+        levels = []
+        for concurrency in args.concurrency:
+            level = run_level(port, "POST", "/generate-review", False, None, concurrency, args.requests)
+            levels.append(level)
+            print(f"{mode:<8} c={concurrency:<5} {level['throughput_rps']:>8} req/s  "
+                  f"p50={level['p50_ms']} ms  p99={level['p99_ms']} ms  erreurs={level['errors']}")
+        return levels
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", nargs="+", choices=["sync", "gthread", "gevent"], default=["sync", "gthread", "gevent"])
+    parser.add_argument("--database-url", help="Par défaut, une base SQLite temporaire par mode.")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--gevent-connections", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[8, 64])
+    parser.add_argument("--requests", type=int, default=128)
+    parser.add_argument("--openai-latency-ms", type=float, default=1000.0)
+    parser.add_argument("--output", help="Fichier JSON de résultats (sinon stdout).")
+    args = parser.parse_args()
+
+    openai_server = fake_openai_server(args.openai_latency_ms)
+    report = {
+        "openai_latency_ms": args.openai_latency_ms,
+        "workers": args.workers,
+        "threads": args.threads,
+        "gevent_connections": args.gevent_connections,
+        "results": {},
+    }
+    try:
+        for mode in args.modes:
+            if mode == "gevent":
+                try:
+                    import gevent  # noqa: F401
+                except ImportError:
+                    print("gevent n'est pas installé : mode ignoré.")
+                    continue
+            report["results"][mode] = run_mode(mode, args, openai_server.server_port)
+    finally:
+        openai_server.shutdown()
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Coût par vérification du limiteur et par lecture/écriture de cache selon le backend
+d'état partagé (memory://, SQLite local, Redis optionnel), et vérification que les
+compteurs restent exacts quand plusieurs processus incrémentent en parallèle.
+
+    python benchmarks/shared_state_overhead.py [--checks 20000] [--processes 4] \\
+        [--redis-url redis://localhost:6379/15] [--output shared_state.json]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import statistics
+import tempfile
+import time
+
+import common  # noqa: F401  (ajoute la racine du dépôt au sys.path)
+from limits import parse
+from limits.storage import storage_from_string
+from limits.strategies import FixedWindowRateLimiter
+
+from analytics_cache import MemoryCacheBackend
+from shared_state import SharedCacheBackend, open_shared_state
+
+
+def timings_summary(durations):
+    durations = sorted(d * 1_000_000 for d in durations)
+    return {
+        "p50_us": round(durations[len(durations) // 2], 1),
+        "p99_us": round(durations[int(len(durations) * 0.99)], 1),
+        "mean_us": round(statistics.fmean(durations), 1),
+    }
+
+
+def bench_limiter(url, checks):
+    limiter = FixedWindowRateLimiter(storage_from_string(url))
+    item = parse("1000000000/hour")
+    durations = []
+    for i in range(checks):
+        key = f"10.0.{i % 50}.1"
+        started = time.perf_counter()
+        limiter.hit(item, "bench", key)
+        durations.append(time.perf_counter() - started)
+    return timings_summary(durations)
+
+
+def bench_cache(url, operations):
+    state = open_shared_state(url)
+    backend = SharedCacheBackend(state, "bench") if state is not None else MemoryCacheBackend(max_entries=1000)
+    value = {"value": {"total_reviews": 1234, "top_servers": [{"name": "Marco", "count": 99}] * 10}, "computed_at": time.time(), "generation": 1}
+    get_durations, set_durations = [], []
+    for i in range(operations):
+        key = f"dashboard?period={i % 20}"
+        started = time.perf_counter()
+        backend.set(key, value, 60)
+        set_durations.append(time.perf_counter() - started)
+        started = time.perf_counter()
+        backend.get(key)
+        get_durations.append(time.perf_counter() - started)
+    return {"get": timings_summary(get_durations), "set": timings_summary(set_durations)}
+
+
+def _hammer(url, hits):
+    storage = storage_from_string(url)
+    for _ in range(hits):
+        storage.incr("bench:atomicity", 3600)
+
+
+def check_atomicity(url, processes, hits):
+    storage = storage_from_string(url)
+    storage.clear("bench:atomicity")
+    workers = [multiprocessing.Process(target=_hammer, args=(url, hits)) for _ in range(processes)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return {"expected": processes * hits, "counted": storage.get("bench:atomicity")}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--checks", type=int, default=20000)
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--atomicity-hits", type=int, default=2000)
+    parser.add_argument("--redis-url")
+    parser.add_argument("--output", help="Fichier JSON de résultats (sinon stdout).")
+    args = parser.parse_args()
+
+    sqlite_url = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='siena-state-'), 'shared_state.sqlite')}"
+    backends = {"memory": "memory://", "sqlite": sqlite_url}
+    if args.redis_url:
+        backends["redis"] = args.redis_url
+
+    report = {"checks": args.checks, "results": {}}
+    for name, url in backends.items():
+        result = {"limiter_hit": bench_limiter(url, args.checks), "cache": bench_cache(url, args.checks // 4)}
+        if name != "memory":
+            result["atomicity"] = check_atomicity(url, args.processes, args.atomicity_hits)
+        report["results"][name] = result
+        hit = result["limiter_hit"]
+        print(f"{name:<7} limiter p50={hit['p50_us']} µs p99={hit['p99_us']} µs  "
+              f"cache get p50={result['cache']['get']['p50_us']} µs set p50={result['cache']['set']['p50_us']} µs"
+              + (f"  compteur {result['atomicity']['counted']}/{result['atomicity']['expected']}" if "atomicity" in result else ""))
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Temps de démarrage : import de l'application dans un processus neuf (ce que paie chaque
+worker gunicorn sans preload), puis délai avant la première réponse d'un gunicorn réel.
+
+- import « avant » : import + migrations + construction du client OpenAI, soit le
+  travail que faisait l'ancien import du module ;
+- import « après » : import seul (base et client OpenAI paresseux) ;
+- gunicorn « avant » : sans preload, migrations au démarrage de chaque worker ;
+- gunicorn « après » : application préchargée dans le maître, workers forkés.
+
+    python benchmarks/startup_time.py [--runs 5] [--workers 4] [--database-url ...] [--output startup.json]
+
+Utilise une base SQLite temporaire, migrée une fois avant les mesures.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from common import ROOT
+from serving_modes import free_port, wait_until_ready
+
+EAGER_IMPORT = "import app; app.migrate_schema(); app.client.chat"
+LAZY_IMPORT = "import app"
+
+
+def time_import(code, env, runs):
+    durations = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        durations.append(time.perf_counter() - started)
+    return durations
+
+
+def time_gunicorn(extra_env, env, workers, runs):
+    durations = []
+    for _ in range(runs):
+        port = free_port()
+        run_env = dict(env, PORT=str(port), WEB_CONCURRENCY=str(workers), SERVER_MODE="sync", **extra_env)
+        started = time.perf_counter()
+        process = subprocess.Popen(
+            [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "app:create_app()"],
+            cwd=ROOT, env=run_env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        try:
+            wait_until_ready(port, process, timeout=60)
+            durations.append(time.perf_counter() - started)
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+    return durations
+
+
+def summary(label, durations):
+    result = {
+        "median_ms": round(statistics.median(durations) * 1000),
+        "min_ms": round(min(durations) * 1000),
+        "max_ms": round(max(durations) * 1000),
+    }
+    print(f"{label:<18} médiane={result['median_ms']} ms  min={result['min_ms']} ms  max={result['max_ms']} ms")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--database-url", help="Par défaut, une base SQLite temporaire.")
+    parser.add_argument("--skip-gunicorn", action="store_true")
+    parser.add_argument("--output", help="Fichier JSON de résultats (sinon stdout).")
+    args = parser.parse_args()
+
+    db_dir = tempfile.mkdtemp(prefix="siena-startup-")
+    env = dict(
+        os.environ,
+        DATABASE_URL=args.database_url or f"sqlite:///{os.path.join(db_dir, 'bench.sqlite')}",
+        DASHBOARD_PASSWORD="bench",
+        OPENAI_API_KEY="sk-bench",
+        SHARED_STATE_URL=f"sqlite:///{os.path.join(db_dir, 'shared_state.sqlite')}",
+        RATELIMIT_ENABLED="false",
+    )
+    subprocess.run([sys.executable, "-m", "flask", "--app", "app", "migrate"], cwd=ROOT, env=env, check=True,
+                   stdout=subprocess.DEVNULL)
+
+    report = {"runs": args.runs, "workers": args.workers, "results": {}}
+    results = report["results"]
+    results["import_before"] = summary("import avant", time_import(EAGER_IMPORT, env, args.runs))
+    results["import_after"] = summary("import après", time_import(LAZY_IMPORT, env, args.runs))
+    if not args.skip_gunicorn:
+        results["gunicorn_before"] = summary("gunicorn avant", time_gunicorn(
+            {"GUNICORN_PRELOAD": "false", "AUTO_MIGRATE": "true"}, env, args.workers, args.runs))
+        results["gunicorn_after"] = summary("gunicorn après", time_gunicorn(
+            {"GUNICORN_PRELOAD": "true"}, env, args.workers, args.runs))
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Octets transférés pour afficher la page client (index.html + logo), première visite et
+visite suivante, avant (fichiers bruts, sans cache) et après le pipeline statique
+(brotli/gzip, WebP redimensionné, empreintes immuables, revalidation par ETag), et
+temps de transfert estimé sur une connexion lente.
+
+    python benchmarks/static_delivery.py [--page index.html] [--dpr 2] [--kbps 400] [--rtt-ms 300] [--output static.json]
+
+Utilise une base SQLite temporaire : aucun service externe.
+"""
+import argparse
+import json
+import os
+import re
+
+from common import ROOT, configure_environment, load_app
+
+
+def srcset_candidate(srcset, width):
+    """Plus petite image du srcset couvrant `width` pixels (sinon la plus grande)."""
+    candidates = sorted((int(w), url) for url, w in re.findall(r"(\S+) (\d+)w", srcset))
+    return next((url for w, url in candidates if w >= width), candidates[-1][1])
+
+
+def page_images(html, dpr):
+    """URLs d'images qu'un navigateur acceptant WebP charge pour la page."""
+    urls = []
+    for source, sizes in re.findall(r'<source type="image/webp" srcset="([^"]+)" sizes="(\d+)px">', html):
+        urls.append(srcset_candidate(source, int(sizes) * dpr))
+    urls.extend(re.findall(r'<source type="image/webp" srcset="(/[^" ]+)">', html))
+    if not urls:
+        urls = re.findall(r'<img\b[^>]*\bsrc="([^"]+)"', html)
+    return urls
+
+
+def transfer_ms(sizes, kbps, rtt_ms):
+    """Une requête par fichier (en parallèle après la page) : RTT + octets / débit."""
+    if not sizes:
+        return 0
+    page, *assets = sizes
+    return round(2 * rtt_ms + page * 8 / kbps + (rtt_ms + sum(assets) * 8 / kbps if assets else 0))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--page", default="index.html", choices=["index.html", "admin.html"])
+    parser.add_argument("--dpr", type=int, default=2, help="Densité de pixels de l'écran simulé.")
+    parser.add_argument("--kbps", type=float, default=400, help="Débit simulé (kbit/s).")
+    parser.add_argument("--rtt-ms", type=float, default=300)
+    parser.add_argument("--output", help="Fichier JSON de résultats (sinon stdout).")
+    args = parser.parse_args()
+
+    configure_environment()
+    siena = load_app()
+    client = siena.app.test_client()
+    client.environ_base["HTTP_X_FORWARDED_PROTO"] = "https"
+    headers = {"Accept-Encoding": "gzip, deflate, br"}
+
+    with open(os.path.join(ROOT, args.page), "rb") as f:
+        raw_page = f.read()
+    raw_images = re.findall(rb'<img\b[^>]*\bsrc="/([^"]+)"', raw_page)
+    before = [len(raw_page)] + [os.path.getsize(os.path.join(ROOT, path.decode())) for path in raw_images]
+
+    page = client.get(f"/{args.page}", headers=headers)
+    html = client.get(f"/{args.page}").get_data(as_text=True)
+    after_first = [len(page.data)] + [len(client.get(url, headers=headers).data) for url in page_images(html, args.dpr)]
+    # Visite suivante : la page est revalidée (304 sans corps), les images à empreinte viennent du cache.
+    revalidated = client.get(f"/{args.page}", headers=dict(headers, **{"If-None-Match": page.headers["ETag"]}))
+    after_repeat = [len(revalidated.data)]
+
+    report = {
+        "config": vars(args),
+        "before": {"first_visit_bytes": sum(before), "repeat_visit_bytes": sum(before),
+                   "first_visit_ms": transfer_ms(before, args.kbps, args.rtt_ms),
+                   "repeat_visit_ms": transfer_ms(before, args.kbps, args.rtt_ms)},
+        "after": {"first_visit_bytes": sum(after_first), "repeat_visit_bytes": sum(after_repeat),
+                  "repeat_visit_status": revalidated.status_code,
+                  "first_visit_ms": transfer_ms(after_first, args.kbps, args.rtt_ms),
+                  "repeat_visit_ms": transfer_ms(after_repeat, args.kbps, args.rtt_ms)},
+    }
+    for label, result in (("avant", report["before"]), ("après", report["after"])):
+        print(f"{label:<6} 1re visite {result['first_visit_bytes']:>7} o (~{result['first_visit_ms']} ms)  "
+              f"visite suivante {result['repeat_visit_bytes']:>7} o (~{result['repeat_visit_ms']} ms)")
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Génération d'avis en masse (brouillons pour les événements et campagnes) : beaucoup
+de combinaisons de tags traitées avec une concurrence bornée, et nouvelle tentative
+avec backoff exponentiel quand OpenAI limite le débit (429) ou échoue temporairement.
+"""
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+def is_retryable(error):
+    status = getattr(error, "status_code", None)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    # Erreurs réseau du SDK OpenAI (APIConnectionError et sa sous-classe APITimeoutError).
+    return any(cls.__name__ == "APIConnectionError" for cls in type(error).__mro__)
+
+
+def retry_delay(error, attempt, base_delay, max_delay):
+    """Délai avant la tentative suivante : Retry-After s'il est fourni, sinon backoff exponentiel avec jitter."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        retry_after = float(headers.get("retry-after", ""))
+        return min(max_delay, max(0.0, retry_after))
+    except ValueError:
+        pass
+    return min(max_delay, base_delay * 2 ** attempt) * random.uniform(0.5, 1.0)
+
+
+class BulkRunner:
+    """
+    Exécute `generate(item)` pour chaque item avec au plus `concurrency` appels en
+    parallèle. `generate` renvoie un dict contenant au moins prompt_tokens et
+    completion_tokens ; `on_result(index, result, error, attempts)` est appelé dans le
+    thread appelant (écritures en base hors des threads de génération).
+    """
+
+    def __init__(self, generate, concurrency=4, max_retries=5, base_delay=1.0, max_delay=30.0, sleep=time.sleep):
+        self.generate = generate
+        self.concurrency = max(1, concurrency)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.sleep = sleep
+        self._retries = 0
+        self._lock = threading.Lock()
+
+    def _generate_with_retry(self, item):
+        attempt = 0
+        while True:
+            try:
+                return self.generate(item), attempt + 1
+            except Exception as e:
+                if attempt >= self.max_retries or not is_retryable(e):
+                    e.attempts = attempt + 1
+                    raise
+                self.sleep(retry_delay(e, attempt, self.base_delay, self.max_delay))
+                attempt += 1
+                with self._lock:
+                    self._retries += 1
+
+    def run(self, items, on_result):
+        started = time.perf_counter()
+        report = {"total": len(items), "succeeded": 0, "failed": 0, "prompt_tokens": 0, "completion_tokens": 0}
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="bulk-review") as executor:
+            futures = {executor.submit(self._generate_with_retry, item): index for index, item in enumerate(items)}
+            for future in as_completed(futures):
+                index = futures[future]
+                try:
+                    result, attempts = future.result()
+                except Exception as e:
+                    report["failed"] += 1
+                    on_result(index, None, e, getattr(e, "attempts", 1))
+                    continue
+                report["succeeded"] += 1
+                report["prompt_tokens"] += result.get("prompt_tokens", 0)
+                report["completion_tokens"] += result.get("completion_tokens", 0)
+                on_result(index, result, None, attempts)
+        duration = time.perf_counter() - started
+        report.update(
+            retries=self._retries,
+            duration_seconds=round(duration, 3),
+            reviews_per_second=round(report["succeeded"] / duration, 2) if duration else 0.0,
+            tokens_per_second=round((report["prompt_tokens"] + report["completion_tokens"]) / duration, 1) if duration else 0.0,
+        )
+        return report
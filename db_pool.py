@@ -0,0 +1,172 @@
+import os
+import threading
+import time
+from contextlib import ContextDecorator
+from contextvars import ContextVar
+
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+_no_statement_timeout = ContextVar("no_statement_timeout", default=False)
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool qui mesure le temps d'attente pour obtenir une connexion."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            self.metrics.record_timeout()
+            raise
+        self.metrics.record_checkout((time.perf_counter() - started) * 1000)
+        return connection
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+
+class without_statement_timeout(ContextDecorator):
+    """
+    Désactive DB_STATEMENT_TIMEOUT_MS pour les connexions obtenues dans le bloc (ou la
+    fonction décorée) : migrations, backfill, compaction et autres commandes de maintenance
+    dont les requêtes durent légitimement plus longtemps qu'une requête HTTP.
+    """
+
+    def __enter__(self):
+        self._token = _no_statement_timeout.set(True)
+        return self
+
+    def __exit__(self, *exc):
+        _no_statement_timeout.reset(self._token)
+        return False
+
+
+class PostgresQueuePool(InstrumentedQueuePool):
+    """InstrumentedQueuePool des bases Postgres, dont le statement_timeout peut être levé (without_statement_timeout)."""
+
+
+def _apply_setting(dbapi_connection, statement):
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute(statement)
+    finally:
+        cursor.close()
+    # Validé tout de suite : un rollback ultérieur de la transaction n'annule pas le réglage.
+    dbapi_connection.commit()
+
+
+@event.listens_for(PostgresQueuePool, "checkout")
+def _disable_statement_timeout(dbapi_connection, connection_record, connection_proxy):
+    if _no_statement_timeout.get() and not connection_record.info.get("statement_timeout_disabled"):
+        _apply_setting(dbapi_connection, "SET statement_timeout = 0")
+        connection_record.info["statement_timeout_disabled"] = True
+
+
+@event.listens_for(PostgresQueuePool, "checkin")
+def _restore_statement_timeout(dbapi_connection, connection_record):
+    if connection_record.info.pop("statement_timeout_disabled", False) and dbapi_connection is not None:
+        # RESET revient à la valeur passée à la connexion (options -c statement_timeout=...).
+        _apply_setting(dbapi_connection, "RESET statement_timeout")
+
+
+class PoolMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_wait_ms = 0.0
+        self.max_wait_ms = 0.0
+        self.slow_checkouts = 0
+
+    def record_checkout(self, wait_ms):
+        with self._lock:
+            self.checkouts += 1
+            self.total_wait_ms += wait_ms
+            self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+            if wait_ms > 100:
+                self.slow_checkouts += 1
+
+    def record_timeout(self):
+        with self._lock:
+            self.timeouts += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "checkout_timeouts": self.timeouts,
+                "slow_checkouts_over_100ms": self.slow_checkouts,
+                "avg_checkout_wait_ms": round(self.total_wait_ms / self.checkouts, 3) if self.checkouts else 0.0,
+                "max_checkout_wait_ms": round(self.max_wait_ms, 3),
+            }
+
+
+def _env_bool(name, default):
+    return os.getenv(name, str(default)).lower() in ("1", "true", "yes", "on")
+
+
+def engine_options_from_env(database_url):
+    """
+    Options du moteur SQLAlchemy pilotées par variables d'environnement. À dimensionner
+    pour que (workers gunicorn x (DB_POOL_SIZE + DB_MAX_OVERFLOW)) reste sous la limite
+    de connexions de la base.
+    """
+    if database_url.startswith("sqlite"):
+        return {}
+
+    options = {
+        "poolclass": PostgresQueuePool if database_url.startswith("postgresql") else InstrumentedQueuePool,
+        "pool_size": int(os.getenv("DB_POOL_SIZE", "5")),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "5")),
+        "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", "10")),
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "280")),
+        "pool_pre_ping": _env_bool("DB_POOL_PRE_PING", True),
+        "pool_use_lifo": _env_bool("DB_POOL_USE_LIFO", True),
+    }
+
+    connect_args = {}
+    if database_url.startswith("postgresql"):
+        server_options = []
+        statement_timeout = os.getenv("DB_STATEMENT_TIMEOUT_MS", "15000")
+        if statement_timeout and statement_timeout != "0":
+            server_options.append(f"-c statement_timeout={statement_timeout}")
+        idle_timeout = os.getenv("DB_IDLE_IN_TRANSACTION_TIMEOUT_MS", "60000")
+        if idle_timeout and idle_timeout != "0":
+            server_options.append(f"-c idle_in_transaction_session_timeout={idle_timeout}")
+        if server_options:
+            connect_args["options"] = " ".join(server_options)
+        connect_args["connect_timeout"] = int(os.getenv("DB_CONNECT_TIMEOUT", "5"))
+        # Les requêtes préparées côté serveur ne sont disponibles qu'avec psycopg 3
+        # (postgresql+psycopg://) ; psycopg2 les ignore.
+        prepare_threshold = os.getenv("DB_PREPARE_THRESHOLD")
+        if prepare_threshold is not None and database_url.startswith("postgresql+psycopg://"):
+            connect_args["prepare_threshold"] = None if prepare_threshold == "off" else int(prepare_threshold)
+    if connect_args:
+        options["connect_args"] = connect_args
+    return options
+
+
+def pool_status(engine):
+    pool = engine.pool
+    status = {"pool_class": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update({
+            "size": pool.size(),
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+            "max_overflow": pool._max_overflow,
+            "timeout_seconds": pool.timeout(),
+        })
+    if isinstance(pool, InstrumentedQueuePool):
+        status.update(pool.metrics.snapshot())
+    return status
@@ -0,0 +1,77 @@
+"""
+Avis rédigé localement à partir des mêmes tags que le prompt, servi quand OpenAI est
+indisponible : moins varié qu'un avis généré, mais immédiat.
+"""
+
+PHRASES = {
+    "fr": {
+        "opening": "Très belle expérience chez {restaurant} !",
+        "dish": "Mention spéciale pour {items}, un vrai régal.",
+        "service_qualities": "Service au top : {items}.",
+        "atmosphere": "Côté ambiance : {items}.",
+        "quick_highlight": "Ce qu'on retient : {items}.",
+        "server": "Merci à {server} pour l'accueil.",
+        "closing": "Nous reviendrons avec plaisir.",
+    },
+    "en": {
+        "opening": "Lovely experience at {restaurant}!",
+        "dish": "Special mention for {items}, simply delicious.",
+        "service_qualities": "Great service: {items}.",
+        "atmosphere": "The atmosphere: {items}.",
+        "quick_highlight": "Highlights: {items}.",
+        "server": "Thanks to {server} for looking after us.",
+        "closing": "We will definitely be back.",
+    },
+    "es": {
+        "opening": "¡Muy buena experiencia en {restaurant}!",
+        "dish": "Mención especial para {items}, una delicia.",
+        "service_qualities": "Servicio excelente: {items}.",
+        "atmosphere": "El ambiente: {items}.",
+        "quick_highlight": "Lo mejor: {items}.",
+        "server": "Gracias a {server} por la atención.",
+        "closing": "Volveremos con mucho gusto.",
+    },
+    "it": {
+        "opening": "Bellissima esperienza da {restaurant}!",
+        "dish": "Menzione speciale per {items}, una vera delizia.",
+        "service_qualities": "Servizio impeccabile: {items}.",
+        "atmosphere": "L'atmosfera: {items}.",
+        "quick_highlight": "Da ricordare: {items}.",
+        "server": "Grazie a {server} per l'accoglienza.",
+        "closing": "Torneremo sicuramente.",
+    },
+    "pt": {
+        "opening": "Ótima experiência no {restaurant}!",
+        "dish": "Menção especial para {items}, uma delícia.",
+        "service_qualities": "Serviço excelente: {items}.",
+        "atmosphere": "O ambiente: {items}.",
+        "quick_highlight": "Destaques: {items}.",
+        "server": "Obrigado a {server} pelo atendimento.",
+        "closing": "Voltaremos com certeza.",
+    },
+    "zh": {
+        "opening": "在{restaurant}的用餐体验非常棒！",
+        "dish": "特别推荐{items}，非常美味。",
+        "service_qualities": "服务一流：{items}。",
+        "atmosphere": "环境氛围：{items}。",
+        "quick_highlight": "亮点：{items}。",
+        "server": "感谢{server}的热情接待。",
+        "closing": "我们一定会再来。",
+    },
+}
+
+SECTIONS = ["dish", "service_qualities", "atmosphere", "quick_highlight"]
+
+
+def render_fallback_review(restaurant_name, details, server_name, lang):
+    phrases = PHRASES.get(lang, PHRASES["fr"])
+    separator = "" if lang == "zh" else " "
+    sentences = [phrases["opening"].format(restaurant=restaurant_name)]
+    for category in SECTIONS:
+        values = details.get(category)
+        if values:
+            sentences.append(phrases[category].format(items=("、" if lang == "zh" else ", ").join(values)))
+    if server_name:
+        sentences.append(phrases["server"].format(server=server_name))
+    sentences.append(phrases["closing"])
+    return separator.join(sentences)
@@ -0,0 +1,73 @@
+"""
+Configuration gunicorn (chargée automatiquement depuis la racine : `gunicorn "app:create_app()"`).
+
+Le schéma de la base et le build des fichiers statiques (pages et images précompressées)
+sont mis à jour une fois par déploiement, avant de lancer gunicorn :
+
+    flask --app app migrate && flask --app app build-assets && gunicorn "app:create_app()"
+
+SERVER_MODE choisit le profil de workers :
+
+- "sync" (défaut) : un processus traite une requête à la fois. Chaque /generate-review
+  bloque son worker pendant tout l'appel OpenAI, donc le débit plafonne à
+  WEB_CONCURRENCY / latence OpenAI (ex. 2 workers / 4 s = 0,5 avis/s).
+- "gthread" : GUNICORN_THREADS threads par processus. Sans dépendance supplémentaire,
+  multiplie la concurrence par le nombre de threads.
+- "gevent" : boucle d'événements coopérative. gevent patche les sockets, si bien que le
+  client OpenAI synchrone et psycopg2 (via psycogreen) rendent la main pendant les
+  attentes réseau : un processus tient GEVENT_WORKER_CONNECTIONS générations en
+  parallèle. Nécessite gevent et psycogreen (requirements.txt).
+
+Exemples :
+
+    SERVER_MODE=gevent WEB_CONCURRENCY=2 GEVENT_WORKER_CONNECTIONS=500 gunicorn "app:create_app()"
+    SERVER_MODE=gthread WEB_CONCURRENCY=2 GUNICORN_THREADS=16 gunicorn "app:create_app()"
+
+En mode gevent, les connexions SQL ne sont tenues que le temps de l'enregistrement
+(le commit précède l'appel OpenAI) : DB_POOL_SIZE/DB_MAX_OVERFLOW n'ont pas à suivre le
+nombre de connexions simultanées. La comparaison des modes se lance avec
+benchmarks/serving_modes.py, le temps de démarrage des workers avec
+benchmarks/startup_time.py.
+"""
+import os
+
+SERVER_MODE = os.getenv("SERVER_MODE", "sync")
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "60"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+# preload_app : l'application (sans effet de bord à l'import) est chargée une fois dans le
+# maître et partagée par les workers forkés, qui démarrent sans réimporter. Pas en gevent :
+# le monkey-patching doit précéder l'import. Les pools de threads (jobs, caches) et le
+# client OpenAI démarrent paresseusement dans chaque worker.
+preload_app = os.getenv("GUNICORN_PRELOAD", "true" if SERVER_MODE != "gevent" else "false").lower() == "true"
+if preload_app:
+    # Chargé par le maître (le client reste paresseux) : les workers n'en paient pas l'import.
+    import openai  # noqa: F401
+
+if SERVER_MODE == "gthread":
+    worker_class = "gthread"
+    threads = int(os.getenv("GUNICORN_THREADS", "8"))
+elif SERVER_MODE == "gevent":
+    worker_class = "gevent"
+    worker_connections = int(os.getenv("GEVENT_WORKER_CONNECTIONS", "500"))
+elif SERVER_MODE == "sync":
+    worker_class = "sync"
+else:
+    raise RuntimeError(f"SERVER_MODE inconnu : {SERVER_MODE} (sync, gthread ou gevent).")
+
+
+def post_fork(server, worker):
+    if preload_app:
+        from app import after_fork
+        after_fork()
+    if SERVER_MODE != "gevent":
+        return
+    try:
+        from psycogreen.gevent import patch_psycopg
+    except ImportError:
+        server.log.warning("psycogreen absent : les requêtes psycopg2 bloqueront la boucle gevent.")
+        return
+    patch_psycopg()
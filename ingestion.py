@@ -0,0 +1,273 @@
+import glob
+import json
+import os
+import threading
+import time
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class IngestionBuffer:
+    """
+    Tampon d'écriture pour les soumissions : les événements sont ajoutés en mémoire et
+    dans un fichier de débordement local (une ligne JSON par soumission), puis écrits
+    en base par lots toutes les `max_events` ou `max_delay_ms` millisecondes.
+
+    Le fichier de débordement est propre à chaque processus ; au démarrage, les fichiers
+    laissés par des workers morts sont rejoués, pour ne rien perdre lors d'un redémarrage.
+
+    Un lot en échec est réessayé avec un délai exponentiel (`retry_base_ms`, plafonné à
+    `retry_max_ms`) ; après `max_attempts` échecs consécutifs, il est mis de côté dans un
+    fichier `.failed` (rejoué par replay_failed()) et l'ingestion continue.
+    """
+
+    def __init__(self, flush_fn, spill_dir, max_events=200, max_delay_ms=500, fsync=False, wrap_flush=None,
+                 max_attempts=8, retry_base_ms=500, retry_max_ms=60_000):
+        self.flush_fn = flush_fn
+        self.spill_dir = spill_dir
+        self.max_events = max(1, max_events)
+        self.max_delay = max_delay_ms / 1000.0
+        self.fsync = fsync
+        self.wrap_flush = wrap_flush
+        self.max_attempts = max(1, max_attempts)
+        self.retry_base = retry_base_ms / 1000.0
+        self.retry_max = retry_max_ms / 1000.0
+        self.stats = {
+            "submissions": 0,
+            "events_buffered": 0,
+            "events_flushed": 0,
+            "flushes": 0,
+            "flush_errors": 0,
+            "failed_batches": 0,
+            "failed_events": 0,
+            "last_flush_size": 0,
+            "last_flush_ms": 0.0,
+            "max_flush_ms": 0.0,
+            "replayed_events": 0,
+        }
+        self._total_flush_ms = 0.0
+        self._pending = []
+        self._consecutive_failures = 0
+        self._retry_at = 0.0
+        self._lock = threading.Lock()
+        # Une seule écriture de lot à la fois (thread d'écriture, atexit) : chaque rotation
+        # réutilise le même fichier .flushing.
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._pid = None
+        self._spill_file = None
+
+    def _spill_path(self, pid, suffix=""):
+        return os.path.join(self.spill_dir, f"ingestion-{pid}.jsonl{suffix}")
+
+    def _ensure_started(self):
+        # Démarrage paresseux dans chaque worker gunicorn (les threads ne survivent pas au fork).
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._pending = []
+        self._consecutive_failures = 0
+        self._retry_at = 0.0
+        os.makedirs(self.spill_dir, exist_ok=True)
+        # Un processus précédent a pu mourir avec le même pid : ses événements sont repris.
+        recovered = []
+        for suffix in (".flushing", ""):
+            path = self._spill_path(self._pid, suffix)
+            if os.path.exists(path):
+                recovered.extend(self._read_events(path))
+                os.remove(path)
+        self._spill_file = open(self._spill_path(self._pid), "a", encoding="utf-8")
+        if recovered:
+            self._spill_file.write(json.dumps(recovered, ensure_ascii=False) + "\n")
+            self._spill_file.flush()
+            self._pending.extend(recovered)
+        threading.Thread(target=self._run, name="ingestion-flusher", daemon=True).start()
+
+    def append(self, events):
+        """Enregistre les événements d'une soumission ; durables dès le retour de l'appel."""
+        if not events:
+            return
+        line = json.dumps(events, ensure_ascii=False)
+        with self._lock:
+            self._ensure_started()
+            self._spill_file.write(line + "\n")
+            self._spill_file.flush()
+            if self.fsync:
+                os.fsync(self._spill_file.fileno())
+            self._pending.extend(events)
+            self.stats["submissions"] += 1
+            self.stats["events_buffered"] += len(events)
+            if len(self._pending) >= self.max_events:
+                self._wakeup.notify()
+
+    def _run(self):
+        # Fichiers laissés par des workers terminés, repris hors du démarrage et des requêtes.
+        try:
+            self.replay_orphans()
+        except Exception as e:
+            print(f"Erreur lors de la reprise des événements en attente: {e}")
+        while True:
+            with self._lock:
+                deadline = time.time() + self.max_delay
+                while True:
+                    now = time.time()
+                    # Après un échec, on attend la fin du délai même si le tampon est plein.
+                    if now < self._retry_at:
+                        self._wakeup.wait(self._retry_at - now)
+                    elif len(self._pending) >= self.max_events or now >= deadline:
+                        break
+                    else:
+                        self._wakeup.wait(deadline - now)
+            self.flush()
+
+    def flush(self):
+        with self._flush_lock:
+            self._flush()
+
+    def _flush(self):
+        with self._lock:
+            if not self._pending or self._spill_file is None:
+                return
+            batch = self._pending
+            self._pending = []
+            # Rotation du fichier : les nouveaux événements vont dans un fichier neuf
+            # pendant que le lot en cours d'écriture reste sur disque jusqu'au commit.
+            self._spill_file.close()
+            flushing_path = self._spill_path(self._pid, ".flushing")
+            os.replace(self._spill_path(self._pid), flushing_path)
+            self._spill_file = open(self._spill_path(self._pid), "a", encoding="utf-8")
+
+        started = time.time()
+        try:
+            self._call_flush(batch)
+        except Exception as e:
+            print(f"Erreur lors de l'écriture d'un lot d'ingestion ({len(batch)} événements): {e}")
+            with self._lock:
+                self.stats["flush_errors"] += 1
+                self._consecutive_failures += 1
+                if self._consecutive_failures >= self.max_attempts:
+                    self._set_aside(batch)
+                    self._consecutive_failures = 0
+                    self._retry_at = 0.0
+                else:
+                    # Le lot est remis en tête et réécrit dans le fichier courant avant de
+                    # supprimer l'ancien, pour qu'il reste durable jusqu'au prochain essai.
+                    self._pending = batch + self._pending
+                    self._spill_file.write(json.dumps(batch, ensure_ascii=False) + "\n")
+                    self._spill_file.flush()
+                    delay = min(self.retry_max, self.retry_base * 2 ** (self._consecutive_failures - 1))
+                    self._retry_at = time.time() + delay
+            os.remove(flushing_path)
+            return
+
+        os.remove(flushing_path)
+        elapsed_ms = (time.time() - started) * 1000
+        with self._lock:
+            self._consecutive_failures = 0
+            self._retry_at = 0.0
+            self.stats["flushes"] += 1
+            self.stats["events_flushed"] += len(batch)
+            self.stats["last_flush_size"] = len(batch)
+            self.stats["last_flush_ms"] = round(elapsed_ms, 2)
+            self.stats["max_flush_ms"] = round(max(self.stats["max_flush_ms"], elapsed_ms), 2)
+            self._total_flush_ms += elapsed_ms
+
+    def _set_aside(self, batch):
+        path = self._spill_path(self._pid, ".failed")
+        print(f"Lot d'ingestion abandonné après {self.max_attempts} essais ({len(batch)} événements) : mis de côté dans {path}")
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(batch, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self.stats["failed_batches"] += 1
+        self.stats["failed_events"] += len(batch)
+
+    def _call_flush(self, batch):
+        if self.wrap_flush:
+            with self.wrap_flush():
+                self.flush_fn(batch)
+        else:
+            self.flush_fn(batch)
+
+    @staticmethod
+    def _read_events(path):
+        with open(path, encoding="utf-8") as f:
+            lines = [line for line in f if line.strip()]
+        events = []
+        for i, line in enumerate(lines):
+            try:
+                events.extend(json.loads(line))
+            except ValueError:
+                if i < len(lines) - 1:
+                    raise
+                # Dernière ligne tronquée par un arrêt brutal pendant l'écriture : la
+                # soumission n'avait pas été confirmée au client.
+                print(f"Ligne incomplète ignorée à la fin de {path}")
+        return events
+
+    def replay_orphans(self):
+        """Rejoue les fichiers de débordement laissés par des processus terminés."""
+        if not os.path.isdir(self.spill_dir):
+            return 0
+        replayed = 0
+        for path in sorted(glob.glob(os.path.join(self.spill_dir, "ingestion-*.jsonl*"))):
+            if ".failed" in os.path.basename(path):
+                continue  # Lots mis de côté : rejoués seulement à la demande (replay_failed).
+            pid = int(os.path.basename(path).split("-", 1)[1].split(".", 1)[0])
+            if pid == os.getpid() or _pid_alive(pid):
+                continue
+            claimed_path = f"{path}.replay-{os.getpid()}"
+            try:
+                os.replace(path, claimed_path)
+            except FileNotFoundError:
+                continue  # Déjà repris par un autre worker.
+            events = self._read_events(claimed_path)
+            if events:
+                self._call_flush(events)
+            os.remove(claimed_path)
+            replayed += len(events)
+        with self._lock:
+            self.stats["replayed_events"] += replayed
+        return replayed
+
+    def replay_failed(self):
+        """Réécrit en base les lots mis de côté ; un fichier n'est supprimé qu'après succès. Renvoie le nombre d'événements."""
+        replayed = 0
+        for path in sorted(glob.glob(os.path.join(self.spill_dir, "ingestion-*.jsonl.failed"))):
+            claimed_path = f"{path}.replay-{os.getpid()}"
+            try:
+                os.replace(path, claimed_path)
+            except FileNotFoundError:
+                continue
+            with open(claimed_path, encoding="utf-8") as f:
+                batches = [json.loads(line) for line in f if line.strip()]
+            for i, batch in enumerate(batches):
+                try:
+                    self._call_flush(batch)
+                except Exception:
+                    # Seuls les lots pas encore écrits retournent dans le fichier.
+                    with open(path, "a", encoding="utf-8") as f:
+                        f.writelines(json.dumps(rest, ensure_ascii=False) + "\n" for rest in batches[i:])
+                    os.remove(claimed_path)
+                    raise
+                replayed += len(batch)
+            os.remove(claimed_path)
+        return replayed
+
+    def snapshot(self):
+        with self._lock:
+            flushes = self.stats["flushes"]
+            return dict(
+                self.stats,
+                pending_events=len(self._pending),
+                avg_flush_ms=round(self._total_flush_ms / flushes, 2) if flushes else 0.0,
+                avg_flush_size=round(self.stats["events_flushed"] / flushes, 1) if flushes else 0.0,
+            )
@@ -0,0 +1,153 @@
+import os
+import threading
+import time
+import uuid
+from collections import deque
+
+
+class QueueFullError(Exception):
+    """Levée quand la file de génération est saturée (backpressure)."""
+
+    def __init__(self, retry_after):
+        super().__init__("La file de génération est pleine.")
+        self.retry_after = retry_after
+
+
+class ReviewJobQueue:
+    """
+    Pool de workers en mémoire pour exécuter les appels OpenAI hors du worker HTTP.
+    La profondeur de la file est bornée : au-delà, submit() lève QueueFullError.
+    reserve() permet de vérifier la place disponible avant d'enregistrer quoi que ce
+    soit, puis submit_reserved() ou release() consomme ou rend la place réservée.
+    Les résultats sont conservés `result_ttl` secondes pour être récupérés par polling.
+    """
+
+    def __init__(self, workers=4, max_depth=100, result_ttl=300):
+        self.workers = max(1, workers)
+        self.max_depth = max(1, max_depth)
+        self.result_ttl = result_ttl
+        self._pending = deque()
+        self._reserved = 0
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._finished = threading.Condition(self._lock)
+        self._threads = []
+        self._pid = None
+        self._avg_duration = 2.0
+
+    def _ensure_started(self):
+        # Les threads ne survivent pas au fork de gunicorn : on (re)démarre le pool
+        # paresseusement dans chaque processus worker.
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._pending.clear()
+        self._reserved = 0
+        self._threads = []
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"review-job-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _purge_expired(self, now):
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job["finished_at"] and now - job["finished_at"] > self.result_ttl]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def retry_after(self):
+        """Estimation (en secondes) du temps nécessaire pour libérer une place dans la file."""
+        with self._lock:
+            return self._retry_after_locked()
+
+    def _retry_after_locked(self):
+        backlog = len(self._pending) / self.workers
+        return max(1, int(round(backlog * self._avg_duration)))
+
+    def _check_capacity_locked(self, now):
+        self._ensure_started()
+        self._purge_expired(now)
+        if len(self._pending) + self._reserved >= self.max_depth:
+            raise QueueFullError(self._retry_after_locked())
+
+    def reserve(self):
+        """Réserve une place dans la file ; lève QueueFullError si elle est saturée."""
+        with self._lock:
+            self._check_capacity_locked(time.time())
+            self._reserved += 1
+
+    def release(self):
+        """Rend une place réservée qui ne sera pas utilisée."""
+        with self._lock:
+            self._reserved = max(0, self._reserved - 1)
+
+    def submit(self, fn, *args, **kwargs):
+        now = time.time()
+        with self._lock:
+            self._check_capacity_locked(now)
+            return self._enqueue_locked(now, fn, args, kwargs)
+
+    def submit_reserved(self, fn, *args, **kwargs):
+        """Comme submit(), sur une place obtenue par reserve() : ne lève jamais QueueFullError."""
+        now = time.time()
+        with self._lock:
+            self._ensure_started()
+            self._reserved = max(0, self._reserved - 1)
+            return self._enqueue_locked(now, fn, args, kwargs)
+
+    def _enqueue_locked(self, now, fn, args, kwargs):
+        job_id = uuid.uuid4().hex
+        self._jobs[job_id] = {
+            "status": "pending",
+            "result": None,
+            "error": None,
+            "created_at": now,
+            "finished_at": None,
+        }
+        self._pending.append((job_id, fn, args, kwargs))
+        self._not_empty.notify()
+        return job_id
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def wait(self, job_id, timeout):
+        """Attend la fin du job (au plus `timeout` secondes) et renvoie son état, ou None s'il est inconnu."""
+        deadline = time.time() + timeout
+        with self._lock:
+            while True:
+                job = self._jobs.get(job_id)
+                remaining = deadline - time.time()
+                if job is None or job["status"] in ("done", "error") or remaining <= 0:
+                    return dict(job) if job else None
+                self._finished.wait(remaining)
+
+    def depth(self):
+        with self._lock:
+            return len(self._pending)
+
+    def _run(self):
+        while True:
+            with self._lock:
+                while not self._pending:
+                    self._not_empty.wait()
+                job_id, fn, args, kwargs = self._pending.popleft()
+                self._jobs[job_id]["status"] = "running"
+            started = time.time()
+            try:
+                result = fn(*args, **kwargs)
+                status, error = "done", None
+            except Exception as e:
+                print(f"Erreur dans le job de génération {job_id}: {e}")
+                result, status, error = None, "error", str(e)
+            finished = time.time()
+            with self._lock:
+                # Moyenne mobile de la durée d'un job, utilisée pour Retry-After.
+                self._avg_duration = 0.8 * self._avg_duration + 0.2 * (finished - started)
+                job = self._jobs.get(job_id)
+                if job:
+                    job.update(status=status, result=result, error=error, finished_at=finished)
+                self._finished.notify_all()
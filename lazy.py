@@ -0,0 +1,37 @@
+"""
+Objets coûteux construits au premier usage plutôt qu'à l'import du module : l'import de
+l'application reste rapide (démarrage des workers, tests) et sans effet de bord.
+"""
+import os
+import threading
+
+
+class LazyProxy:
+    """
+    Délègue tous les attributs à l'objet renvoyé par `factory()`, appelé au premier accès
+    puis une fois par processus (un client HTTP ne doit pas traverser le fork de gunicorn).
+    """
+
+    def __init__(self, factory):
+        object.__setattr__(self, "_factory", factory)
+        object.__setattr__(self, "_target", None)
+        object.__setattr__(self, "_pid", None)
+        object.__setattr__(self, "_lock", threading.Lock())
+
+    def _resolve(self):
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    object.__setattr__(self, "_target", self._factory())
+                    object.__setattr__(self, "_pid", os.getpid())
+        return self._target
+
+    @property
+    def initialized(self):
+        return self._pid == os.getpid()
+
+    def __getattr__(self, name):
+        return getattr(self._resolve(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self._resolve(), name, value)
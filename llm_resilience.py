@@ -0,0 +1,265 @@
+"""
+Appels OpenAI résilients : délai maximal par appel, requête de couverture (hedging)
+lancée après le p95 des latences observées, disjoncteur qui s'ouvre sur les erreurs
+ou les lenteurs, puis repli sur un modèle plus rapide et, en dernier recours, sur un
+avis rédigé localement.
+"""
+import os
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+
+class DeadlineExceeded(Exception):
+    """L'appel n'a pas abouti dans le délai imparti."""
+
+
+class LLMUnavailable(Exception):
+    """Ni le modèle principal, ni le modèle de repli, ni le repli local n'ont pu répondre."""
+
+
+class LatencyTracker:
+    """Latences des derniers appels réussis, pour estimer un percentile."""
+
+    def __init__(self, size=200, min_samples=20):
+        self.min_samples = min_samples
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, fraction):
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class CircuitBreaker:
+    """
+    Disjoncteur sur une fenêtre glissante des `window` derniers appels : un appel en
+    erreur ou plus lent que `slow_call_seconds` est un échec. Au-delà de
+    `failure_ratio` d'échecs (sur au moins `min_calls` appels), le circuit s'ouvre
+    pendant `open_seconds`, puis laisse passer un seul appel test (demi-ouvert).
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, window=20, min_calls=10, failure_ratio=0.5, slow_call_seconds=10.0, open_seconds=30.0, clock=time.monotonic):
+        self.min_calls = min_calls
+        self.failure_ratio = failure_ratio
+        self.slow_call_seconds = slow_call_seconds
+        self.open_seconds = open_seconds
+        self.clock = clock
+        self.state = self.CLOSED
+        self.opened_at = 0.0
+        self.trips = 0
+        self._outcomes = deque(maxlen=window)
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == self.OPEN and self.clock() - self.opened_at >= self.open_seconds:
+                self.state = self.HALF_OPEN
+                self._probe_in_flight = False
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def record(self, success, duration):
+        failure = not success or duration >= self.slow_call_seconds
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._probe_in_flight = False
+                if failure:
+                    self._open()
+                else:
+                    self.state = self.CLOSED
+                    self._outcomes.clear()
+                return
+            self._outcomes.append(failure)
+            if (self.state == self.CLOSED and len(self._outcomes) >= self.min_calls
+                    and sum(self._outcomes) / len(self._outcomes) >= self.failure_ratio):
+                self._open()
+
+    def release(self):
+        """Appel abandonné sans verdict (client déconnecté) : libère l'appel test éventuel."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def _open(self):
+        self.state = self.OPEN
+        self.opened_at = self.clock()
+        self.trips += 1
+        self._outcomes.clear()
+
+
+class ResilientLLM:
+    """
+    Enchaîne les tentatives d'une génération : modèle principal (avec hedging et délai
+    `deadline`), modèle de repli (délai `fallback_deadline`), puis repli local. Chaque
+    appel est une fonction `call(timeout)` ; le résultat est renvoyé avec son issue.
+
+    Le hedging est borné à `hedge_ratio` des appels pour ne pas doubler la charge
+    quand toute l'API ralentit (c'est alors au disjoncteur d'agir).
+    """
+
+    def __init__(self, deadline=12.0, fallback_deadline=6.0, hedge_percentile=0.95, hedge_min_delay=1.0,
+                 hedge_max_delay=8.0, hedge_ratio=0.1, breaker=None, latencies=None, on_outcome=None, max_workers=32):
+        self.deadline = deadline
+        self.fallback_deadline = fallback_deadline
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_max_delay = hedge_max_delay
+        self.hedge_ratio = hedge_ratio
+        self.breaker = breaker or CircuitBreaker()
+        self.latencies = latencies or LatencyTracker()
+        self.on_outcome = on_outcome
+        self.max_workers = max_workers
+        self.stats = Counter()
+        self._calls = 0
+        self._hedges = 0
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _pool(self):
+        # Comme ReviewJobQueue : les threads ne survivent pas au fork de gunicorn.
+        with self._lock:
+            if self._pid != os.getpid():
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="llm-call")
+                self._pid = os.getpid()
+            return self._executor
+
+    def _count(self, outcome):
+        with self._lock:
+            self.stats[outcome] += 1
+        if self.on_outcome:
+            self.on_outcome(outcome)
+
+    def hedge_delay(self):
+        if self.hedge_ratio <= 0:
+            return None
+        p95 = self.latencies.percentile(self.hedge_percentile)
+        if p95 is None:
+            return self.hedge_max_delay
+        return min(self.hedge_max_delay, max(self.hedge_min_delay, p95))
+
+    def _take_hedge(self):
+        with self._lock:
+            if self._hedges + 1 > self.hedge_ratio * self._calls:
+                return False
+            self._hedges += 1
+            return True
+
+    def _timed(self, call, timeout):
+        started = time.monotonic()
+        result = call(timeout)
+        self.latencies.record(time.monotonic() - started)
+        return result
+
+    def _call_hedged(self, call):
+        """Appel principal, doublé d'une requête de couverture s'il dépasse le p95. Renvoie (résultat, couvert ?)."""
+        with self._lock:
+            self._calls += 1
+        pool = self._pool()
+        started = time.monotonic()
+        pending = {pool.submit(self._timed, call, self.deadline)}
+        hedge = None
+        delay = self.hedge_delay()
+        last_error = None
+        while True:
+            elapsed = time.monotonic() - started
+            remaining = self.deadline - elapsed
+            if remaining <= 0:
+                raise DeadlineExceeded(f"Pas de réponse après {self.deadline} s.")
+            timeout = remaining if delay is None else min(remaining, max(0.0, delay - elapsed))
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    return future.result(), future is hedge
+                last_error = future.exception()
+            if not pending:
+                raise last_error
+            if delay is not None and time.monotonic() - started >= delay:
+                # Une seule requête de couverture par appel ; la plus lente est abandonnée
+                # (elle se termine d'elle-même grâce à son propre timeout).
+                if self._take_hedge():
+                    hedge = pool.submit(self._timed, call, self.deadline - (time.monotonic() - started))
+                    pending.add(hedge)
+                    self._count("hedge_sent")
+                delay = None
+
+    def _call_with_deadline(self, call, deadline):
+        future = self._pool().submit(call, deadline)
+        done, _ = wait([future], timeout=deadline)
+        if not done:
+            raise DeadlineExceeded(f"Pas de réponse après {deadline} s.")
+        return future.result()
+
+    def complete(self, primary, fallback=None, local=None):
+        if self.breaker.allow():
+            started = time.monotonic()
+            try:
+                result, hedged = self._call_hedged(primary)
+                self.breaker.record(True, time.monotonic() - started)
+                outcome = "hedge_success" if hedged else "primary_success"
+                self._count(outcome)
+                return result, outcome
+            except Exception as e:
+                self.breaker.record(False, time.monotonic() - started)
+                self._count("deadline_exceeded" if isinstance(e, DeadlineExceeded) else "primary_error")
+                print(f"Erreur de l'appel OpenAI principal, repli: {e}")
+        else:
+            self._count("circuit_open")
+        return self.degrade(fallback, local)
+
+    def degrade(self, fallback=None, local=None):
+        """Repli sans passer par le modèle principal (circuit ouvert ou flux interrompu)."""
+        if fallback is not None:
+            try:
+                result = self._call_with_deadline(fallback, self.fallback_deadline)
+                self._count("fallback_model")
+                return result, "fallback_model"
+            except Exception as e:
+                self._count("fallback_model_error")
+                print(f"Erreur du modèle de repli: {e}")
+        if local is not None:
+            self._count("local_template")
+            return local(), "local_template"
+        raise LLMUnavailable("Aucune génération disponible.")
+
+    def allow_stream(self):
+        """Un flux direct vers le modèle principal est-il permis ? Sinon, passer par degrade()."""
+        if self.breaker.allow():
+            return True
+        self._count("circuit_open")
+        return False
+
+    def record_stream(self, outcome, duration):
+        """Issue d'un flux autorisé par allow_stream() : success, error ou client_disconnect."""
+        if outcome == "client_disconnect":
+            self.breaker.release()
+        else:
+            self.breaker.record(outcome == "success", duration)
+        self._count(f"stream_{outcome}")
+
+    def snapshot(self):
+        with self._lock:
+            stats = dict(self.stats)
+        return {
+            "outcomes": stats,
+            "breaker_state": self.breaker.state,
+            "breaker_trips": self.breaker.trips,
+            "hedge_delay_seconds": self.hedge_delay(),
+            "latency_p50_seconds": self.latencies.percentile(0.5),
+            "latency_p95_seconds": self.latencies.percentile(0.95),
+        }
@@ -0,0 +1,162 @@
+import threading
+import time
+from bisect import bisect_left
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in labels)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(labels, escaped)) + "}"
+
+
+class MetricsRegistry:
+    """Compteurs et histogrammes en mémoire du processus, exportés au format texte Prometheus."""
+
+    def __init__(self, prefix="siena"):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+        self._help = {}
+
+    def describe(self, name, kind, help_text):
+        self._help[name] = (kind, help_text)
+
+    def inc(self, name, labels=(), amount=1):
+        key = (name, tuple(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, value, labels=(), buckets=LATENCY_BUCKETS):
+        key = (name, tuple(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def render(self):
+        lines = []
+        with self._lock:
+            names = sorted({name for name, _ in self._counters} | {name for name, _ in self._histograms})
+            for name in names:
+                full_name = f"{self.prefix}_{name}"
+                kind, help_text = self._help.get(name, ("untyped", name))
+                lines.append(f"# HELP {full_name} {help_text}")
+                lines.append(f"# TYPE {full_name} {kind}")
+                for (counter_name, labels), value in sorted(self._counters.items()):
+                    if counter_name == name:
+                        lines.append(f"{full_name}{_format_labels(labels)} {value}")
+                for (histogram_name, labels), histogram in sorted(self._histograms.items(), key=lambda item: item[0]):
+                    if histogram_name != name:
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets + (float("inf"),), histogram.counts):
+                        cumulative += count
+                        le = "+Inf" if bound == float("inf") else repr(bound)
+                        lines.append(f"{full_name}_bucket{_format_labels(labels + (('le', le),))} {cumulative}")
+                    lines.append(f"{full_name}_sum{_format_labels(labels)} {histogram.sum}")
+                    lines.append(f"{full_name}_count{_format_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+registry.describe("http_request_duration_seconds", "histogram", "Durée des requêtes HTTP par endpoint.")
+registry.describe("http_requests_total", "counter", "Requêtes HTTP par endpoint et code de statut.")
+registry.describe("sql_queries_per_request", "histogram", "Nombre de requêtes SQL par requête HTTP.")
+registry.describe("sql_duration_seconds_per_request", "histogram", "Temps SQL cumulé par requête HTTP.")
+registry.describe("sql_queries_total", "counter", "Requêtes SQL exécutées, par endpoint (background hors requête HTTP).")
+registry.describe("openai_request_duration_seconds", "histogram", "Latence des appels OpenAI.")
+registry.describe("openai_requests_total", "counter", "Appels OpenAI par modèle et résultat.")
+registry.describe("openai_tokens_total", "counter", "Tokens consommés par modèle et type.")
+registry.describe("llm_outcomes_total", "counter", "Issues des générations d'avis (modèle principal, couverture, repli, disjoncteur).")
+registry.describe("slow_requests_total", "counter", "Requêtes HTTP au-delà du seuil de lenteur.")
+
+
+def record_openai_call(model, duration, outcome="success", usage=None, kind="chat"):
+    labels = (("model", model), ("kind", kind))
+    registry.observe("openai_request_duration_seconds", duration, labels)
+    registry.inc("openai_requests_total", labels + (("outcome", outcome),))
+    if usage is not None:
+        registry.inc("openai_tokens_total", labels + (("type", "prompt"),), getattr(usage, "prompt_tokens", 0) or 0)
+        registry.inc("openai_tokens_total", labels + (("type", "completion"),), getattr(usage, "completion_tokens", 0) or 0)
+
+
+def record_llm_outcome(outcome):
+    registry.inc("llm_outcomes_total", (("outcome", outcome),))
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("metrics_query_start")
+    duration = time.perf_counter() - starts.pop() if starts else 0.0
+    if has_request_context() and hasattr(g, "metrics_sql_count"):
+        g.metrics_sql_count += 1
+        g.metrics_sql_time += duration
+        if g.metrics_slow_log is not None:
+            g.metrics_slow_log.append((duration, statement))
+        endpoint = request.endpoint or "unknown"
+    else:
+        endpoint = "background"
+    registry.inc("sql_queries_total", (("endpoint", endpoint),))
+
+
+def init_app(app, slow_request_ms=0):
+    """
+    Branche l'instrumentation : latence par endpoint, nombre et temps des requêtes SQL
+    par requête HTTP, et journal optionnel des requêtes lentes (slow_request_ms > 0)
+    avec les requêtes SQL les plus coûteuses.
+    """
+    event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+
+    @app.before_request
+    def start_request_metrics():
+        g.metrics_start = time.perf_counter()
+        g.metrics_sql_count = 0
+        g.metrics_sql_time = 0.0
+        g.metrics_slow_log = [] if slow_request_ms > 0 else None
+
+    @app.after_request
+    def record_request_metrics(response):
+        if not hasattr(g, "metrics_start"):
+            return response
+        duration = time.perf_counter() - g.metrics_start
+        endpoint = request.endpoint or "unknown"
+        labels = (("endpoint", endpoint), ("method", request.method))
+        registry.observe("http_request_duration_seconds", duration, labels)
+        registry.inc("http_requests_total", labels + (("status", str(response.status_code)),))
+        registry.observe("sql_queries_per_request", g.metrics_sql_count, (("endpoint", endpoint),), QUERY_COUNT_BUCKETS)
+        registry.observe("sql_duration_seconds_per_request", g.metrics_sql_time, (("endpoint", endpoint),))
+
+        if slow_request_ms > 0 and duration * 1000 >= slow_request_ms:
+            registry.inc("slow_requests_total", (("endpoint", endpoint),))
+            print(f"Requête lente: {request.method} {request.path} ({endpoint}) {duration * 1000:.0f} ms, "
+                  f"{g.metrics_sql_count} requêtes SQL en {g.metrics_sql_time * 1000:.0f} ms")
+            for query_duration, statement in sorted(g.metrics_slow_log, key=lambda q: q[0], reverse=True)[:5]:
+                print(f"  {query_duration * 1000:.1f} ms  {' '.join(statement.split())[:300]}")
+        return response
@@ -0,0 +1,56 @@
+"""
+Migrations de schéma versionnées, appliquées une fois par déploiement hors du démarrage
+des workers (flask --app app migrate). Chaque migration s'exécute une seule fois ; la
+table schema_version en garde l'historique. Sous Postgres, un verrou consultatif
+empêche deux exécutions simultanées (plusieurs instances qui démarrent ensemble).
+"""
+from collections import namedtuple
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, select, text
+
+Migration = namedtuple("Migration", ["version", "name", "apply"])
+
+MIGRATION_LOCK_ID = 72_431_905
+
+schema_version = Table(
+    "schema_version", MetaData(),
+    Column("version", Integer, primary_key=True),
+    Column("name", String(100), nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+
+def applied_versions(engine):
+    with engine.begin() as conn:
+        schema_version.create(conn, checkfirst=True)
+        return {row.version for row in conn.execute(select(schema_version.c.version))}
+
+
+def pending_migrations(engine, migrations):
+    done = applied_versions(engine)
+    return [migration for migration in sorted(migrations, key=lambda m: m.version) if migration.version not in done]
+
+
+def run_migrations(engine, migrations):
+    """Applique, dans l'ordre des versions, les migrations pas encore enregistrées. Renvoie celles appliquées."""
+    with engine.connect() as lock_conn:
+        locked = engine.dialect.name == "postgresql"
+        if locked:
+            lock_conn.execute(text("SELECT pg_advisory_lock(:id)"), {"id": MIGRATION_LOCK_ID})
+            lock_conn.commit()
+        try:
+            applied = []
+            for migration in pending_migrations(engine, migrations):
+                print(f"Migration {migration.version} ({migration.name})...")
+                migration.apply()
+                with engine.begin() as conn:
+                    conn.execute(schema_version.insert().values(
+                        version=migration.version, name=migration.name, applied_at=datetime.utcnow()
+                    ))
+                applied.append(migration)
+            return applied
+        finally:
+            if locked:
+                lock_conn.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": MIGRATION_LOCK_ID})
+                lock_conn.commit()
@@ -0,0 +1,52 @@
+import threading
+import time
+
+from shared_state import LocalGeneration
+
+
+class OptionIndex:
+    """
+    Index en mémoire (par processus) des options publiques : texte de plat -> catégorie
+    et nom de serveur -> id. Chargé une seule fois puis invalidé par les routes
+    d'administration. Avec une `generation` partagée (shared_state), l'invalidation est
+    vue par tous les workers ; sinon `ttl` borne la durée pendant laquelle un autre
+    worker gunicorn peut servir une version périmée. Un ttl de 0 désactive l'index.
+    """
+
+    def __init__(self, loader, ttl=60, generation=None):
+        self.loader = loader
+        self.ttl = ttl
+        self.generation = generation or LocalGeneration()
+        self._loaded_version = -1
+        self._loaded_at = 0.0
+        self._flavor_categories = {}
+        self._server_ids = {}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.ttl > 0
+
+    def invalidate(self):
+        self.generation.bump()
+
+    def _ensure_loaded(self):
+        now = time.time()
+        version = self.generation.current()
+        with self._lock:
+            if self._loaded_version == version and now - self._loaded_at < self.ttl:
+                return
+        flavor_categories, server_ids = self.loader()
+        with self._lock:
+            self._flavor_categories = flavor_categories
+            self._server_ids = server_ids
+            self._loaded_version = version
+            self._loaded_at = now
+
+    def flavor_category(self, text):
+        self._ensure_loaded()
+        return self._flavor_categories.get(text)
+
+    def server_id(self, name):
+        self._ensure_loaded()
+        return self._server_ids.get(name)
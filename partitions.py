@@ -0,0 +1,152 @@
+"""
+Partitionnement mensuel (RANGE) des tables d'événements sous Postgres.
+
+Chaque table partitionnée a une partition par mois nommée <table>_pAAAAMM et une
+partition DEFAULT de secours. Les requêtes filtrées sur la colonne de temps (ex.
+period=7days) ne lisent que les partitions concernées, et la rétention supprime des
+partitions entières au lieu de DELETE ligne à ligne.
+"""
+from datetime import date, datetime, timezone
+
+from sqlalchemy import text
+
+
+def utc_today():
+    # Les colonnes de temps sont en UTC : le mois courant est celui de UTC, pas du serveur.
+    return datetime.now(timezone.utc).date()
+
+
+def month_start(day):
+    return date(day.year, day.month, 1)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table, month):
+    return f"{table}_p{month:%Y%m}"
+
+
+def _bound(month):
+    # Valable pour timestamp et timestamptz : la borne est toujours minuit UTC.
+    return f"'{month:%Y-%m-%d} 00:00:00+00'"
+
+
+def is_partitioned(conn, table):
+    return bool(conn.execute(text(
+        "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+        "WHERE c.relname = :table AND pg_table_is_visible(c.oid)"
+    ), {"table": table}).scalar())
+
+
+def list_partitions(conn, table):
+    """Partitions mensuelles existantes, triées : [(nom, premier jour du mois)]."""
+    names = conn.execute(text(
+        "SELECT child.relname FROM pg_inherits i "
+        "JOIN pg_class parent ON parent.oid = i.inhparent "
+        "JOIN pg_class child ON child.oid = i.inhrelid "
+        "WHERE parent.relname = :table AND pg_table_is_visible(parent.oid)"
+    ), {"table": table}).scalars()
+    prefix = f"{table}_p"
+    partitions = []
+    for name in names:
+        suffix = name[len(prefix):]
+        if name.startswith(prefix) and len(suffix) == 6 and suffix.isdigit():
+            partitions.append((name, date(int(suffix[:4]), int(suffix[4:]), 1)))
+    return sorted(partitions, key=lambda partition: partition[1])
+
+
+def ensure_partitions(conn, table, first_month, months_ahead=2):
+    """Crée les partitions manquantes de `first_month` jusqu'au mois courant + `months_ahead`."""
+    last_month = add_months(month_start(utc_today()), months_ahead)
+    month = month_start(first_month)
+    while month <= last_month:
+        conn.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {partition_name(table, month)} PARTITION OF {table} "
+            f"FOR VALUES FROM ({_bound(month)}) TO ({_bound(add_months(month, 1))})"
+        ))
+        month = add_months(month, 1)
+    conn.execute(text(f"CREATE TABLE IF NOT EXISTS {table}_default PARTITION OF {table} DEFAULT"))
+
+
+def foreign_keys(conn, table):
+    """[(nom, définition)] des clés étrangères portées par `table`."""
+    return conn.execute(text(
+        "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+        "WHERE conrelid = CAST(:table AS regclass) AND contype = 'f' ORDER BY conname"
+    ), {"table": table}).all()
+
+
+def referencing_foreign_keys(conn, table):
+    """Noms « table.contrainte » des clés étrangères d'autres tables qui pointent vers `table`."""
+    return conn.execute(text(
+        "SELECT conrelid::regclass::text || '.' || conname FROM pg_constraint "
+        "WHERE confrelid = CAST(:table AS regclass) AND contype = 'f' ORDER BY 1"
+    ), {"table": table}).scalars().all()
+
+
+def index_definitions(conn, table):
+    """CREATE INDEX des index de `table` hors clé primaire (ils visent `table` par son nom actuel)."""
+    return conn.execute(text(
+        "SELECT pg_get_indexdef(i.indexrelid) FROM pg_index i "
+        "WHERE i.indrelid = CAST(:table AS regclass) AND NOT i.indisprimary ORDER BY i.indexrelid"
+    ), {"table": table}).scalars().all()
+
+
+def convert_to_partitioned(conn, table, column, indexes, months_ahead=2):
+    """
+    Remplace une table ordinaire par une table partitionnée par mois sur `column`,
+    dans la transaction courante : copie des lignes, reprise de la séquence de l'id, puis
+    recréation des clés étrangères et des index (ceux de la base et `indexes`, objets
+    sqlalchemy.Index du modèle). La clé primaire devient (id, column), comme l'exige
+    Postgres ; une table référencée par une clé étrangère ne peut donc pas être convertie.
+    """
+    old_table = f"{table}_unpartitioned"
+    conn.execute(text(f"LOCK TABLE {table} IN ACCESS EXCLUSIVE MODE"))
+    referenced_by = referencing_foreign_keys(conn, table)
+    if referenced_by:
+        raise ValueError(f"{table} est référencée par {', '.join(referenced_by)} : conversion impossible.")
+    own_foreign_keys = foreign_keys(conn, table)
+    own_indexes = index_definitions(conn, table)
+    conn.execute(text(f"UPDATE {table} SET {column} = now() WHERE {column} IS NULL"))
+    first_day = conn.execute(text(f"SELECT min({column})::date FROM {table}")).scalar() or utc_today()
+    sequence = conn.execute(text("SELECT pg_get_serial_sequence(:table, 'id')"), {"table": table}).scalar()
+
+    conn.execute(text(f"ALTER TABLE {table} RENAME TO {old_table}"))
+    conn.execute(text(f"ALTER TABLE {old_table} RENAME CONSTRAINT {table}_pkey TO {old_table}_pkey"))
+    conn.execute(text(
+        f"CREATE TABLE {table} (LIKE {old_table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) "
+        f"PARTITION BY RANGE ({column})"
+    ))
+    conn.execute(text(f"ALTER TABLE {table} ADD CONSTRAINT {table}_pkey PRIMARY KEY (id, {column})"))
+    # LIKE ne reprend ni les clés étrangères ni les index.
+    for name, definition in own_foreign_keys:
+        conn.execute(text(f"ALTER TABLE {table} ADD CONSTRAINT {name} {definition}"))
+    # Un mois de marge : min()::date dépend du fuseau de la session.
+    ensure_partitions(conn, table, add_months(month_start(first_day), -1), months_ahead)
+    conn.execute(text(f"INSERT INTO {table} SELECT * FROM {old_table}"))
+    if sequence:
+        conn.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY {table}.id"))
+    conn.execute(text(f"DROP TABLE {old_table}"))
+    for definition in own_indexes:
+        conn.execute(text(definition))
+    for index in indexes:
+        index.create(bind=conn, checkfirst=True)
+
+
+def drop_partitions_before(conn, table, cutoff_day):
+    """Supprime les partitions entièrement antérieures à `cutoff_day`. Renvoie leurs noms."""
+    dropped = []
+    for name, month in list_partitions(conn, table):
+        if add_months(month, 1) <= cutoff_day:
+            conn.execute(text(f"DROP TABLE {name}"))
+            dropped.append(name)
+    return dropped
+
+
+def drop_all_partitions(conn, table):
+    for name, _ in list_partitions(conn, table):
+        conn.execute(text(f"DROP TABLE {name}"))
+    conn.execute(text(f"DROP TABLE IF EXISTS {table}_default"))
@@ -0,0 +1,195 @@
+"""
+Lectures analytiques (dashboard, exports) sur une réplique en lecture optionnelle.
+
+Les requêtes exécutées dans un bloc `replica_reads` (décorateur ou `with`) partent sur
+la réplique tant que son retard de réplication reste sous `max_lag` ; sinon, ou si elle
+ne répond plus, elles retombent sur la base principale. Les écritures, et les lectures
+d'une transaction qui a déjà écrit, restent toujours sur la base principale ; après un
+commit qui a écrit, les lectures du même utilisateur (clé `pin_key` de la session) y
+restent aussi pendant `pin_seconds`, le temps que la réplique rattrape son retard.
+"""
+import threading
+import time
+from contextlib import ContextDecorator
+from contextvars import ContextVar
+
+from flask_sqlalchemy.session import Session
+from sqlalchemy import text
+
+REPLICA_BIND_KEY = "replica"
+
+_replica_reads = ContextVar("replica_reads", default=False)
+
+# Retard (secondes) d'un standby Postgres : nul s'il a rejoué tout ce qu'il a reçu
+# (sinon une base principale sans écriture ferait croire à un retard croissant).
+POSTGRES_LAG_QUERY = text(
+    "SELECT CASE WHEN NOT pg_is_in_recovery() THEN 0 "
+    "WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+
+class replica_reads(ContextDecorator):
+    """Envoie les lectures du bloc (ou de la fonction décorée) sur la réplique si elle est disponible."""
+
+    def __enter__(self):
+        self._token = _replica_reads.set(True)
+        return self
+
+    def __exit__(self, *exc):
+        _replica_reads.reset(self._token)
+        return False
+
+
+def replication_lag(connection):
+    """Retard de réplication en secondes ; 0 pour les bases sans réplication (SQLite en test)."""
+    if connection.dialect.name == "postgresql":
+        return float(connection.execute(POSTGRES_LAG_QUERY).scalar() or 0)
+    connection.execute(text("SELECT 1"))
+    return 0.0
+
+
+class LocalPinStore:
+    """Marques « a écrit récemment » propres au processus (get/set(ttl), comme shared_state)."""
+
+    def __init__(self, clock=time.time):
+        self.clock = clock
+        self._expiry = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            expires_at = self._expiry.get(key)
+            if expires_at is not None and expires_at <= self.clock():
+                del self._expiry[key]
+                return None
+            return b"1" if expires_at is not None else None
+
+    def set(self, key, value, ttl):
+        now = self.clock()
+        with self._lock:
+            self._expiry[key] = now + ttl
+            if len(self._expiry) > 10_000:
+                self._expiry = {k: t for k, t in self._expiry.items() if t > now}
+
+
+class ReplicaRouter:
+    """
+    Décide si la réplique peut servir les lectures : son retard est mesuré au plus
+    toutes les `check_interval` secondes, et elle est écartée au-delà de `max_lag`
+    secondes de retard ou en cas d'erreur de connexion.
+
+    Une réplique retenue a au plus `max_lag` secondes de retard : épingler sur la base
+    principale pendant `pin_seconds` (par défaut `max_lag`) les lectures d'un utilisateur
+    qui vient d'écrire lui garantit de relire ses propres écritures. `pin_store` partagé
+    (shared_state) : l'épinglage vaut pour tous les workers.
+    """
+
+    def __init__(self, max_lag=5.0, check_interval=2.0, measure_lag=replication_lag, clock=time.monotonic,
+                 pin_seconds=None, pin_store=None):
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.measure_lag = measure_lag
+        self.clock = clock
+        self.pin_seconds = max_lag if pin_seconds is None else pin_seconds
+        self.pin_store = pin_store or LocalPinStore()
+        self.lag = None
+        self.healthy = False
+        self.stats = {"replica_reads": 0, "primary_fallbacks": 0, "pinned_reads": 0, "lag_checks": 0, "check_errors": 0}
+        self._checked_at = None
+        self._lock = threading.Lock()
+
+    def note_write(self, pin_key):
+        """À appeler après un commit qui a écrit : les lectures de `pin_key` restent sur la base principale."""
+        if pin_key is not None and self.pin_seconds > 0:
+            self.pin_store.set(f"replica-pin:{pin_key}", b"1", self.pin_seconds)
+
+    def pinned(self, pin_key):
+        if pin_key is None or self.pin_seconds <= 0 or self.pin_store.get(f"replica-pin:{pin_key}") is None:
+            return False
+        with self._lock:
+            self.stats["pinned_reads"] += 1
+        return True
+
+    def _check(self, engine):
+        try:
+            with engine.connect() as connection:
+                lag = self.measure_lag(connection)
+            healthy = lag <= self.max_lag
+            if not healthy:
+                print(f"Réplique en retard de {lag:.1f} s, lectures sur la base principale.")
+        except Exception as e:
+            print(f"Réplique indisponible, lectures sur la base principale: {e}")
+            lag, healthy = None, False
+            with self._lock:
+                self.stats["check_errors"] += 1
+        with self._lock:
+            self.lag, self.healthy = lag, healthy
+            self.stats["lag_checks"] += 1
+
+    def use_replica(self, engine):
+        now = self.clock()
+        with self._lock:
+            # Un seul thread mesure le retard ; les autres gardent le dernier verdict.
+            due = self._checked_at is None or now - self._checked_at >= self.check_interval
+            if due:
+                self._checked_at = now
+        if due:
+            self._check(engine)
+        with self._lock:
+            self.stats["replica_reads" if self.healthy else "primary_fallbacks"] += 1
+            return self.healthy
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.stats, healthy=self.healthy, lag_seconds=self.lag, max_lag_seconds=self.max_lag)
+
+
+class RoutingSession(Session):
+    """
+    Session Flask-SQLAlchemy qui envoie les SELECT d'un bloc `replica_reads` sur le
+    moteur REPLICA_BIND_KEY. Une fois qu'elle a écrit (flush ou DML), la transaction
+    reste sur la base principale jusqu'au commit ou rollback : elle relit ses écritures.
+    Le commit d'une écriture épingle ensuite l'utilisateur `pin_key()` sur la base
+    principale (voir ReplicaRouter), d'une requête à l'autre.
+    """
+
+    def __init__(self, db, router=None, pin_key=None, **kwargs):
+        super().__init__(db, **kwargs)
+        self.router = router
+        self.pin_key = pin_key or (lambda: None)
+        self._wrote = False
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and clause is not None and getattr(clause, "is_dml", False):
+            self._wrote = True
+        if (bind is None and self.router is not None and _replica_reads.get() and not self._wrote
+                and not self._flushing and getattr(clause, "is_select", False)):
+            engine = self._db.engines.get(REPLICA_BIND_KEY)
+            if engine is not None and not self.router.pinned(self.pin_key()) and self.router.use_replica(engine):
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def flush(self, objects=None):
+        if self.new or self.dirty or self.deleted:
+            self._wrote = True
+        super().flush(objects)
+
+    def commit(self):
+        wrote = self._wrote or bool(self.new or self.dirty or self.deleted)
+        try:
+            super().commit()
+            if wrote and self.router is not None:
+                self.router.note_write(self.pin_key())
+        finally:
+            self._wrote = False
+
+    def rollback(self):
+        try:
+            super().rollback()
+        finally:
+            self._wrote = False
+
+    def close(self):
+        self._wrote = False
+        super().close()
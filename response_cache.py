@@ -0,0 +1,52 @@
+import hashlib
+import json
+import threading
+import time
+from datetime import datetime, timezone
+
+from shared_state import LocalGeneration
+
+
+class SerializedResponseCache:
+    """
+    Cache de réponses JSON déjà sérialisées (octets + ETag fort + Last-Modified), par clé.
+    invalidate() est appelé par les routes d'administration ; avec une `generation`
+    partagée, tous les workers gunicorn le voient, sinon `ttl` borne la durée de vie
+    d'une entrée pour qu'ils finissent par converger.
+    """
+
+    def __init__(self, ttl=300, generation=None):
+        self.ttl = ttl
+        self.generation = generation or LocalGeneration()
+        self._entries = {}
+        self._last_modified = {}
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        self.generation.bump()
+        with self._lock:
+            self._entries.clear()
+
+    def get(self, key, build_payload):
+        now = time.time()
+        version = self.generation.current()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry["version"] == version and now - entry["built_at"] < self.ttl:
+                return entry
+
+        body = json.dumps(build_payload(), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        etag = hashlib.sha256(body).hexdigest()[:32]
+
+        with self._lock:
+            # La date de modification ne change que si le contenu change réellement.
+            previous = self._last_modified.get(key)
+            if previous and previous[0] == etag:
+                last_modified = previous[1]
+            else:
+                last_modified = datetime.now(timezone.utc).replace(microsecond=0)
+                self._last_modified[key] = (etag, last_modified)
+            entry = {"body": body, "etag": etag, "last_modified": last_modified, "built_at": now, "version": version}
+            if version == self.generation.current():
+                self._entries[key] = entry
+            return entry
@@ -0,0 +1,158 @@
+import threading
+import time
+from collections import OrderedDict
+
+from jobs import QueueFullError
+
+
+def review_cache_key(tenant_id, details, lang):
+    """Clé normalisée : catégories et valeurs triées, indépendante de l'ordre des tags."""
+    normalized = tuple(sorted((category, tuple(sorted(values))) for category, values in details.items()))
+    return (tenant_id, lang, normalized)
+
+
+class ReviewPoolCache:
+    """
+    Cache d'avis pré-générés, indexé par combinaison de tags + langue.
+
+    Chaque clé garde un petit pool d'avis différents, pré-générés en arrière-plan. Le
+    pool n'est rechargé que lorsqu'il est vide ou que ses avis ont expiré, et seulement
+    à partir de la deuxième demande d'une même clé, pour ne pas payer des générations
+    pour des combinaisons qui ne reviennent pas.
+
+    Par défaut (`max_serves=1`), chaque avis n'est servi qu'une fois : les avis sont
+    publiés sur Google, un texte identique chez plusieurs clients serait visible et
+    pourrait faire signaler les avis du restaurant. Le cache réduit alors la latence,
+    pas le nombre d'appels. `max_serves > 1` réutilise un même texte mot pour mot.
+    """
+
+    def __init__(self, generate_fn, refill_queue, pool_size=3, max_serves=1, max_keys=500, ttl=86400):
+        self.generate_fn = generate_fn
+        self.refill_queue = refill_queue
+        self.pool_size = pool_size
+        self.max_serves = max(1, max_serves)
+        self.max_keys = max_keys
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._refilling = set()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "reuses": 0, "misses": 0, "refills": 0, "refill_errors": 0, "evictions": 0}
+        self._avg_generation_tokens = 0.0
+
+    @property
+    def enabled(self):
+        return self.pool_size > 0
+
+    def _entry(self, key, now):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        # Les avis trop anciens sont écartés pour que le style continue de varier.
+        entry["reviews"] = [item for item in entry["reviews"] if now - item[0] <= self.ttl]
+        self._entries.move_to_end(key)
+        return entry
+
+    def _insert(self, key, now):
+        entry = {"reviews": [], "created_at": now}
+        self._entries[key] = entry
+        while len(self._entries) > self.max_keys:
+            evicted_key, _ = self._entries.popitem(last=False)
+            self._refilling.discard(evicted_key)
+            self.stats["evictions"] += 1
+        return entry
+
+    def take(self, key):
+        """Renvoie un avis du pool (ou None) ; programme le rechargement d'une clé récurrente dont le pool est vide."""
+        now = time.time()
+        with self._lock:
+            entry = self._entry(key, now)
+            if entry is None:
+                self._insert(key, now)
+                self.stats["misses"] += 1
+                return None
+            if entry["reviews"]:
+                item = entry["reviews"].pop(0)
+                review = item[1]
+                if item[2] < self.max_serves:
+                    self.stats["reuses"] += 1
+                item[2] -= 1
+                if item[2] > 0:
+                    entry["reviews"].append(item)
+                self.stats["hits"] += 1
+                needs_refill = not entry["reviews"]
+            else:
+                review = None
+                self.stats["misses"] += 1
+                needs_refill = True
+        if needs_refill:
+            self._schedule_refill(key)
+        return review
+
+    def record_generation(self, tokens):
+        """Tokens consommés par une génération d'avis, pour estimer les tokens évités."""
+        if not tokens:
+            return
+        with self._lock:
+            if self._avg_generation_tokens == 0.0:
+                self._avg_generation_tokens = float(tokens)
+            else:
+                self._avg_generation_tokens = 0.9 * self._avg_generation_tokens + 0.1 * tokens
+
+    def _schedule_refill(self, key):
+        with self._lock:
+            if key in self._refilling:
+                return
+            self._refilling.add(key)
+        try:
+            self.refill_queue.submit(self._refill, key)
+        except QueueFullError:
+            with self._lock:
+                self._refilling.discard(key)
+
+    def _refill(self, key):
+        tenant_id, lang, normalized = key
+        details = {category: list(values) for category, values in normalized}
+        try:
+            while True:
+                with self._lock:
+                    entry = self._entries.get(key)
+                    if entry is None or len(entry["reviews"]) >= self.pool_size:
+                        return
+                try:
+                    review = self.generate_fn(tenant_id, details, lang)
+                except Exception as e:
+                    print(f"Erreur lors du rechargement du cache d'avis: {e}")
+                    with self._lock:
+                        self.stats["refill_errors"] += 1
+                    return
+                with self._lock:
+                    entry = self._entries.get(key)
+                    if entry is None:
+                        return
+                    entry["reviews"].append([time.time(), review, self.max_serves])
+                    self.stats["refills"] += 1
+        finally:
+            with self._lock:
+                self._refilling.discard(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def snapshot(self):
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            # Seul un avis resservi évite un appel ; une première diffusion a coûté sa
+            # génération. Les générations du pool pas (encore) servies sont comptées à part.
+            calls_avoided = self.stats["reuses"]
+            first_serves = self.stats["hits"] - self.stats["reuses"]
+            return dict(
+                self.stats,
+                keys=len(self._entries),
+                pooled_reviews=sum(len(e["reviews"]) for e in self._entries.values()),
+                hit_rate=round(self.stats["hits"] / lookups, 3) if lookups else 0.0,
+                openai_calls_avoided=calls_avoided,
+                extra_generation_calls=max(0, self.stats["refills"] + self.stats["refill_errors"] - first_serves),
+                avg_generation_tokens=round(self._avg_generation_tokens, 1),
+                tokens_avoided=round(calls_avoided * self._avg_generation_tokens),
+            )
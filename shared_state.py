@@ -0,0 +1,309 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from limits.storage import Storage
+
+GENERATION_EXPIRY = 10 * 365 * 86400
+
+
+class SQLiteSharedState:
+    """
+    Compteurs atomiques et cache clé/valeur partagés entre les workers d'une même
+    machine, dans un fichier SQLite en mode WAL. Chaque opération est une seule
+    instruction SQL en autocommit : incr() est atomique entre processus.
+    """
+
+    PURGE_EVERY = 1000
+
+    def __init__(self, path, busy_timeout_ms=5000):
+        self.path = path
+        self.busy_timeout_ms = busy_timeout_ms
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+        self._writes = 0
+
+    def _connection(self):
+        # Une connexion par processus (pas de partage à travers le fork de gunicorn),
+        # sérialisée par un verrou : les opérations durent quelques microsecondes.
+        if self._pid != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout_ms / 1000, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS counters (key TEXT PRIMARY KEY, value INTEGER NOT NULL, expires_at REAL NOT NULL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL NOT NULL)")
+            self._conn = conn
+            self._pid = os.getpid()
+        return self._conn
+
+    def _maybe_purge(self, conn, now):
+        self._writes += 1
+        if self._writes % self.PURGE_EVERY == 0:
+            conn.execute("DELETE FROM counters WHERE expires_at <= ?", (now,))
+            conn.execute("DELETE FROM cache WHERE expires_at <= ?", (now,))
+
+    # --- Compteurs ---
+    def incr(self, key, expiry, amount=1):
+        """Incrémente `key` ; la fenêtre d'expiration démarre au premier incrément."""
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute(
+                "INSERT INTO counters (key, value, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET "
+                "value = CASE WHEN counters.expires_at <= ? THEN excluded.value ELSE counters.value + excluded.value END, "
+                "expires_at = CASE WHEN counters.expires_at <= ? THEN excluded.expires_at ELSE counters.expires_at END "
+                "RETURNING value",
+                (key, amount, now + expiry, now, now),
+            ).fetchone()
+            self._maybe_purge(conn, now)
+        return row[0]
+
+    def get_counter(self, key):
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT value FROM counters WHERE key = ? AND expires_at > ?", (key, time.time())
+            ).fetchone()
+        return row[0] if row else 0
+
+    def get_expiry(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT expires_at FROM counters WHERE key = ? AND expires_at > ?", (key, now)
+            ).fetchone()
+        return row[0] if row else now
+
+    def delete_counter(self, key):
+        with self._lock:
+            self._connection().execute("DELETE FROM counters WHERE key = ?", (key,))
+
+    def reset_counters(self):
+        with self._lock:
+            return self._connection().execute("DELETE FROM counters").rowcount
+
+    # --- Cache ---
+    def get(self, key):
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT value FROM cache WHERE key = ? AND expires_at > ?", (key, time.time())
+            ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key, value, ttl):
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "INSERT INTO cache (key, value, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at",
+                (key, value, now + ttl),
+            )
+            self._maybe_purge(conn, now)
+
+    def delete(self, key):
+        with self._lock:
+            self._connection().execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def clear(self, prefix=""):
+        with self._lock:
+            self._connection().execute("DELETE FROM cache WHERE key >= ? AND key < ?", (prefix, prefix + "\uffff"))
+
+    def check(self):
+        try:
+            with self._lock:
+                self._connection().execute("SELECT 1")
+            return True
+        except sqlite3.Error:
+            return False
+
+
+class RedisSharedState:
+    """Même interface que SQLiteSharedState sur un serveur Redis (ou compatible), partagé entre machines."""
+
+    INCR_SCRIPT = (
+        "local value = redis.call('INCRBY', KEYS[1], ARGV[1]) "
+        "if value == tonumber(ARGV[1]) then redis.call('EXPIRE', KEYS[1], ARGV[2]) end "
+        "return value"
+    )
+
+    def __init__(self, url, key_prefix="siena:"):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("Le paquet redis est requis pour SHARED_STATE_URL=redis://...")
+        self.client = redis.Redis.from_url(url)
+        self.key_prefix = key_prefix
+        self._incr = self.client.register_script(self.INCR_SCRIPT)
+
+    def _counter_key(self, key):
+        return f"{self.key_prefix}counter:{key}"
+
+    def _cache_key(self, key):
+        return f"{self.key_prefix}cache:{key}"
+
+    def incr(self, key, expiry, amount=1):
+        return int(self._incr(keys=[self._counter_key(key)], args=[amount, max(1, int(expiry))]))
+
+    def get_counter(self, key):
+        value = self.client.get(self._counter_key(key))
+        return int(value) if value is not None else 0
+
+    def get_expiry(self, key):
+        ttl_ms = self.client.pttl(self._counter_key(key))
+        return time.time() + max(0, ttl_ms) / 1000
+
+    def delete_counter(self, key):
+        self.client.delete(self._counter_key(key))
+
+    def reset_counters(self):
+        keys = list(self.client.scan_iter(match=f"{self.key_prefix}counter:*"))
+        return self.client.delete(*keys) if keys else 0
+
+    def get(self, key):
+        return self.client.get(self._cache_key(key))
+
+    def set(self, key, value, ttl):
+        self.client.set(self._cache_key(key), value, ex=max(1, int(ttl)))
+
+    def delete(self, key):
+        self.client.delete(self._cache_key(key))
+
+    def clear(self, prefix=""):
+        keys = list(self.client.scan_iter(match=f"{self._cache_key(prefix)}*"))
+        if keys:
+            self.client.delete(*keys)
+
+    def check(self):
+        try:
+            return bool(self.client.ping())
+        except Exception:
+            return False
+
+
+_instances = {}
+_instances_lock = threading.Lock()
+
+
+def open_shared_state(url):
+    """
+    Backend partagé désigné par une URL : sqlite:////chemin/fichier.sqlite,
+    redis://hôte:port/db, ou memory:// (None : état propre à chaque processus).
+    Une seule instance par URL et par processus.
+    """
+    if not url or url.startswith("memory://"):
+        return None
+    with _instances_lock:
+        state = _instances.get(url)
+        if state is None:
+            if url.startswith("sqlite:///"):
+                state = SQLiteSharedState(url[len("sqlite:///"):])
+            elif url.startswith(("redis://", "rediss://")):
+                state = RedisSharedState(url)
+            else:
+                raise RuntimeError(f"SHARED_STATE_URL non supportée : {url}")
+            _instances[url] = state
+    return state
+
+
+class SQLiteLimiterStorage(Storage):
+    """Stockage `limits` (stratégie fixed-window) adossé à SQLiteSharedState."""
+
+    STORAGE_SCHEME = ["sqlite"]
+
+    def __init__(self, uri=None, wrap_exceptions=False, **options):
+        self.state = open_shared_state(uri)
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+
+    @property
+    def base_exceptions(self):
+        return sqlite3.Error
+
+    def incr(self, key, expiry, amount=1):
+        return self.state.incr(key, expiry, amount)
+
+    def get(self, key):
+        return self.state.get_counter(key)
+
+    def get_expiry(self, key):
+        return self.state.get_expiry(key)
+
+    def check(self):
+        return self.state.check()
+
+    def reset(self):
+        return self.state.reset_counters()
+
+    def clear(self, key):
+        self.state.delete_counter(key)
+
+
+class SharedCacheBackend:
+    """
+    Backend pour AnalyticsCache (get/set/delete/clear) stocké dans l'état partagé. Les
+    valeurs sont sérialisées en JSON (ce sont des réponses d'API) : un fichier ou un Redis
+    partagé ne peut pas faire exécuter de code au worker qui relit le cache.
+    """
+
+    def __init__(self, state, namespace):
+        self.state = state
+        self.namespace = namespace + ":"
+
+    def get(self, key):
+        value = self.state.get(self.namespace + key)
+        if value is None:
+            return None
+        try:
+            return json.loads(value)
+        except ValueError:
+            # Entrée écrite dans un ancien format : traitée comme absente, elle sera recalculée.
+            return None
+
+    def set(self, key, value, ttl=None):
+        self.state.set(self.namespace + key, json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8"), ttl or GENERATION_EXPIRY)
+
+    def delete(self, key):
+        self.state.delete(self.namespace + key)
+
+    def clear(self):
+        self.state.clear(self.namespace)
+
+
+class LocalGeneration:
+    """Numéro de version propre au processus, incrémenté à chaque invalidation."""
+
+    def __init__(self):
+        self._value = 0
+        self._lock = threading.Lock()
+
+    def bump(self):
+        with self._lock:
+            self._value += 1
+            return self._value
+
+    def current(self):
+        return self._value
+
+
+class SharedGeneration:
+    """Numéro de version partagé : une invalidation dans un worker est vue par tous les autres."""
+
+    def __init__(self, state, name):
+        self.state = state
+        self.key = f"generation:{name}"
+
+    def bump(self):
+        return self.state.incr(self.key, GENERATION_EXPIRY)
+
+    def current(self):
+        return self.state.get_counter(self.key)
+
+
+def make_generation(state, name):
+    return SharedGeneration(state, name) if state is not None else LocalGeneration()
@@ -0,0 +1,192 @@
+import json
+import re
+import unicodedata
+from collections import Counter, defaultdict
+
+# Thèmes reconnus dans les feedbacks : (catégorie, libellé, mots-clés normalisés).
+THEMES = [
+    ("Service", "Temps d'attente", ["attente", "attendu", "attendre", "long", "longue", "lent", "lente", "lenteur", "wait", "slow"]),
+    ("Service", "Accueil et amabilité", ["accueil", "aimable", "souriant", "poli", "impoli", "desagreable", "friendly", "rude"]),
+    ("Service", "Attention des serveurs", ["serveur", "serveuse", "service", "oubli", "oublie", "commande", "waiter", "staff"]),
+    ("Ambiance", "Niveau sonore", ["bruit", "bruyant", "fort", "musique", "sonore", "noise", "noisy", "loud"]),
+    ("Ambiance", "Cadre et décoration", ["cadre", "deco", "decoration", "ambiance", "terrasse", "lumiere", "atmosphere"]),
+    ("Ambiance", "Confort et température", ["froid", "chaud", "chaise", "table", "place", "serre", "cold", "hot"]),
+    ("Cuisine", "Qualité des plats", ["plat", "pizza", "pates", "gout", "fade", "cuisson", "cuit", "froide", "food", "taste"]),
+    ("Cuisine", "Prix et portions", ["prix", "cher", "chere", "portion", "quantite", "addition", "price", "expensive"]),
+    ("Cuisine", "Choix du menu", ["menu", "carte", "choix", "vegetarien", "vegan", "option", "dessert", "vin"]),
+    ("Propreté", "Propreté", ["propre", "proprete", "sale", "sales", "toilettes", "wc", "hygiene", "dirty", "clean"]),
+]
+
+POSITIVE_WORDS = {
+    "bon", "bonne", "bons", "bonnes", "excellent", "excellente", "super", "parfait", "parfaite", "delicieux",
+    "delicieuse", "genial", "top", "merci", "bravo", "agreable", "sympa", "chaleureux", "rapide", "propre",
+    "aimable", "souriant", "attentionne", "magnifique", "adore", "recommande", "good", "great",
+    "perfect", "delicious", "nice", "friendly", "fast", "clean", "lovely", "amazing",
+}
+NEGATIVE_WORDS = {
+    "mauvais", "mauvaise", "lent", "lente", "long", "longue", "froid", "froide", "fade", "sale", "sales", "cher", "chere",
+    "bruyant", "decu", "decue", "decevant", "impoli", "desagreable", "oubli", "oublie", "attente",
+    "probleme", "dommage", "manque", "bad", "slow", "cold", "dirty", "rude", "noisy", "expensive",
+    "disappointed", "wait", "loud", "bruit",
+}
+NEGATIONS = {"pas", "jamais", "aucun", "aucune", "not", "never", "no"}
+# Renforcent le mot qui suit sans en changer le sens : « trop bon » est un compliment,
+# « trop cher » une critique.
+INTENSIFIERS = {"trop", "tres", "vraiment", "very", "really", "so"}
+
+SUGGESTIONS = {
+    "Temps d'attente": ("Service", "Renforcer l'équipe aux heures de pointe ou annoncer un temps d'attente estimé."),
+    "Accueil et amabilité": ("Service", "Rappeler à l'équipe les standards d'accueil (salutation, sourire, prise en charge rapide)."),
+    "Attention des serveurs": ("Service", "Mettre en place un point de contrôle des commandes pour éviter les oublis."),
+    "Niveau sonore": ("Ambiance", "Créer des zones plus calmes pour les clients désirant moins de bruit."),
+    "Cadre et décoration": ("Ambiance", "Revoir l'éclairage et la décoration des zones les moins appréciées."),
+    "Confort et température": ("Ambiance", "Vérifier la température de la salle et l'espacement des tables."),
+    "Qualité des plats": ("Menu", "Contrôler la régularité des cuissons et la température des plats au départ du passe."),
+    "Prix et portions": ("Menu", "Réévaluer le rapport portion/prix des plats les plus commentés."),
+    "Choix du menu": ("Menu", "Développer 2-3 plats végétariens créatifs supplémentaires pour élargir l'offre."),
+    "Propreté": ("Propreté", "Renforcer la fréquence de contrôle des sanitaires pendant le service."),
+}
+
+QUALITATIVE_LABELS = {
+    "service_qualities": "Service",
+    "atmosphere": "Ambiance",
+    "quick_highlight": "Point fort",
+}
+
+
+def normalize_words(text):
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return re.findall(r"[a-z]+", text)
+
+
+class LexiconScorer:
+    """Score local (0-100) et thème principal de chaque feedback, sans appel réseau."""
+
+    batch_size = 500
+
+    def score_batch(self, texts):
+        return [self.score_text(text) for text in texts]
+
+    def score_text(self, text):
+        words = normalize_words(text)
+        positive = negative = 0
+        for i, word in enumerate(words):
+            negated = any(w in NEGATIONS for w in words[max(0, i - 2):i])
+            weight = 2 if i > 0 and words[i - 1] in INTENSIFIERS else 1
+            if word in POSITIVE_WORDS:
+                negative, positive = (negative + weight, positive) if negated else (negative, positive + weight)
+            elif word in NEGATIVE_WORDS:
+                negative, positive = (negative, positive + weight) if negated else (negative + weight, positive)
+        if positive + negative:
+            score = round(50 + 50 * (positive - negative) / (positive + negative))
+        else:
+            score = 50
+
+        best_theme, best_hits = None, 0
+        word_set = set(words)
+        for category, label, keywords in THEMES:
+            hits = len(word_set.intersection(keywords))
+            if hits > best_hits:
+                best_theme, best_hits = (category, label), hits
+        category, theme = best_theme if best_theme else ("Général", None)
+        return {"score": score, "category": category, "theme": theme}
+
+
+class OpenAIScorer:
+    """
+    Score par lots avec un modèle OpenAI : un seul appel pour `batch_size` feedbacks.
+    En cas de réponse inexploitable, le lot est évalué par le lexique local.
+    """
+
+    def __init__(self, client, model="gpt-4o-mini", batch_size=25):
+        self.client = client
+        self.model = model
+        self.batch_size = batch_size
+        self.fallback = LexiconScorer()
+
+    def score_batch(self, texts):
+        themes = [label for _, label, _ in THEMES]
+        categories = sorted({category for category, _, _ in THEMES})
+        numbered = "\n".join(f"{i}. {text}" for i, text in enumerate(texts))
+        prompt = (
+            "Analyse chacun des feedbacks clients ci-dessous (restaurant italien). Pour chacun, donne un score "
+            "de satisfaction de 0 à 100, une catégorie parmi " + json.dumps(categories, ensure_ascii=False)
+            + " et un thème parmi " + json.dumps(themes, ensure_ascii=False) + " (ou null). "
+            "Réponds uniquement en JSON : {\"results\": [{\"score\": int, \"category\": str, \"theme\": str|null}, ...]} "
+            "dans le même ordre que les feedbacks.\n\n" + numbered
+        )
+        try:
+            completion = self.client.chat.completions.create(
+                model=self.model,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=0,
+                response_format={"type": "json_object"},
+            )
+            results = json.loads(completion.choices[0].message.content)["results"]
+            if len(results) != len(texts):
+                raise ValueError("Nombre de résultats inattendu.")
+            return [{
+                "score": max(0, min(100, int(r["score"]))),
+                "category": r.get("category") if r.get("category") in categories else "Général",
+                "theme": r.get("theme") if r.get("theme") in themes else None,
+            } for r in results]
+        except Exception as e:
+            print(f"Erreur du scoring SIF par OpenAI, repli sur le lexique: {e}")
+            return self.fallback.score_batch(texts)
+
+
+def synthesize(analyses, qualitative_counts, trend_days):
+    """
+    Construit la synthèse SIF à partir de données déjà agrégées :
+    - analyses : liste de (jour, score, catégorie, thème) des feedbacks de la période,
+    - qualitative_counts : liste de (catégorie, valeur, nombre) des tags qualitatifs,
+    - trend_days : les 7 jours (date) de la courbe de sentiment.
+    """
+    positive_themes = Counter()
+    negative_themes = Counter()
+    category_scores = defaultdict(list)
+    daily_scores = defaultdict(list)
+    for day, score, category, theme in analyses:
+        category_scores[category].append(score)
+        daily_scores[day].append(score)
+        if theme and score >= 60:
+            positive_themes[theme] += 1
+        elif theme and score <= 40:
+            negative_themes[theme] += 1
+
+    strengths = [
+        f"{QUALITATIVE_LABELS.get(category, category)} : {value} ({count} mentions)"
+        for category, value, count in sorted(qualitative_counts, key=lambda row: -row[2])
+        if category in QUALITATIVE_LABELS
+    ][:3]
+    strengths += [f"{theme} ({count} retours positifs)" for theme, count in positive_themes.most_common(2)]
+
+    weaknesses = [f"{theme} ({count} retours négatifs)" for theme, count in negative_themes.most_common(4)]
+
+    suggestions = [
+        {"category": SUGGESTIONS[theme][0], "suggestion": SUGGESTIONS[theme][1]}
+        for theme, _ in negative_themes.most_common(3) if theme in SUGGESTIONS
+    ]
+
+    categories = [
+        {"name": name, "score": round(sum(scores) / len(scores))}
+        for name, scores in sorted(category_scores.items()) if name != "Général"
+    ]
+
+    sentiment_trend = [
+        {
+            "date": day.isoformat(),
+            "score": round(sum(daily_scores[day]) / len(daily_scores[day])) if daily_scores.get(day) else None,
+        }
+        for day in trend_days
+    ]
+
+    return {
+        "strengths": strengths,
+        "weaknesses": weaknesses,
+        "suggestions": suggestions,
+        "sentiment_trend": sentiment_trend,
+        "categories": categories,
+        "analyzed_feedbacks": len(analyses),
+    }
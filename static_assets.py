@@ -0,0 +1,296 @@
+"""
+Pages (index.html, admin.html) et images servies par Flask depuis un build précompressé :
+
+- images : nom à empreinte de contenu (logosiena-1.3f2a9c1b0d.png), version optimisée,
+  variantes WebP et redimensionnées (si Pillow est installé) ;
+- pages : variantes gzip et brotli (si le paquet Brotli est installé), choisies selon
+  Accept-Encoding ;
+- cache : les fichiers à empreinte sont immuables (un an) ; les pages, dont l'URL ne
+  change pas, sont revalidées par ETag (304 sans corps).
+
+Le build est écrit par `flask --app app build-assets`. Sans build à jour, il est calculé
+en mémoire au premier accès (une fois par processus).
+"""
+import gzip
+import hashlib
+import io
+import json
+import mimetypes
+import os
+import re
+import threading
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+PAGES = ("index.html", "admin.html")
+ASSET_DIR = "assets"
+COMPRESSIBLE = {".html", ".css", ".js", ".json", ".svg", ".txt"}
+RESIZABLE = {".png", ".jpg", ".jpeg"}
+# Largeurs des variantes d'image (px), pour les écrans 1x à 3x ; seules celles plus
+# petites que l'original sont produites.
+IMAGE_WIDTHS = (128, 360, 540)
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE = "no-cache"
+ENCODING_SUFFIXES = {"br": ".br", "gzip": ".gz"}
+
+IMG_TAG = re.compile(r'<img\b[^>]*?\bsrc="/(assets/[^"]+)"[^>]*>')
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()[:10]
+
+
+def fingerprinted(path, data, suffix=""):
+    root, ext = os.path.splitext(path)
+    return f"{root}{suffix}.{content_hash(data)}{ext}"
+
+
+def _read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def source_files(root):
+    """{chemin relatif: contenu} des pages et des fichiers de assets/."""
+    files = {page: _read(os.path.join(root, page)) for page in PAGES}
+    for directory, _, names in os.walk(os.path.join(root, ASSET_DIR)):
+        for name in sorted(names):
+            path = os.path.join(directory, name)
+            files[os.path.relpath(path, root).replace(os.sep, "/")] = _read(path)
+    return files
+
+
+def source_digest(files):
+    digest = hashlib.sha256()
+    for path in sorted(files):
+        digest.update(path.encode() + b"\0" + files[path])
+    return digest.hexdigest()
+
+
+def _encode_image(image, fmt):
+    buffer = io.BytesIO()
+    if fmt == "WEBP":
+        image.save(buffer, "WEBP", quality=85, method=6)
+    else:
+        image.save(buffer, fmt, optimize=True)
+    return buffer.getvalue()
+
+
+def image_variants(path, data):
+    """
+    (original optimisé, {format: [(chemin, largeur, contenu)]}) ; les variantes sont
+    triées par largeur croissante. Sans Pillow, l'image est reprise telle quelle.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if Image is None or ext not in RESIZABLE:
+        return data, {}
+    image = Image.open(io.BytesIO(data))
+    image.load()
+    fmt = "PNG" if ext == ".png" else "JPEG"
+    optimized = _encode_image(image, fmt)
+    if len(optimized) >= len(data):
+        optimized = data
+    original_format = fmt.lower()
+    variants = {"webp": [], original_format: []}
+    widths = [width for width in IMAGE_WIDTHS if width < image.width] + [image.width]
+    for width in widths:
+        resized = image if width == image.width else image.resize(
+            (width, round(image.height * width / image.width)), Image.LANCZOS
+        )
+        for variant_format, pil_format, variant_ext in (("webp", "WEBP", ".webp"), (original_format, fmt, ext)):
+            variant_path = os.path.splitext(path)[0] + variant_ext
+            if width == image.width and variant_format == original_format:
+                variants[variant_format].append((fingerprinted(path, optimized), width, optimized))
+            else:
+                content = _encode_image(resized, pil_format)
+                variants[variant_format].append((fingerprinted(variant_path, content, f"-{width}w"), width, content))
+    # Une variante réduite plus lourde que la pleine taille (PNG à palette, par exemple) n'apporte rien.
+    for entries in variants.values():
+        full_size = len(entries[-1][2])
+        entries[:] = [entry for entry in entries[:-1] if len(entry[2]) < full_size] + entries[-1:]
+    return optimized, variants
+
+
+def _srcset(entries):
+    return ", ".join(f"/{path} {width}w" for path, width, _ in entries)
+
+
+def rewrite_images(html, images):
+    """
+    Remplace les <img src="/assets/..."> par l'URL à empreinte. Une image avec un attribut
+    `sizes` reçoit un srcset et une source WebP (<picture>) ; sans `sizes`, seule la
+    variante WebP pleine taille est proposée.
+    """
+    def replace(match):
+        tag, asset = match.group(0), match.group(1)
+        image = images.get(asset)
+        if image is None:
+            return tag
+        tag = tag.replace(f'src="/{asset}"', f'src="/{image["path"]}"')
+        variants = image["variants"]
+        if not variants:
+            return tag
+        sizes = re.search(r'\bsizes="([^"]+)"', tag)
+        original_format = next(name for name in variants if name != "webp")
+        if sizes:
+            tag = tag.replace("<img", f'<img srcset="{_srcset(variants[original_format])}"', 1)
+            source = f'<source type="image/webp" srcset="{_srcset(variants["webp"])}" sizes="{sizes.group(1)}">'
+        else:
+            source = f'<source type="image/webp" srcset="/{variants["webp"][-1][0]}">'
+        return f"<picture>{source}{tag}</picture>"
+
+    return IMG_TAG.sub(replace, html)
+
+
+def compressed_variants(data):
+    """{encodage: contenu} des variantes plus petites que l'original."""
+    variants = {"gzip": gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants["br"] = brotli.compress(data, quality=11)
+    return {encoding: content for encoding, content in variants.items() if len(content) < len(data)}
+
+
+def build(root):
+    """Construit le build en mémoire : (manifeste, {chemin relatif: contenu})."""
+    sources = source_files(root)
+    files = {}
+    routes = {}
+    images = {}
+
+    def add(route, path, data, immutable):
+        files[path] = data
+        entry = {
+            "file": path,
+            "content_type": mimetypes.guess_type(path)[0] or "application/octet-stream",
+            "etag": content_hash(data),
+            "cache_control": IMMUTABLE_CACHE if immutable else REVALIDATE_CACHE,
+            "encodings": {},
+        }
+        if os.path.splitext(path)[1].lower() in COMPRESSIBLE:
+            for encoding, content in compressed_variants(data).items():
+                files[path + ENCODING_SUFFIXES[encoding]] = content
+                entry["encodings"][encoding] = path + ENCODING_SUFFIXES[encoding]
+        routes[route] = entry
+
+    for path, data in sources.items():
+        if path in PAGES:
+            continue
+        optimized, variants = image_variants(path, data)
+        hashed = fingerprinted(path, optimized)
+        add(hashed, hashed, optimized, immutable=True)
+        # L'ancienne URL reste servie (liens existants), mais revalidée à chaque visite.
+        add(path, hashed, optimized, immutable=False)
+        for entries in variants.values():
+            for variant_path, _, content in entries:
+                add(variant_path, variant_path, content, immutable=True)
+        images[path] = {"path": hashed, "variants": variants}
+
+    for page in PAGES:
+        html = rewrite_images(sources[page].decode("utf-8"), images)
+        for asset, image in images.items():
+            html = html.replace(f"/{asset}", f"/{image['path']}")
+        add(page, page, html.encode("utf-8"), immutable=False)
+
+    manifest = {"source_digest": source_digest(sources), "routes": routes}
+    return manifest, files
+
+
+def write_build(root, build_dir):
+    """Écrit le build dans `build_dir` (manifest.json en dernier) et renvoie le manifeste."""
+    manifest, files = build(root)
+    for path, data in files.items():
+        target = os.path.join(build_dir, path)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, "wb") as f:
+            f.write(data)
+    tmp_path = os.path.join(build_dir, "manifest.json.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(tmp_path, os.path.join(build_dir, "manifest.json"))
+    return manifest
+
+
+def choose_encoding(available, accepted):
+    """Meilleur encodage disponible selon Accept-Encoding ({valeur: q}) : br, puis gzip, sinon identité."""
+    for encoding in ("br", "gzip"):
+        quality = accepted.get(encoding, accepted.get("*", 0))
+        if encoding in available and quality > 0:
+            return encoding
+    return None
+
+
+def etag_matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return f'"{etag}"' in candidates
+
+
+class StaticAssets:
+    """Sert les routes du manifeste depuis la mémoire (quelques centaines de Ko au total)."""
+
+    def __init__(self, root, build_dir):
+        self.root = root
+        self.build_dir = build_dir
+        self._routes = None
+        self._files = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        manifest_path = os.path.join(self.build_dir, "manifest.json")
+        digest = source_digest(source_files(self.root))
+        if os.path.exists(manifest_path):
+            with open(manifest_path, encoding="utf-8") as f:
+                manifest = json.load(f)
+            if manifest.get("source_digest") == digest:
+                files = {}
+                for entry in manifest["routes"].values():
+                    for path in [entry["file"], *entry["encodings"].values()]:
+                        if path not in files:
+                            files[path] = _read(os.path.join(self.build_dir, path))
+                return manifest["routes"], files
+            print("Build des fichiers statiques périmé : reconstruction en mémoire (flask --app app build-assets).")
+        else:
+            print("Pas de build des fichiers statiques : construction en mémoire (flask --app app build-assets).")
+        manifest, files = build(self.root)
+        return manifest["routes"], files
+
+    def _ensure_loaded(self):
+        if self._routes is None:
+            with self._lock:
+                if self._routes is None:
+                    routes, self._files = self._load()
+                    self._routes = routes
+        return self._routes
+
+    def reload(self):
+        with self._lock:
+            self._routes = None
+
+    def response(self, path, accepted_encodings, if_none_match=None):
+        """(corps, statut, en-têtes) pour `path`, ou None si la route n'existe pas."""
+        entry = self._ensure_loaded().get(path)
+        if entry is None:
+            return None
+        encoding = choose_encoding(entry["encodings"], accepted_encodings)
+        etag = entry["etag"] + (f"-{encoding}" if encoding else "")
+        headers = {"ETag": f'"{etag}"', "Cache-Control": entry["cache_control"]}
+        if entry["encodings"]:
+            headers["Vary"] = "Accept-Encoding"
+        if etag_matches(if_none_match, etag):
+            return b"", 304, headers
+        headers["Content-Type"] = entry["content_type"] + ("; charset=utf-8" if entry["content_type"] == "text/html" else "")
+        if encoding:
+            headers["Content-Encoding"] = encoding
+            return self._files[entry["encodings"][encoding]], 200, headers
+        return self._files[entry["file"]], 200, headers
@@ -0,0 +1,127 @@
+"""
+Plusieurs restaurants (tenants) servis par la même application : annuaire des
+restaurants en mémoire, modèle de prompt par restaurant et migration des bases créées
+avant l'ajout de la colonne tenant_id.
+"""
+import threading
+import time
+
+from sqlalchemy import UniqueConstraint, inspect, text
+
+DEFAULT_PROMPT_TEMPLATE = (
+    "Rédige un avis client positif et chaleureux pour un restaurant italien nommé {restaurant_name}, "
+    "en langue '{lang}'. L'avis doit sembler authentique et personnel. "
+    "Incorpore les éléments suivants de manière naturelle:\n{details}{server_instruction}"
+    "\nL'avis doit faire environ 4-6 phrases. Varie le style pour ne pas être répétitif."
+)
+
+
+def render_prompt(template, restaurant_name, lang, details, server_name):
+    """
+    Remplit un modèle de prompt. Champs disponibles : {restaurant_name}, {lang},
+    {details} (une ligne « - catégorie: valeurs » par tag) et {server_instruction}.
+    Un modèle invalide retombe sur DEFAULT_PROMPT_TEMPLATE.
+    """
+    fields = {
+        "restaurant_name": restaurant_name,
+        "lang": lang,
+        "details": "".join(
+            f"- {category}: {', '.join(values)}\n" for category, values in details.items() if category != 'server_name'
+        ),
+        "server_instruction": f"\nL'avis doit mentionner le service impeccable de {server_name}.\n" if server_name else "",
+    }
+    try:
+        return (template or DEFAULT_PROMPT_TEMPLATE).format(**fields)
+    except (KeyError, IndexError, ValueError) as e:
+        print(f"Modèle de prompt invalide pour {restaurant_name}: {e}")
+        return DEFAULT_PROMPT_TEMPLATE.format(**fields)
+
+
+class TenantDirectory:
+    """
+    Annuaire en mémoire (par processus) des restaurants, indexé par slug et par id.
+    `loader` renvoie une liste de dicts (id, slug, name, ...) ; la liste est rechargée
+    toutes les `ttl` secondes, ou dès qu'un slug inconnu est demandé.
+    """
+
+    def __init__(self, loader, ttl=60):
+        self.loader = loader
+        self.ttl = ttl
+        self._by_slug = {}
+        self._by_id = {}
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded_at = 0.0
+
+    def _reload(self):
+        tenants = self.loader()
+        with self._lock:
+            self._by_slug = {tenant["slug"]: tenant for tenant in tenants}
+            self._by_id = {tenant["id"]: tenant for tenant in tenants}
+            self._loaded_at = time.time()
+
+    def _lookup(self, index_name, key):
+        if time.time() - self._loaded_at >= self.ttl:
+            self._reload()
+        tenant = getattr(self, index_name).get(key)
+        if tenant is None and time.time() - self._loaded_at > 1:
+            # Restaurant créé depuis le dernier chargement (au plus un rechargement par seconde).
+            self._reload()
+            tenant = getattr(self, index_name).get(key)
+        return tenant
+
+    def by_slug(self, slug):
+        return self._lookup("_by_slug", slug)
+
+    def by_id(self, tenant_id):
+        return self._lookup("_by_id", tenant_id)
+
+    def all(self):
+        if time.time() - self._loaded_at >= self.ttl:
+            self._reload()
+        return list(self._by_id.values())
+
+
+def add_tenant_columns(conn, tables, default_tenant_id):
+    """
+    Ajoute tenant_id (rattaché au restaurant par défaut) aux tables créées avant le
+    multi-restaurant, puis les index et contraintes d'unicité nommées des modèles.
+    create_all ne modifie pas les tables existantes.
+    """
+    inspector = inspect(conn)
+    for table in tables:
+        columns = {column["name"] for column in inspector.get_columns(table.name)}
+        if "tenant_id" not in columns:
+            conn.execute(text(
+                f"ALTER TABLE {table.name} ADD COLUMN tenant_id INTEGER NOT NULL "
+                f"DEFAULT {int(default_tenant_id)} REFERENCES tenant (id) ON DELETE CASCADE"
+            ))
+        for index in table.indexes:
+            index.create(bind=conn, checkfirst=True)
+        for constraint in table.constraints:
+            if isinstance(constraint, UniqueConstraint) and constraint.name:
+                conn.execute(text(
+                    f"CREATE UNIQUE INDEX IF NOT EXISTS {constraint.name} "
+                    f"ON {table.name} ({', '.join(column.name for column in constraint.columns)})"
+                ))
+
+
+def drop_legacy_constraints(conn, constraints):
+    """Supprime les anciennes contraintes d'unicité globales (Postgres) : {table: [noms]}."""
+    for table, names in constraints.items():
+        for name in names:
+            conn.execute(text(f"ALTER TABLE {table} DROP CONSTRAINT IF EXISTS {name}"))
+
+
+def ensure_primary_key(conn, table):
+    """Reconstruit la clé primaire de `table` si elle ne correspond plus au modèle (Postgres)."""
+    expected = [column.name for column in table.primary_key.columns]
+    current = inspect(conn).get_pk_constraint(table.name)
+    if current["constrained_columns"] == expected:
+        return
+    if current.get("name"):
+        conn.execute(text(f"ALTER TABLE {table.name} DROP CONSTRAINT {current['name']}"))
+    conn.execute(text(f"ALTER TABLE {table.name} ADD PRIMARY KEY ({', '.join(expected)})"))
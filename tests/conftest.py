@@ -0,0 +1,31 @@
+import importlib
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope="session")
+def siena(tmp_path_factory):
+    """Module app importé sur une base SQLite temporaire migrée, sans service externe."""
+    db_dir = tmp_path_factory.mktemp("siena")
+    os.environ.update(
+        DATABASE_URL=f"sqlite:///{db_dir / 'test.sqlite'}",
+        DASHBOARD_PASSWORD="test",
+        OPENAI_API_KEY="sk-test",
+        SHARED_STATE_URL="memory://",
+        RATELIMIT_ENABLED="false",
+        INGESTION_MODE="direct",
+    )
+    module = importlib.import_module("app")
+    module.migrate_schema()
+    return module
+
+
+@pytest.fixture
+def client(siena):
+    client = siena.app.test_client()
+    client.environ_base["HTTP_X_FORWARDED_PROTO"] = "https"
+    return client
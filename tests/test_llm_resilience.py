@@ -0,0 +1,92 @@
+"""ResilientLLM avec un faux client OpenAI : disjoncteur, requête de couverture, replis."""
+import threading
+import time
+import types
+
+from fallback_review import render_fallback_review
+from llm_resilience import CircuitBreaker, LatencyTracker, ResilientLLM
+
+
+class FakeClient:
+    """Imite client.chat.completions.create ; `behaviour(n, model)` décide du n-ième appel."""
+
+    def __init__(self, behaviour):
+        self.behaviour = behaviour
+        self.calls = []
+        self._lock = threading.Lock()
+        self.chat = types.SimpleNamespace(completions=types.SimpleNamespace(create=self.create))
+
+    def create(self, model, messages=None, timeout=None, **kwargs):
+        with self._lock:
+            self.calls.append(model)
+            n = len(self.calls)
+        content = self.behaviour(n, model)
+        message = types.SimpleNamespace(content=content)
+        return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)])
+
+
+def completion_call(client, model):
+    return lambda timeout: client.chat.completions.create(model=model, timeout=timeout).choices[0].message.content
+
+
+def local_call():
+    return lambda: render_fallback_review("Siena", {"dish": ["Pizza"]}, "Zoé", "fr")
+
+
+def failing(n, model):
+    raise ConnectionError("API indisponible")
+
+
+def test_breaker_trips_after_repeated_failures():
+    llm = ResilientLLM(deadline=1, breaker=CircuitBreaker(window=4, min_calls=4, failure_ratio=0.5, open_seconds=60),
+                       hedge_ratio=0)
+    client = FakeClient(failing)
+    for _ in range(4):
+        _, outcome = llm.complete(completion_call(client, "gpt-4o"), local=local_call())
+        assert outcome == "local_template"
+    assert llm.breaker.state == CircuitBreaker.OPEN
+    assert len(client.calls) == 4
+
+    # Circuit ouvert : le modèle principal n'est plus appelé.
+    _, outcome = llm.complete(completion_call(client, "gpt-4o"), local=local_call())
+    assert outcome == "local_template"
+    assert len(client.calls) == 4
+    assert llm.snapshot()["outcomes"]["circuit_open"] == 1
+
+
+def test_hedge_answers_when_primary_is_slow():
+    latencies = LatencyTracker(min_samples=1)
+    latencies.record(0.01)
+    llm = ResilientLLM(deadline=2, hedge_min_delay=0.05, hedge_max_delay=0.05, hedge_ratio=1.0, latencies=latencies)
+
+    def slow_first(n, model):
+        if n == 1:
+            time.sleep(1)
+            return "lent"
+        return "couverture"
+
+    client = FakeClient(slow_first)
+    started = time.monotonic()
+    result, outcome = llm.complete(completion_call(client, "gpt-4o"))
+    assert (result, outcome) == ("couverture", "hedge_success")
+    assert time.monotonic() - started < 0.9
+    assert llm.snapshot()["outcomes"]["hedge_sent"] == 1
+
+
+def test_falls_back_to_model_then_local_template():
+    llm = ResilientLLM(deadline=1, fallback_deadline=1, hedge_ratio=0)
+
+    def only_fallback_model(n, model):
+        if model == "gpt-4o-mini":
+            return "avis du modèle de repli"
+        raise ConnectionError("API indisponible")
+
+    client = FakeClient(only_fallback_model)
+    result, outcome = llm.complete(completion_call(client, "gpt-4o"), completion_call(client, "gpt-4o-mini"), local_call())
+    assert (result, outcome) == ("avis du modèle de repli", "fallback_model")
+
+    client = FakeClient(failing)
+    result, outcome = llm.complete(completion_call(client, "gpt-4o"), completion_call(client, "gpt-4o-mini"), local_call())
+    assert outcome == "local_template"
+    assert result == local_call()()
+    assert client.calls == ["gpt-4o", "gpt-4o-mini"]
@@ -0,0 +1,108 @@
+"""Routage des lectures vers la réplique, avec un routeur factice et deux bases SQLite."""
+import pytest
+from flask import Flask
+from flask_sqlalchemy import SQLAlchemy
+
+from read_replica import REPLICA_BIND_KEY, LocalPinStore, ReplicaRouter, RoutingSession, replica_reads
+
+
+class StubRouter(ReplicaRouter):
+    """Routeur dont l'état de la réplique est fixé par le test (pas de mesure de retard)."""
+
+    def __init__(self, healthy=True, **kwargs):
+        super().__init__(**kwargs)
+        self.healthy = healthy
+
+    def use_replica(self, engine):
+        self.stats["replica_reads" if self.healthy else "primary_fallbacks"] += 1
+        return self.healthy
+
+
+@pytest.fixture
+def setup(tmp_path):
+    def make(router, pin_key=lambda: None):
+        app = Flask(__name__)
+        app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{tmp_path / 'primary.sqlite'}"
+        app.config["SQLALCHEMY_BINDS"] = {REPLICA_BIND_KEY: f"sqlite:///{tmp_path / 'replica.sqlite'}"}
+        db = SQLAlchemy(app, session_options={"class_": RoutingSession, "router": router, "pin_key": pin_key})
+
+        class Item(db.Model):
+            id = db.Column(db.Integer, primary_key=True)
+            status = db.Column(db.String(20), nullable=False)
+
+        with app.app_context():
+            for engine in (db.engines[None], db.engines[REPLICA_BIND_KEY]):
+                db.metadata.create_all(engine)
+                with engine.begin() as conn:
+                    conn.execute(Item.__table__.insert(), {"id": 1, "status": "new"})
+        return app, db, Item
+
+    return make
+
+
+def read_status(db, Item):
+    with replica_reads():
+        return db.session.execute(db.select(Item.status).where(Item.id == 1)).scalar()
+
+
+def test_writes_go_to_primary(setup):
+    app, db, Item = setup(StubRouter(healthy=True, pin_seconds=0))
+    with app.app_context(), replica_reads():
+        db.session.add(Item(id=2, status="new"))
+        db.session.commit()
+        with db.engines[None].connect() as conn:
+            assert conn.execute(db.select(db.func.count()).select_from(Item)).scalar() == 2
+        with db.engines[REPLICA_BIND_KEY].connect() as conn:
+            assert conn.execute(db.select(db.func.count()).select_from(Item)).scalar() == 1
+
+
+def test_reads_use_healthy_replica(setup):
+    app, db, Item = setup(StubRouter(healthy=True, pin_seconds=0))
+    with app.app_context():
+        with db.engines[REPLICA_BIND_KEY].begin() as conn:
+            conn.execute(Item.__table__.update().values(status="replica"))
+        assert read_status(db, Item) == "replica"
+        # Hors d'un bloc replica_reads, la lecture reste sur la base principale.
+        assert db.session.execute(db.select(Item.status)).scalar() == "new"
+
+
+def test_lagging_replica_is_bypassed(setup):
+    app, db, Item = setup(StubRouter(healthy=False, pin_seconds=0))
+    with app.app_context():
+        with db.engines[REPLICA_BIND_KEY].begin() as conn:
+            conn.execute(Item.__table__.update().values(status="stale"))
+        assert read_status(db, Item) == "new"
+
+
+def test_router_excludes_replica_over_max_lag():
+    router = ReplicaRouter(max_lag=5, measure_lag=lambda connection: 30.0)
+
+    class Engine:
+        def connect(self):
+            class Connection:
+                def __enter__(self):
+                    return self
+
+                def __exit__(self, *exc):
+                    return False
+            return Connection()
+
+    assert router.use_replica(Engine()) is False
+    assert router.snapshot()["primary_fallbacks"] == 1
+
+
+def test_reads_pinned_to_primary_after_write(setup):
+    now = [1000.0]
+    router = StubRouter(healthy=True, pin_seconds=5, pin_store=LocalPinStore(clock=lambda: now[0]))
+    app, db, Item = setup(router, pin_key=lambda: "tenant-1")
+    with app.app_context():
+        # La réplique n'a pas encore reçu la mise à jour de statut.
+        db.session.get(Item, 1).status = "read"
+        db.session.commit()
+        db.session.remove()
+        assert read_status(db, Item) == "read"
+        assert router.stats["pinned_reads"] == 1
+
+        now[0] += 6
+        db.session.remove()
+        assert read_status(db, Item) == "new"
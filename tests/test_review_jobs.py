@@ -0,0 +1,65 @@
+"""File de génération : réservation, saturation (429 + Retry-After) sans rien enregistrer."""
+import threading
+
+import pytest
+
+from jobs import QueueFullError, ReviewJobQueue
+
+
+def blocking_queue(max_depth):
+    """File dont l'unique worker reste bloqué tant que `release` n'est pas positionné."""
+    queue = ReviewJobQueue(workers=1, max_depth=max_depth)
+    release = threading.Event()
+    started = threading.Event()
+
+    def block():
+        started.set()
+        release.wait(5)
+
+    queue.submit(block)
+    assert started.wait(5)
+    return queue, release
+
+
+def test_reserve_raises_when_queue_is_full():
+    queue, release = blocking_queue(max_depth=1)
+    try:
+        queue.reserve()
+        with pytest.raises(QueueFullError) as excinfo:
+            queue.reserve()
+        assert excinfo.value.retry_after >= 1
+        with pytest.raises(QueueFullError):
+            queue.submit(lambda: None)
+        queue.release()
+        queue.reserve()
+        job_id = queue.submit_reserved(lambda: "ok")
+    finally:
+        release.set()
+    assert queue.wait(job_id, 5)["result"] == "ok"
+
+
+def test_full_queue_returns_429_without_saving(siena, client, monkeypatch):
+    queue, release = blocking_queue(max_depth=1)
+    monkeypatch.setattr(siena, "review_jobs", queue)
+    body = {"tags": [{"category": "server_name", "value": "Zoé"}, {"category": "dish", "value": "Pizza"}],
+            "lang": "fr", "async": True}
+    try:
+        queue.reserve()  # La seule place est prise.
+        with siena.app.app_context():
+            before = siena.GeneratedReview.query.filter_by(server_name="Zoé").count()
+        response = client.post("/generate-review", json=body)
+        assert response.status_code == 429
+        assert int(response.headers["Retry-After"]) >= 1
+        with siena.app.app_context():
+            assert siena.GeneratedReview.query.filter_by(server_name="Zoé").count() == before
+        assert queue._reserved == 1
+    finally:
+        queue.release()
+        release.set()
+
+
+def test_async_flag_is_parsed_strictly(siena):
+    assert siena.parse_flag("false", True) is False
+    assert siena.parse_flag("1", False) is True
+    assert siena.parse_flag(None, True) is True
+    assert siena.parse_flag("peut-être", False) is None
@@ -0,0 +1,55 @@
+"""Score lexical des feedbacks internes et analyse incrémentale."""
+import pytest
+
+from sif import LexiconScorer
+
+
+@pytest.mark.parametrize("text, expected_score, expected_theme", [
+    ("Trop bon, le personnel était trop sympa et souriant", 100, "Accueil et amabilité"),
+    ("Trop cher pour des portions ridicules", 0, "Prix et portions"),
+    ("Attente beaucoup trop longue, service lent", 0, "Temps d'attente"),
+    ("La pizza n'était pas bonne, pâtes fades", 0, "Qualité des plats"),
+    ("Rien à signaler", 50, None),
+])
+def test_lexicon_scores_polarity_and_theme(text, expected_score, expected_theme):
+    result = LexiconScorer().score_text(text)
+    assert result["score"] == expected_score
+    assert result["theme"] == expected_theme
+
+
+def test_intensifier_strengthens_without_flipping():
+    scorer = LexiconScorer()
+    assert scorer.score_text("trop bon mais lent")["score"] > 50
+    assert scorer.score_text("bon mais trop lent")["score"] < 50
+
+
+def test_analysis_skips_feedback_already_analysed(siena):
+    with siena.app.app_context():
+        db = siena.db
+        feedback = [siena.InternalFeedback(tenant_id=siena.DEFAULT_TENANT_ID, feedback_text=f"service lent {i}")
+                    for i in range(3)]
+        db.session.add_all(feedback)
+        db.session.commit()
+        siena.analyze_new_feedback()
+        ids = [f.id for f in feedback]
+        # Une analyse manquante au milieu (feedback validé « en retard » avec un id plus petit).
+        db.session.query(siena.FeedbackAnalysis).filter(siena.FeedbackAnalysis.feedback_id == ids[1]).delete()
+        db.session.commit()
+
+        scored = []
+
+        class RecordingScorer(LexiconScorer):
+            def score_batch(self, texts):
+                scored.extend(texts)
+                return super().score_batch(texts)
+
+        assert siena.analyze_new_feedback(RecordingScorer()) == 1
+        assert scored == ["service lent 1"]
+        analysed = {row.feedback_id for row in db.session.query(siena.FeedbackAnalysis.feedback_id)}
+        assert set(ids) <= analysed
+        # Un recalcul concurrent qui réinsère les mêmes analyses ne viole pas la contrainte unique.
+        siena.insert_feedback_analyses([{
+            "tenant_id": siena.DEFAULT_TENANT_ID, "feedback_id": ids[0], "day": feedback[0].created_at.date(),
+            "score": 0, "category": "Service", "theme": None,
+        }])
+        db.session.commit()